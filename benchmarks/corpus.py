@@ -0,0 +1,232 @@
+"""
+Erzeugt einen synthetischen Bestand zum Testen und Messen von structmeta.
+
+Die Ordnerstruktur ist dieselbe wie bei echten Lieferungen (siehe README):
+
+    newspaper  -- <ZDB ID>/<YYYY-MM-DD>/<Seiten>
+    journal    -- <Titel>/Jahrgang_<YYYY>/Jahrgang_<YYYY>_<Element>/<Seiten>
+    monograph  -- <Sammlung>/<Buch>/<Seiten>, mit --elements <Buch>/<Kapitel>/<Seiten>
+
+Die Seiten sehen grob wie Scans aus (Papierton, Rauschen, Textspalten), damit sich die
+Bilder beim Komprimieren ähnlich wie echte Scans verhalten. Dazu wird eine passende
+TOML Datei geschrieben und auf Wunsch einige PDFs mit eingebetteten JPGs und Textebene.
+
+Aufruf:
+    python -m benchmarks.corpus ZIELORDNER --type newspaper --units 3 --pages 10
+"""
+
+import argparse
+import io
+import random
+import shutil
+from pathlib import Path
+from PIL import Image, ImageDraw
+
+TOML = """[institution]
+isil = "DE-0000"
+name = "Benchmark Archiv"
+logoURL = "https://www.example.org/logo.svg"
+siteURL = "https://www.example.org"
+contact = "kontakt@example.org"
+license = "https://creativecommons.org/publicdomain/mark/1.0/"
+
+[objects]
+type = "{type}"
+title = "Benchmark {type}"
+erscheinungsort = "Teststadt"
+verlag = "Testverlag"
+autor = "Max Muster"
+year_of_digitization = "2024"
+place_of_digitization = "Teststadt"
+sprache = "ger"
+
+[images]
+jpg_quality = 90
+"""
+
+ZDB = "1234567-8"
+ELEMENTS = ["Titel", "Inhaltsverzeichnis", "Heft 1", "Heft 2", "Heft 3", "Register"]
+
+
+def pageImage(width: int, height: int, mode: str = "RGB", seed: int = 0) -> Image.Image:
+    """Eine Seite mit Papierton, Rauschen und Textspalten"""
+    rnd = random.Random(seed)
+    noise = Image.effect_noise((width, height), 12)
+    paper = Image.new("L", (width, height), 228)
+    img = Image.blend(paper, noise, 0.15)
+    draw = ImageDraw.Draw(img)
+    columns = 3 if width > height * 0.6 else 2
+    margin = width // 12
+    colwidth = (width - 2 * margin) // columns
+    lineheight = max(height // 90, 4)
+    for c in range(columns):
+        x0 = margin + c * colwidth
+        y = margin
+        while y < height - margin:
+            if rnd.random() < 0.08:
+                # Absatz
+                y += lineheight
+                continue
+            length = int(colwidth * rnd.uniform(0.6, 0.95))
+            x = x0
+            while x < x0 + length:
+                # Wörter als dunkle Balken
+                word = rnd.randint(lineheight, lineheight * 5)
+                draw.rectangle(
+                    [x, y, min(x + word, x0 + length), y + lineheight // 2],
+                    fill=rnd.randint(30, 80),
+                )
+                x += word + lineheight // 2
+            y += lineheight
+    if mode == "RGB":
+        # leicht vergilbtes Papier
+        img = Image.merge(
+            "RGB", (img, img.point(lambda v: v * 0.98), img.point(lambda v: v * 0.9))
+        )
+    return img
+
+
+class Pages:
+    """Erzeugt die Seiten eines Bestands, die Grundseite wird nur einmal berechnet"""
+
+    def __init__(self, width: int, height: int, format: str, mode: str):
+        self.base = pageImage(width, height, mode)
+        self.format = format
+        self.n = 0
+
+    def write(self, folder: Path, stem: str) -> Path:
+        self.n += 1
+        folder.mkdir(parents=True, exist_ok=True)
+        img = self.base.copy()
+        # jede Seite ist ein wenig anders (eigener Hash, z.B. für den Cache)
+        ImageDraw.Draw(img).text((20, 20), f"Seite {self.n}", fill=0)
+        if self.format == "tif":
+            path = folder / (stem + ".tif")
+            img.save(path, "TIFF")
+        else:
+            path = folder / (stem + ".jpg")
+            img.save(path, "JPEG", quality=90)
+        return path
+
+
+def makeCorpus(
+    root: Path,
+    type: str = "newspaper",
+    units: int = 3,
+    pages: int = 10,
+    width: int = 1500,
+    height: int = 2000,
+    format: str = "tif",
+    mode: str = "RGB",
+    elements: int = 0,
+    pdfs: int = 0,
+) -> dict:
+    """
+    Legt den Bestand in root an.
+
+    Arguments:
+        units -- Anzahl der Ausgaben, Jahrgänge oder Bücher
+
+        pages -- Seiten pro Ausgabe, Strukturelement oder Buch
+
+        format -- "tif" oder "jpg"
+
+        elements -- Strukturelemente pro Jahrgang bzw. Kapitel pro Buch (journal mindestens 1)
+
+        pdfs -- Anzahl der PDFs in root/pdf
+
+    Returns:
+        dict mit "input" (Ordner für --folder), "toml" (für --metadata), "pdf" und "pages"
+    """
+    root = Path(root)
+    shutil.rmtree(root, ignore_errors=True)
+    root.mkdir(parents=True)
+    p = Pages(width, height, format, mode)
+    if type == "newspaper":
+        folder = root / type / ZDB
+        for u in range(units):
+            day = f"1900-{u // 28 % 12 + 1:02}-{u % 28 + 1:02}"
+            if u >= 28 * 12:
+                day = f"{1900 + u // (28 * 12)}" + day[4:]
+            for n in range(pages):
+                p.write(folder / day, f"{day}_{n + 1:04}")
+    elif type == "journal":
+        folder = root / type / "Benchmark Zeitschrift"
+        for u in range(units):
+            volume = f"Jahrgang_{1900 + u}"
+            for e in range(max(elements, 1)):
+                element = f"{volume}_{ELEMENTS[e % len(ELEMENTS)]}"
+                if e >= len(ELEMENTS):
+                    element += f" {e // len(ELEMENTS) + 1}"
+                for n in range(pages):
+                    p.write(folder / volume / element, f"{element}_{n + 1:04}")
+    elif type == "monograph":
+        folder = root / type / "Sammlung"
+        for u in range(units):
+            book = f"Buch {u + 1}"
+            if elements == 0:
+                for n in range(pages):
+                    p.write(folder / book, f"b{u + 1}_{n + 1:04}")
+            for e in range(elements):
+                for n in range(pages):
+                    p.write(folder / book / f"Kapitel {e + 1}", f"k{e + 1}_{n + 1:04}")
+    else:
+        raise ValueError(f"Unbekannter Typ {type}")
+    toml = root / f"{type}.toml"
+    toml.write_text(TOML.format(type=type), encoding="utf-8")
+    if pdfs > 0:
+        makePDFs(root / "pdf", pdfs, pages, p)
+    return {"input": folder, "toml": toml, "pdf": root / "pdf", "pages": p.n}
+
+
+def makePDFs(folder: Path, count: int, pages: int, p: Pages) -> None:
+    """PDFs wie von Zeitungsdienstleistern: ein JPG pro Seite und eine Textebene"""
+    import fitz  # PyMuPDF
+
+    folder.mkdir(parents=True, exist_ok=True)
+    buffer = io.BytesIO()
+    p.base.convert("RGB").save(buffer, "JPEG", quality=85)
+    jpg = buffer.getvalue()
+    for i in range(count):
+        doc = fitz.open()
+        for n in range(pages):
+            page = doc.new_page(width=595, height=842)
+            page.insert_image(page.rect, stream=jpg)
+            page.insert_text((60, 60), f"Seite {n + 1} Benchmark Zeitung", fontsize=14)
+        doc.save(folder / f"Zeitung {i % 28 + 1}.1.{1900 + i // 28}.pdf")
+        doc.close()
+
+
+def cli():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("root", help="Zielordner, wird neu angelegt")
+    parser.add_argument(
+        "--type", choices=["newspaper", "journal", "monograph"], default="newspaper"
+    )
+    parser.add_argument("--units", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--width", type=int, default=1500)
+    parser.add_argument("--height", type=int, default=2000)
+    parser.add_argument("--format", choices=["tif", "jpg"], default="tif")
+    parser.add_argument("--mode", choices=["RGB", "L"], default="RGB")
+    parser.add_argument("--elements", type=int, default=0)
+    parser.add_argument("--pdfs", type=int, default=0)
+    args = parser.parse_args()
+    corpus = makeCorpus(
+        Path(args.root),
+        args.type,
+        args.units,
+        args.pages,
+        args.width,
+        args.height,
+        args.format,
+        args.mode,
+        args.elements,
+        args.pdfs,
+    )
+    print(f"{corpus['pages']} Seiten in {corpus['input']}")
+    print(f"TOML: {corpus['toml']}")
+
+
+if __name__ == "__main__":
+    cli()
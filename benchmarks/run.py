@@ -0,0 +1,284 @@
+"""
+Misst die einzelnen Schritte von structmeta auf einem synthetischen Bestand
+(siehe corpus.py) und vergleicht die Zeiten mit einer gespeicherten Baseline.
+
+Gemessen wird jeder Schritt für sich, jeweils in einen leeren Ausgabe-Ordner:
+
+    discovery           -- Einlesen des Eingabe-Ordners (scan.scanFolder)
+    createJPGfromTIFF   -- JPGs aus TIFs
+    reduceJPGs          -- JPGs verkleinern (max_dimensions)
+    generate_thumbails  -- Thumbnails aus JPGs
+    derivatives         -- JPG und Thumbnail aus einer Dekodierung (createDerivatives)
+    ocr                 -- helpers.ocr mit tesseract_stub.py statt Tesseract
+    mets                -- METS/MODS der Zeitungsausgaben erstellen und schreiben
+    zip                 -- JPGs und METS in die ZIP Dateien schreiben
+
+Aufruf:
+    python -m benchmarks.run --save-baseline baseline.json
+    python -m benchmarks.run --baseline baseline.json
+
+Mit --baseline endet der Lauf mit Exit Code 1, wenn ein Schritt mehr als --tolerance
+langsamer ist als in der Baseline. Die Baseline gilt nur für denselben Rechner und
+dieselben Bestandsparameter.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from pathlib import Path
+import toml
+from loguru import logger
+from structmeta import __version__, archive, helpers, mets, scan
+from .corpus import makeCorpus
+
+STAGES = [
+    "discovery",
+    "createJPGfromTIFF",
+    "reduceJPGs",
+    "generate_thumbails",
+    "derivatives",
+    "ocr",
+    "mets",
+    "zip",
+]
+
+
+def stubCommand(folder: Path) -> str:
+    """Startskript für tesseract_stub.py mit dem aktuellen Python"""
+    stub = Path(__file__).with_name("tesseract_stub.py")
+    if os.name == "nt":
+        command = folder / "tesseract.cmd"
+        command.write_text(f'@"{sys.executable}" "{stub}" %*\n')
+    else:
+        command = folder / "tesseract"
+        command.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{stub}" "$@"\n')
+        command.chmod(command.stat().st_mode | stat.S_IEXEC)
+    return str(command)
+
+
+def allPages(index: dict, key: str) -> list:
+    return [p for unit in index["folders"] for p in unit[key]]
+
+
+def runStage(name: str, ctx: dict, out: Path) -> int:
+    """Führt einen Schritt aus und gibt die Anzahl der bearbeiteten Seiten zurück"""
+    if name == "discovery":
+        index = scan.scanFolder(ctx["tif"]["input"])
+        return scan.countPages(index)
+    if name == "createJPGfromTIFF":
+        helpers.createJPGfromTIFF(ctx["tiffs"], logger, None, ctx["jpg_quality"], out)
+        return len(ctx["tiffs"])
+    if name == "reduceJPGs":
+        helpers.reduceJPGs(
+            ctx["jpgs"], logger, ctx["max_dimensions"], ctx["jpg_quality"], out
+        )
+        return len(ctx["jpgs"])
+    if name == "generate_thumbails":
+        helpers.generate_thumbails(ctx["jpgs"], logger, out, "bench", False)
+        return len(ctx["jpgs"])
+    if name == "derivatives":
+        pages = [
+            {
+                "source": t,
+                "jpg": out / "binaries" / (t.stem + ".jpg"),
+                "convert": True,
+                "thumb": out / "binaries" / (t.stem + "_thumb.jpg"),
+            }
+            for t in ctx["tiffs"]
+        ]
+        helpers.createDerivatives(pages, logger, None, ctx["jpg_quality"])
+        return len(pages)
+    if name == "ocr":
+        altos = helpers.ocr(ctx["jpgs"], logger, "deu", out, True, "bench")
+        return len(altos)
+    if name == "mets":
+        return writeMETS(ctx, out)
+    if name == "zip":
+        archive.openArchives(ctx["jpg"]["input"], out)
+        for j in ctx["jpgs"]:
+            archive.writeOutput(out / "binaries" / j.name, j.read_bytes())
+        writeMETS(ctx, out)
+        archive.closeArchives(logger)
+        return len(ctx["jpgs"])
+    raise ValueError(f"Unbekannter Schritt {name}")
+
+
+def writeMETS(ctx: dict, out: Path) -> int:
+    """METS aller Ausgaben, wie in newspaperIssue"""
+    datecreated = time.strftime("%Y-%m-%dT%H:%M:%SZ")
+    n = 0
+    for unit in ctx["jpgindex"]["folders"]:
+        identifier = ctx["jpg"]["input"].name + "__" + unit["name"]
+        jpgs = [out / "binaries" / j.name for j in unit["jpgs"]]
+        thumbs = [out / "binaries" / (j.stem + "_thumb.jpg") for j in unit["jpgs"]]
+        doc = mets.newspaperDocument(
+            ctx["metadata"],
+            __version__,
+            identifier,
+            ctx["jpg"]["input"].name,
+            unit["name"],
+            unit["name"],
+            datecreated,
+            datecreated,
+            jpgs,
+            thumbs,
+            True,
+        )
+        with archive.openOutput(out / (identifier + "_mets.xml")) as f:
+            mets.writeDocument(doc, f)
+        n += len(jpgs)
+    return n
+
+
+def measure(name: str, ctx: dict, workdir: Path, repeat: int) -> dict:
+    """Bestes Ergebnis aus repeat Läufen, jeweils in einen leeren Ausgabe-Ordner"""
+    best = None
+    for r in range(repeat):
+        out = workdir / "out" / name
+        shutil.rmtree(out, ignore_errors=True)
+        Path(out, "binaries").mkdir(parents=True)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        # die Fortschrittsausgaben der Schritte werden nicht mitgemessen
+        with contextlib.redirect_stdout(io.StringIO()):
+            pages = runStage(name, ctx, out)
+        result = {
+            "seconds": time.perf_counter() - wall,
+            "cpu_seconds": time.process_time() - cpu,
+            "pages": pages,
+        }
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    best["pages_per_second"] = (
+        best["pages"] / best["seconds"] if best["seconds"] > 0 else None
+    )
+    return best
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Schritte, die mehr als tolerance langsamer sind als in der Baseline"""
+    if results["corpus"] != baseline["corpus"]:
+        print(
+            "Warnung: die Baseline wurde mit einem anderen Bestand gemessen", flush=True
+        )
+    slower = []
+    for name, stage in results["stages"].items():
+        if name not in baseline["stages"]:
+            continue
+        before = baseline["stages"][name]["seconds"]
+        ratio = stage["seconds"] / before if before > 0 else 1.0
+        stage["baseline_seconds"] = before
+        stage["ratio"] = ratio
+        if ratio > 1 + tolerance:
+            slower.append(name)
+    return slower
+
+
+def report(results: dict) -> None:
+    print(
+        f"{'Schritt':<20} {'Sekunden':>10} {'CPU':>10} {'Seiten/s':>10} {'Baseline':>10}"
+    )
+    for name, s in results["stages"].items():
+        pps = f"{s['pages_per_second']:.1f}" if s["pages_per_second"] else "-"
+        ratio = f"{s['ratio']:.2f}x" if "ratio" in s else "-"
+        print(
+            f"{name:<20} {s['seconds']:>10.3f} {s['cpu_seconds']:>10.3f} {pps:>10} {ratio:>10}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument(
+        "--workdir", help="Ordner für Bestand und Ausgaben (Standard: temporär)"
+    )
+    parser.add_argument("--units", type=int, default=2, help="Zeitungsausgaben")
+    parser.add_argument("--pages", type=int, default=10, help="Seiten pro Ausgabe")
+    parser.add_argument("--width", type=int, default=1500)
+    parser.add_argument("--height", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--stages", default=",".join(STAGES), help="Schritte, durch Komma getrennt"
+    )
+    parser.add_argument("--output", help="Ergebnisse als JSON schreiben")
+    parser.add_argument("--baseline", help="Ergebnisse mit dieser Baseline vergleichen")
+    parser.add_argument("--save-baseline", help="Ergebnisse als Baseline speichern")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="erlaubte Verlangsamung gegenüber der Baseline (0.25 = 25 Prozent)",
+    )
+    args = parser.parse_args()
+    stages = [s for s in args.stages.split(",") if s]
+    for s in stages:
+        if s not in STAGES:
+            parser.error(f"Unbekannter Schritt {s}, möglich: {', '.join(STAGES)}")
+
+    logger.remove()
+    with contextlib.ExitStack() as stack:
+        if args.workdir:
+            workdir = Path(args.workdir)
+            workdir.mkdir(parents=True, exist_ok=True)
+        else:
+            workdir = Path(stack.enter_context(tempfile.TemporaryDirectory()))
+        corpus = {
+            "type": "newspaper",
+            "units": args.units,
+            "pages": args.pages,
+            "width": args.width,
+            "height": args.height,
+        }
+        print("Erzeuge Bestand", flush=True)
+        tif = makeCorpus(workdir / "tif", format="tif", **corpus)
+        jpg = makeCorpus(workdir / "jpg", format="jpg", **corpus)
+        jpgindex = scan.scanFolder(jpg["input"])
+        ctx = {
+            "tif": tif,
+            "jpg": jpg,
+            "tiffs": allPages(scan.scanFolder(tif["input"]), "tiffs"),
+            "jpgs": allPages(jpgindex, "jpgs"),
+            "jpgindex": jpgindex,
+            "metadata": toml.loads(tif["toml"].read_text(encoding="utf-8")),
+            "jpg_quality": 90,
+            "max_dimensions": max(args.width, args.height) // 2,
+        }
+        helpers.TESSERACT["cmd"] = stubCommand(workdir)
+        helpers.TESSERACT["version"] = "stub"
+
+        results = {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "structmeta": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "corpus": corpus,
+            "stages": {},
+        }
+        for name in stages:
+            print(f"Messe {name}", flush=True)
+            results["stages"][name] = measure(name, ctx, workdir, args.repeat)
+
+    slower = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            slower = compare(results, json.load(f), args.tolerance)
+    report(results)
+    for path in [args.output, args.save_baseline]:
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    if slower:
+        print(f"Langsamer als die Baseline: {', '.join(slower)}", flush=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+"""
+Misst die Startzeit von structmeta-cli, jeweils in einem neuen Python Prozess:
+
+    import  -- import structmeta
+    help    -- structmeta-cli --help
+    plan    -- structmeta-cli --plan auf einem kleinen synthetischen Bestand (corpus.py)
+
+Dazu wird festgehalten, welche schweren Pakete (Gooey/wxPython, pandas, PyMuPDF,
+pytesseract, pkg_resources) dabei geladen wurden. Ohne --ocr und ohne Oberfläche sollte
+keines davon auftauchen, sonst endet der Lauf mit Exit Code 1.
+
+Aufruf:
+    python -m benchmarks.startup --save-baseline startup.json
+    python -m benchmarks.startup --baseline startup.json
+    python -m benchmarks.startup --importtime
+
+Mit --importtime werden zusätzlich die Module mit der längsten Importzeit ausgegeben
+(python -X importtime). Baseline und --tolerance wie in run.py.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from structmeta import __version__
+from .corpus import makeCorpus
+from .run import compare
+
+STEPS = ["import", "help", "plan"]
+
+HEAVY = ["gooey", "wx", "pandas", "fitz", "pymupdf", "pytesseract", "pkg_resources"]
+
+# läuft im neuen Prozess: structmeta-cli mit den Argumenten, am Ende die geladenen
+# schweren Pakete auf stderr (auch nach sys.exit, z.B. bei --help)
+CHILD = """
+import atexit, sys
+heavy = {heavy!r}
+atexit.register(
+    lambda: print("HEAVY:" + ",".join(m for m in heavy if m in sys.modules), file=sys.stderr)
+)
+sys.argv = ["structmeta-cli"] + sys.argv[1:]
+import structmeta
+if len(sys.argv) > 1:
+    structmeta.cli()
+"""
+
+
+def arguments(step: str, corpus: dict, out: Path) -> list:
+    if step == "import":
+        return []
+    if step == "help":
+        return ["--help"]
+    if step == "plan":
+        return [
+            "--metadata",
+            str(corpus["toml"]),
+            "--folder",
+            str(corpus["input"]),
+            "--output",
+            str(out),
+            "--plan",
+        ]
+    raise ValueError(f"Unbekannter Schritt {step}")
+
+
+def measure(step: str, corpus: dict, out: Path, repeat: int) -> dict:
+    """Startet structmeta-cli repeat mal, bestes Ergebnis und Median"""
+    code = CHILD.format(heavy=HEAVY)
+    times = []
+    heavy = []
+    for r in range(repeat):
+        start = time.perf_counter()
+        p = subprocess.run(
+            [sys.executable, "-c", code] + arguments(step, corpus, out),
+            capture_output=True,
+            text=True,
+        )
+        times.append(time.perf_counter() - start)
+        if p.returncode != 0:
+            raise RuntimeError(f"{step} fehlgeschlagen:\n{p.stderr}")
+        for line in p.stderr.splitlines():
+            if line.startswith("HEAVY:"):
+                heavy = [m for m in line[6:].split(",") if m]
+    return {
+        "seconds": min(times),
+        "median_seconds": statistics.median(times),
+        "heavy_modules": heavy,
+    }
+
+
+def importtime(top: int) -> list:
+    """Module mit der längsten Importzeit (kumuliert) bei import structmeta"""
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import structmeta"],
+        capture_output=True,
+        text=True,
+    )
+    modules = []
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        modules.append((int(cumulative), name.rstrip()))
+    modules.sort(reverse=True)
+    return modules[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--steps", default=",".join(STEPS), help="Schritte, durch Komma getrennt"
+    )
+    parser.add_argument(
+        "--importtime",
+        action="store_true",
+        help="die langsamsten Importe von structmeta ausgeben",
+    )
+    parser.add_argument("--output", help="Ergebnisse als JSON schreiben")
+    parser.add_argument("--baseline", help="Ergebnisse mit dieser Baseline vergleichen")
+    parser.add_argument("--save-baseline", help="Ergebnisse als Baseline speichern")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="erlaubte Verlangsamung gegenüber der Baseline (0.25 = 25 Prozent)",
+    )
+    args = parser.parse_args()
+    steps = [s for s in args.steps.split(",") if s]
+    for s in steps:
+        if s not in STEPS:
+            parser.error(f"Unbekannter Schritt {s}, möglich: {', '.join(STEPS)}")
+
+    # Bestandsparameter für den Vergleich mit der Baseline
+    corpusparams = {"type": "newspaper", "units": 5, "pages": 4}
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "structmeta": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "corpus": corpusparams,
+        "stages": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = makeCorpus(
+            Path(tmp, "corpus"), format="jpg", width=600, height=800, **corpusparams
+        )
+        out = Path(tmp, "out")
+        out.mkdir()
+        for step in steps:
+            print(f"Messe {step}", flush=True)
+            results["stages"][step] = measure(step, corpus, out, args.repeat)
+
+    slower = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            slower = compare(results, json.load(f), args.tolerance)
+    print(f"{'Schritt':<10} {'Sekunden':>10} {'Median':>10} {'Baseline':>10}  geladen")
+    loaded = []
+    for name, s in results["stages"].items():
+        ratio = f"{s['ratio']:.2f}x" if "ratio" in s else "-"
+        heavy = ", ".join(s["heavy_modules"]) or "-"
+        print(
+            f"{name:<10} {s['seconds']:>10.3f} {s['median_seconds']:>10.3f} {ratio:>10}  {heavy}"
+        )
+        if s["heavy_modules"]:
+            loaded.append(name)
+    if args.importtime:
+        print()
+        print("Langsamste Importe (kumuliert, Sekunden)")
+        for cumulative, name in importtime(20):
+            print(f"{cumulative / 1e6:>10.3f}  {name}")
+    for path in [args.output, args.save_baseline]:
+        if path:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    if loaded:
+        print(f"Schwere Pakete geladen bei: {', '.join(loaded)}", flush=True)
+    if slower:
+        print(f"Langsamer als die Baseline: {', '.join(slower)}", flush=True)
+    if loaded or slower:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
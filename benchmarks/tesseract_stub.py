@@ -0,0 +1,61 @@
+"""
+Ersatz für Tesseract in den Benchmarks. Verhält sich auf der Kommandozeile wie
+Tesseract mit tessedit_create_alto=1 (einzelnes Bild oder Textdatei mit Bildern) und
+schreibt ein kleines ALTO pro Seite. So wird nur structmeta gemessen, nicht die OCR.
+
+Mit der Umgebungsvariable STRUCTMETA_STUB_DELAY (Sekunden pro Seite) kann die Dauer
+einer echten Erkennung nachgestellt werden.
+"""
+
+import os
+import sys
+import time
+from PIL import Image
+
+PAGE = (
+    '<Page WIDTH="{w}" HEIGHT="{h}" PHYSICAL_IMG_NR="{n}" ID="page_{n}">'
+    '<PrintSpace HPOS="0" VPOS="0" WIDTH="{w}" HEIGHT="{h}">'
+    '<TextBlock ID="block_{n}_0" HPOS="10" VPOS="10" WIDTH="100" HEIGHT="20">'
+    '<TextLine ID="line_{n}_0" HPOS="10" VPOS="10" WIDTH="100" HEIGHT="20">'
+    '<String ID="string_{n}_0" HPOS="10" VPOS="10" WIDTH="100" HEIGHT="20" WC="0.90" CONTENT="Benchmark"/>'
+    "</TextLine></TextBlock></PrintSpace></Page>"
+)
+
+
+def main(args):
+    if args and args[0] in ["--version", "-v"]:
+        print("tesseract 5.3.0 (structmeta benchmark stub)")
+        return
+    if args and args[0] == "--list-langs":
+        print("List of available languages (2):\ndeu\neng")
+        return
+    image, outbase = args[0], args[1]
+    if image.endswith(".txt"):
+        with open(image) as f:
+            images = [line.strip() for line in f if line.strip()]
+    else:
+        images = [image]
+    delay = float(os.environ.get("STRUCTMETA_STUB_DELAY", "0"))
+    pages = []
+    for n, path in enumerate(images):
+        if delay:
+            time.sleep(delay)
+        with Image.open(path) as img:
+            w, h = img.size
+        pages.append(PAGE.format(w=w, h=h, n=n))
+    xml = (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<alto xmlns="http://www.loc.gov/standards/alto/ns-v3#">\n'
+        f"<Description><MeasurementUnit>pixel</MeasurementUnit><sourceImageInformation>"
+        f"<fileName>{image}</fileName></sourceImageInformation></Description>\n"
+        "<Layout>\n" + "\n".join(pages) + "\n</Layout>\n</alto>\n"
+    )
+    if outbase == "stdout":
+        sys.stdout.write(xml)
+    else:
+        with open(outbase + ".xml", "w", encoding="utf-8") as f:
+            f.write(xml)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -16,12 +16,13 @@ setup(
     author_email="kraegelin@sub.uni-goettingen.de",
     url="https://gitlab.gwdg.de/maps/mmservice",
     license="MIT",
-    packages=find_packages(),
+    packages=find_packages(exclude=["benchmarks"]),
     include_package_data=True,
     install_requires=open("requirements.txt").read().split("\n"),
     entry_points={
         "console_scripts": [
             "structmeta=structmeta:main",
+            "structmeta-cli=structmeta:cli",
         ]
     },
 )
@@ -1,13 +1,37 @@
+"""
+Extrahiert die Bilder aus allen PDFs eines Ordners als JPGs, ein Ordner pro PDF.
+
+Mit --workers werden mehrere PDFs gleichzeitig bearbeitet. PDFs mit mehr als --pages
+Seiten werden zusätzlich in Seitenbereiche aufgeteilt, jeder Worker öffnet das PDF dann
+selbst. Die Dateinamen hängen nur vom PDF und der Seitennummer ab und sind dieselben
+wie bei der Bearbeitung nacheinander.
+"""
+
 import fitz  # PyMuPDF
 import io
 from PIL import Image
 import re
 from pathlib import Path
 from gooey import Gooey, GooeyParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import os
 
+try:
+    from .pdftext import pageAlto
+except ImportError:
+    # PDF2JPG.py wird meist direkt als Skript gestartet
+    from pdftext import pageAlto
+
 
-def extractImagesFromPDF(pdffile, outputfolder, compressionlevel: int):
+def extractImagesFromPDF(
+    pdffile, outputfolder, compressionlevel: int, pages: range = None, alto=False
+):
+    """
+    Arguments:
+        pages -- nur diese Seiten (Index ab 0) bearbeiten, None für alle Seiten
+
+        alto -- die Textebene jeder Seite als ALTO neben das JPG schreiben
+    """
     pdffile = Path(pdffile)
     if date := re.search(r"\d{1,}\.\d{1,}\.\d{2,}", pdffile.stem):
         d = re.sub(r"(\d+)\.(\d+)\.(\d+)", r"\3-\2-\1", date[0])
@@ -21,25 +45,55 @@ def extractImagesFromPDF(pdffile, outputfolder, compressionlevel: int):
     # iterate over PDF pages
     n = 0
     allpages = len(pdf_file)
-    for page_index in range(allpages):
+    if pages is None:
+        pages = range(allpages)
+    for page_index in pages:
         n += 1
-        print(f"Speichere Datei {n} von {allpages}", flush=True)
+        if len(pages) == allpages:
+            print(f"Speichere Datei {n} von {allpages}", flush=True)
         # get the page itself
         page = pdf_file[page_index]
+        extracted = None
         for image_index, img in enumerate(page.get_images(), start=1):
             # get the XREF of the image
             xref = img[0]
             # extract the image bytes
             base_image = pdf_file.extract_image(xref)
             image_bytes = base_image["image"]
-            # load it to PIL
-            image = Image.open(io.BytesIO(image_bytes))
-            # save it to local disk
             if isodate:
                 filename = f"{isodate}--{pdffile.stem}_{page_index+1:02}.jpg"
             else:
                 filename = f"{pdffile.stem}__{page_index+1:02}.jpg"
+            # bei mehreren Bildern auf der Seite bleibt (wie beim JPG) das letzte
+            extracted = (xref, base_image["width"], base_image["height"], filename)
+            if base_image["ext"] in ["jpeg", "jpg"]:
+                # schon ein JPG (DCTDecode): unverändert schreiben, ohne Dekodieren und
+                # erneutes Komprimieren, das wäre langsam und kostet Qualität
+                Path(outputfolder, filename).write_bytes(image_bytes)
+                continue
+            # load it to PIL
+            image = Image.open(io.BytesIO(image_bytes))
+            # save it to local disk
             image.save(Path(outputfolder, filename), "JPEG", quality=compressionlevel)
+        if alto and extracted is not None:
+            xml = pageAlto(page, *extracted)
+            if xml is not None:
+                Path(outputfolder, Path(extracted[3]).stem + ".xml").write_bytes(xml)
+    pdf_file.close()
+
+
+def pdfJobs(pdffiles: list, pagesperjob: int) -> list:
+    """
+    Teilt die PDFs in Aufträge (PDF, Seitenbereich) für den Prozess-Pool auf. PDFs mit
+    mehr als pagesperjob Seiten werden in Seitenbereiche aufgeteilt.
+    """
+    jobs = []
+    for f in pdffiles:
+        with fitz.open(f) as pdf_file:
+            allpages = len(pdf_file)
+        for start in range(0, allpages, max(pagesperjob, 1)):
+            jobs.append((f, range(start, min(start + pagesperjob, allpages))))
+    return jobs
 
 
 @Gooey(program_name="PDF Image Extraktor", required_cols=1, default_size=(550, 450))
@@ -49,16 +103,68 @@ def cli():
         "Ordner", help="Bitte den Ordner mit PDFs auswählen", widget="DirChooser"
     )
     parser.add_argument("-c", "--compression", type=int)
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        default=1,
+        help="Anzahl der Prozesse, die gleichzeitig PDFs bearbeiten",
+    )
+    parser.add_argument(
+        "-p",
+        "--pages",
+        type=int,
+        default=100,
+        help="PDFs mit mehr Seiten werden mit --workers in Bereiche dieser Größe aufgeteilt",
+    )
+    parser.add_argument(
+        "-a",
+        "--alto",
+        action="store_true",
+        help="Textebene der PDFs als ALTO neben die JPGs schreiben (statt später OCR)",
+    )
     args = parser.parse_args()
     inputfolder = Path(args.Ordner)
     compressionlevel = args.compression
     if compressionlevel is None:
         compressionlevel = 90
-    for f in inputfolder.glob("*.pdf"):
-        print(f"Bearbeite {f}", flush=True)
-        outputfolder = Path(os.getcwd(), f.stem)
-        outputfolder.mkdir(exist_ok=True)
-        extractImagesFromPDF(f, outputfolder, compressionlevel)
+    pdffiles = sorted(inputfolder.glob("*.pdf"))
+    if args.workers > 1 and len(pdffiles) != 0:
+        jobs = pdfJobs(pdffiles, args.pages)
+        print(
+            f"Bearbeite {len(pdffiles)} PDFs in {len(jobs)} Teilen mit {args.workers} Prozessen",
+            flush=True,
+        )
+        for f in pdffiles:
+            Path(os.getcwd(), f.stem).mkdir(exist_ok=True)
+        with ProcessPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(
+                    extractImagesFromPDF,
+                    f,
+                    Path(os.getcwd(), f.stem),
+                    compressionlevel,
+                    pages,
+                    args.alto,
+                ): (f, pages)
+                for f, pages in jobs
+            }
+            n = 0
+            for future in as_completed(futures):
+                n += 1
+                f, pages = futures[future]
+                # Fehler in einem Worker wie bei der Bearbeitung nacheinander weitergeben
+                future.result()
+                print(
+                    f"Fortschritt: {n} von {len(jobs)} ({f.name}, Seiten {pages.start + 1} bis {pages.stop})",
+                    flush=True,
+                )
+    else:
+        for f in pdffiles:
+            print(f"Bearbeite {f}", flush=True)
+            outputfolder = Path(os.getcwd(), f.stem)
+            outputfolder.mkdir(exist_ok=True)
+            extractImagesFromPDF(f, outputfolder, compressionlevel, alto=args.alto)
     print(f"Alle PDFs konvertiert.", flush=True)
 
 
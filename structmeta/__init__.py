@@ -1,19 +1,27 @@
 import re
 import toml
-from natsort import natsorted
 import time
 import uuid
-import pandas as pd
 import sys
-from lxml import etree
+import argparse
 from loguru import logger
 from pathlib import Path
-from gooey import Gooey, GooeyParser
 from .helpers import *
 import os
 import codecs
 from typing import List, Tuple, Union
-import pkg_resources
+from . import manifest as manifests
+from . import cache
+from . import archive
+from . import mets
+from . import scan
+from . import plan as plans
+from . import metrics
+from . import profiling
+from . import hooks
+from importlib.metadata import version
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
 
 if sys.stdout.encoding != "UTF-8":
     sys.stdout = codecs.getwriter("utf-8")(sys.stdout.buffer, "strict")
@@ -21,71 +29,89 @@ if sys.stderr.encoding != "UTF-8":
     sys.stderr = codecs.getwriter("utf-8")(sys.stderr.buffer, "strict")
 
 # get version from setup.py
-__version__ = pkg_resources.require("structmeta")[0].version
+# (importlib.metadata statt pkg_resources, das beim Import alle Pakete prüft und lange braucht)
+__version__ = version("structmeta")
+
+# Gooey (wxPython) wird nur für die grafische Oberfläche geladen, siehe main()
+GOOEY = {
+    "program_name": "Structmeta",
+    "required_cols": 1,
+    "requires_shell": False,
+    "default_size": (600, 715),
+    "menu": [
+        {
+            "name": "Help",
+            "items": [
+                {
+                    "type": "AboutDialog",
+                    "menuTitle": "About",
+                    "name": "Structmeta",
+                    "description": "METS/MODS aus Ordnerstrukturen erzeugen",
+                    "version": __version__,
+                    "copyright": "2022",
+                    "developer": "Karl Krägelin (mail@karlkraeglin.de)",
+                    "license": "MIT",
+                }
+            ],
+        }
+    ],
+}
 
 
-def getpictures(folder: Path, max_dimensions, jpg_quality: int, outputfolder):
-    """Function to process all image needs
+def workerSettings() -> dict:
+    """Einstellungen des Hauptprozesses, die an Worker-Prozesse weitergegeben werden"""
+    return {
+        "cache": cache.cacheSettings(),
+        "tesseract": dict(helpers.TESSERACT),
+        "archive": archive.archiveSettings(),
+        "metrics": metrics.metricsSettings(),
+        "profile": profiling.profileSettings(),
+        "hooks": hooks.hooksSettings(),
+    }
 
-    Arguments:
-        folder -- Path to folder with images
 
-        max_dimensions -- int or None to scale images by
+def initWorker(logger_, settings: dict):
+    """
+    Initialisiert einen Worker-Prozess. Unter Windows werden Prozesse nicht geforkt,
+    daher müssen der Logger und die Einstellungen aus main() übergeben werden.
+    """
+    global logger
+    logger = logger_
+    helpers.TESSERACT.update(settings["tesseract"])
+    cache.setupCache(
+        settings["cache"]["folder"],
+        settings["cache"]["max_size"],
+        settings["cache"]["size"],
+    )
+    archive.setupArchive(settings["archive"])
+    metrics.setupMetrics(settings["metrics"]["path"])
+    profiling.setupProfile(
+        settings["profile"]["folder"], settings["profile"]["memory"], run=False
+    )
+    hooks.setupHooks(settings["hooks"]["modules"], logger_)
 
-        jpg_quality -- int to compress jpgs if generating jpgs
 
-        outputfolder -- folder to output generated jpgs to
+def findpictures(folder: dict):
+    """Die Bilddateien in einem Ordner, ohne sie zu bearbeiten
+
+    Arguments:
+        folder -- Ordner aus dem Index (siehe scan.scanFolder)
 
     Returns:
-        jpgs -- list of jpgs to process further
+        alljpgs -- list of supplied jpgs (without thumbnails), natürlich sortiert
 
         existingthumbs -- list of exitsing thumbnails (can be empty)
 
-        initialpictureformat -- suffix of supplied images (jpg oder jpeg or tiff/tif)
-
-        alltiffs -- list of file paths to supplied TIF files
-
+        alltiffs -- list of supplied TIF files, only filled if there are no jpgs
     """
-
-    alljpgs = []
-    existingthumbs = []
-
-    for ext in ["jpg", "jpeg"]:
-        for i in folder.glob("*." + ext):
-            if "thumb" not in i.name:
-                alljpgs.append(i)
-            elif "thumb" in i.name:
-                existingthumbs.append(i)
+    alljpgs = folder["jpgs"]
+    existingthumbs = folder["thumbs"]
+    alltiffs = []
 
     if len(alljpgs) == 0:
         # wenn wir keine JPGs haben: lese TIFs
-        alltiffs = []
-        for ext in ["tif", "tiff"]:
-            alltiffs.extend(folder.glob("*." + ext))
-        if len(alltiffs) == 0:
-            # wenn wir auch keine TIFs finden, Exit
-            sys.exit("Keine TIFs und keine JPGs gefunden")
-        else:
-            # Wenn wir TIFs finden, aus denen JPGs machen. Die JPGs werden dann direkt schon in den output folder geschrieben
-            initialpictureformat = alltiffs[0].suffix.replace(".", "")
-            helpers.createJPGfromTIFF(
-                alltiffs, logger, max_dimensions, jpg_quality, outputfolder
-            )
-            # wenn TIF, dann verweist JPGs direkt auf die erzeugten JPGs im outputordner
-            jpgs = [
-                Path(outputfolder / "binaries" / (f.stem + ".jpg")) for f in alltiffs
-            ]
-    else:
-        # wir hatten JPGs
-        if max_dimensions:
-            # Bilder verkleinern?
-            helpers.reduceJPGs(
-                alljpgs, logger, max_dimensions, jpg_quality, outputfolder
-            )
-        initialpictureformat = alljpgs[0].suffix.replace(".", "")
-        jpgs = alljpgs
-        alltiffs = []
-    return jpgs, existingthumbs, initialpictureformat, alltiffs
+        alltiffs = folder["tiffs"]
+    return alljpgs, existingthumbs, alltiffs
 
 
 def read_metadata(filepath):
@@ -98,105 +124,130 @@ def read_metadata(filepath):
         return metadata
 
 
-def flgrp(listofjpgs: Path):
-    listofjpgs = [j.stem + j.suffix for j in listofjpgs]
-    n = 0
-    x = ""
-    for i in listofjpgs:
-        n += 1
-        padded_n = int(str(n).zfill(3))
-        x += f"""<mets:file MIMETYPE="image/jpg" ID="default_{padded_n}">
-            <mets:FLocat LOCTYPE="URL" xlink:href="{i}"/>
-        </mets:file>"""
-    return x
-
+def newspaperMETS(
+    index: dict,
+    metadata,
+    do_thumbs,
+    OCR,
+    outputfolder,
+    create_filegrp_fulltext,
+    tesseract_language,
+    renameimages,
+    max_dimensions,
+    jpg_quality,
+    fast_scaling: bool = False,
+    workers: int = 1,
+    manifest: dict = None,
+):
+    """
+    Ausgabe: Pro Ausgabe (Unterordner mit ISO Datum) eine METS Datei.
+    index ist der Index des Ordners der Zeitung (siehe scan.scanFolder).
 
-def flgrp_thumbs(listofthumbs: Path):
-    listofthumbs = [j.stem + j.suffix for j in listofthumbs]
-    n = 0
-    x = ""
-    for i in listofthumbs:
-        n += 1
-        padded_n = int(str(n).zfill(3))
-        x += f"""<mets:file MIMETYPE="image/jpg" ID="thumb_{padded_n}">
-            <mets:FLocat LOCTYPE="URL" xlink:href="{i}"/>
-        </mets:file>"""
-    return x
+    Mit workers > 1 werden die Ausgaben in einem Prozess-Pool parallel bearbeitet.
+    Die erzeugten METS Dateien sind dieselben wie bei der seriellen Bearbeitung.
 
+    Mit einem manifest (siehe manifest.openManifest) werden unveränderte Ausgaben übersprungen.
+    """
 
-def structMapPhysical(listofjpgs, OCR, create_filegrp_fulltext):
-    n = 0
-    x = ""
+    zdb_id = index["name"]
+    issuefolders = index["folders"]
 
-    for i in listofjpgs:
-        n += 1
-        if OCR == True or create_filegrp_fulltext == True:
-            x += f"""<mets:div xmlns:xs="http://www.w3.org/2001/XMLSchema" TYPE="page" ID="phys_{n}" CONTENTIDS="NULL" ORDER="{n}" ORDERLABEL="{n}">
-                    <mets:fptr FILEID="default_{n}"/>
-                    <mets:fptr FILEID="thumb_{n}"/>
-                     <mets:fptr FILEID="ocr_{n}"/>
-                </mets:div>"""
+    # Wie bei der seriellen Bearbeitung werden nur die Ausgaben bis zur ersten
+    # Ausgabe ohne ISO Datum bearbeitet.
+    issues = []
+    for issue in issuefolders:
+        isodate = re.findall(r"(\d{4}-\d{2}-\d{2})", issue["name"])
+        if len(isodate) != 0:
+            issues.append((issue, isodate[0]))
         else:
-            x += f"""<mets:div xmlns:xs="http://www.w3.org/2001/XMLSchema" TYPE="page" ID="phys_{n}" CONTENTIDS="NULL" ORDER="{n}" ORDERLABEL="{n}">
-                    <mets:fptr FILEID="default_{n}"/>
-                    <mets:fptr FILEID="thumb_{n}"/>
-                </mets:div>"""
-    return x
-
+            dateless = issue
+            break
+    else:
+        dateless = None
+
+    args = (
+        zdb_id,
+        metadata,
+        do_thumbs,
+        OCR,
+        outputfolder,
+        create_filegrp_fulltext,
+        tesseract_language,
+        renameimages,
+        max_dimensions,
+        jpg_quality,
+        fast_scaling,
+        manifest is not None,
+    )
 
-def structLink(divid, listofjpgs, startpage):
-    """
-    Wird aufgerufen, wenn es Struktudaten gibt. Für jedes Strukturelement übergeben
-    bekommt die Funktion die ID der DMDSec und eine liste mit Bildern zu diesem Element
-    """
-    n = startpage
-    x = ""
-    for i in listofjpgs:
-        n += 1
-        x += f'<mets:smLink xlink:from="{divid}" xlink:to="phys_{n}"/>\n'
-    return x
-
-
-def createDMDsec(elemname, idno):
-    xml = f"""
-    <mets:dmdSec ID="DMDLOG_{idno}">
-            <mets:mdWrap MDTYPE="MODS">
-                <mets:xmlData>
-                    <mods:mods xmlns:mods="http://www.loc.gov/mods/v3">
-                        <mods:titleInfo>
-                            <mods:title>{elemname}</mods:title>
-                        </mods:titleInfo>
-                    </mods:mods>
-                </mets:xmlData>
-            </mets:mdWrap>
-    </mets:dmdSec>
-    """
-    return xml
-
-
-def flgrp_fulltext(listofjpgs, OCR, create_filegrp_fulltext):
-    listofjpgs = [j.stem + j.suffix for j in listofjpgs]
-    if OCR == True or create_filegrp_fulltext == True:
-        n = 0
-        start = '<mets:fileGrp USE="FULLTEXT">'
-        end = "</mets:fileGrp>"
-        x = ""
-
-        listofjpgs = natsorted(listofjpgs)
-        for i in listofjpgs:
-            n += 1
-            padded_n = int(str(n).zfill(3))
-            filename = i.split(".")[0] + ".xml"
-            x += f"""<mets:file MIMETYPE="text/xml" ID="ocr_{padded_n}">
-                <mets:FLocat LOCTYPE="URL" xlink:href="{filename}"/>
-            </mets:file>"""
-        return start + x + end
+    i = 0
+    if manifest is not None:
+        # unveränderte Ausgaben gar nicht erst an die Worker geben
+        changed = []
+        for issue, dateissued in issues:
+            if manifests.isUnchanged(manifest, issue):
+                i += 1
+                print(f"Fortschritt: {i} von {len(issuefolders)}", flush=True)
+                logger.info(f"{issue['name']} ist unverändert und wird übersprungen")
+            else:
+                changed.append((issue, dateissued))
+        issues = changed
+
+    if workers > 1 and len(issues) > 1:
+        print(f"Bearbeite Ausgaben mit {workers} Prozessen", flush=True)
+        logger.info(f"Bearbeite Ausgaben mit {workers} Prozessen")
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=initWorker,
+            initargs=(logger, workerSettings()),
+        ) as executor:
+            futures = [
+                executor.submit(newspaperIssue, issue, dateissued, *args)
+                for issue, dateissued in issues
+            ]
+            for future in as_completed(futures):
+                i += 1
+                print(f"Fortschritt: {i} von {len(issuefolders)}", flush=True)
+                result = future.result()
+                if result is False:
+                    # wie im seriellen Modus wird nach einem Fehler abgebrochen
+                    executor.shutdown(cancel_futures=True)
+                    return
+                archive.addMembers(result["members"])
+                # Messwerte und Hooks für das Schreiben der Einträge im Hauptprozess
+                metrics.beginUnit(Path(result["folder"]).name)
+                hooks.SETTINGS["unit"] = Path(result["folder"]).name
+                metrics.zipStage(0)
+                if manifest is not None and result["complete"]:
+                    manifests.recordUnit(
+                        manifest, result["folder"], result["sources"], result["outputs"]
+                    )
     else:
-        return ""
+        for issue, dateissued in issues:
+            i += 1
+            print(f"Fortschritt: {i} von {len(issuefolders)}", flush=True)
+            result = newspaperIssue(issue, dateissued, *args)
+            if result is False:
+                return
+            if manifest is not None and result["complete"]:
+                manifests.recordUnit(
+                    manifest, result["folder"], result["sources"], result["outputs"]
+                )
 
+    if dateless is not None:
+        print(
+            f"Bei {dateless['path']} konnte kein ISO Tagesdatum erkannt werden.",
+            flush=True,
+        )
+        logger.error(
+            f"Bei {dateless['path']} konnte kein ISO Tagesdatum erkannt werden."
+        )
 
-def newspaperMETS(
-    folder,
+
+def newspaperIssue(
+    issue: dict,
+    dateissued: str,
+    zdb_id: str,
     metadata,
     do_thumbs,
     OCR,
@@ -206,32 +257,37 @@ def newspaperMETS(
     renameimages,
     max_dimensions,
     jpg_quality,
-):
-
-    zdb_id = folder.name
-    issuefolders = [f for f in folder.glob("*") if f.is_dir()]
-    i = 0
-
-    for issue in issuefolders:
-        i += 1
-        print(f"Fortschritt: {i} von {len(issuefolders)}", flush=True)
-        isodate = re.findall(r"(\d{4}-\d{2}-\d{2})", issue.name)
-        if len(isodate) != 0:
-            dateissued = isodate[0]
-        else:
-            print(f"Bei {issue} konnte kein ISO Tagesdatum erkannt werden.", flush=True)
-            logger.error(f"Bei {issue} konnte kein ISO Tagesdatum erkannt werden.")
-            break
-        modsnumber = re.sub(r"(\d{4})-(\d{2})-(\d{2})", r"\3.\2.\1", dateissued)
-        identifier = zdb_id + "__" + issue.name
-        datecreated = time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        recordChangeDate = datecreated
-        if "imagebaseurl" in metadata["objects"]:
-            imagebaseurl = metadata["objects"]["imagebaseurl"]
-        else:
-            imagebaseurl = None
+    fast_scaling: bool = False,
+    incremental: bool = False,
+) -> Union[dict, bool]:
+    """
+    Bearbeitet eine einzelne Zeitungsausgabe: Bilder, Thumbnails, OCR und METS Datei.
+    Läuft entweder im Hauptprozess oder in einem Worker-Prozess. issue ist der Ordner
+    der Ausgabe aus dem Index (siehe scan.scanFolder).
 
-        jpgs, thumbs = processImages(
+    Returns:
+        False, wenn die METS Datei nicht erstellt werden konnte. Sonst ein dict mit
+        dem Ordner der Ausgabe ("folder"), den erzeugten Dateien ("outputs"),
+        bei incremental den Ausgangsdateien für das Manifest ("sources") und den in
+        einem Worker-Prozess gesammelten ZIP Einträgen ("members", siehe archive).
+    """
+    modsnumber = re.sub(r"(\d{4})-(\d{2})-(\d{2})", r"\3.\2.\1", dateissued)
+    identifier = zdb_id + "__" + issue["name"]
+    datecreated = time.strftime("%Y-%m-%dT%H:%M:%SZ")
+    recordChangeDate = datecreated
+    if "imagebaseurl" in metadata["objects"]:
+        imagebaseurl = metadata["objects"]["imagebaseurl"]
+    else:
+        imagebaseurl = None
+
+    archive.beginUnit(issue["name"])
+    # Fehler einer vorher abgebrochenen Einheit nicht mitzählen
+    helpers.takeOcrFailures()
+    metrics.beginUnit(issue["name"])
+    hooks.beginUnit(issue["name"], issue["path"], scan.countPages(issue))
+    written = False
+    try:
+        jpgs, thumbs, outputs = processImages(
             issue,
             max_dimensions,
             jpg_quality,
@@ -242,117 +298,66 @@ def newspaperMETS(
             renameimages,
             OCR,
             imagebaseurl,
+            fast_scaling,
         )
 
-        metsvorlage = f"""
-            <mets:mets
-            OBJID="{identifier}" TYPE="newspaper"
-            xmlns:mets="http://www.loc.gov/METS/"
-            xmlns:xlink="http://www.w3.org/1999/xlink"
-            xmlns:mods="http://www.loc.gov/mods/v3"
-            xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"
-                xsi:schemaLocation="http://www.loc.gov/mods/v3 http://www.loc.gov/standards/mods/v3/mods-3-8.xsd http://www.loc.gov/METS/ http://www.loc.gov/standards/mets/mets.xsd">
-                <mets:metsHdr CREATEDATE="{time.strftime("%Y-%m-%dT%H:%M:%SZ")}" LASTMODDATE="{datecreated}">
-                    <mets:agent
-                        xmlns:dv="http://dfg-viewer.de/" ROLE="CREATOR" TYPE="ORGANIZATION">
-                        <mets:name>{metadata['institution']['name']}</mets:name>
-                    </mets:agent>
-                    <mets:agent ROLE="OTHER" TYPE="OTHER" OTHERTYPE="SOFTWARE">
-                        <mets:name>Structmeta {__version__}</mets:name>
-                    </mets:agent>
-                </mets:metsHdr>
-                <mets:dmdSec ID="dmd">
-                    <mets:mdWrap MDTYPE="MODS">
-                        <mets:xmlData>
-                            <mods:mods>
-                                <mods:part order="{re.sub("-", "", dateissued)}">
-                                    <mods:detail type="issue">
-                                        <mods:number>{modsnumber}</mods:number>
-                                    </mods:detail>
-                                </mods:part>
-                                <mods:originInfo eventType="publication">
-                                    <mods:dateIssued encoding="iso8601">{dateissued}</mods:dateIssued>
-                                </mods:originInfo>
-                                <mods:originInfo eventType="digitization">
-                                    <mods:dateCaptured encoding="iso8601">{metadata['objects']['year_of_digitization']}</mods:dateCaptured>
-                                    <mods:publisher>{metadata['institution']['name']}</mods:publisher>
-                                </mods:originInfo>
-                                <mods:language>
-                                    <mods:languageTerm type="code" valueURI="http://id.loc.gov/vocabulary/iso639-2/ger">{metadata['objects']['sprache']}</mods:languageTerm>
-                                </mods:language>
-                                <mods:physicalDescription>
-                                    <mods:extent>{len(jpgs)} Seiten</mods:extent>
-                                </mods:physicalDescription>
-                                <mods:relatedItem type="host">
-                                    <mods:identifier type="zdb">{zdb_id}</mods:identifier>
-                                    <mods:titleInfo>
-                                        <mods:title>{metadata['objects']['title']}</mods:title>
-                                    </mods:titleInfo>
-                                </mods:relatedItem>
-                                <mods:recordInfo>
-                                    <mods:recordIdentifier source="{metadata['institution']['isil']}">{identifier}</mods:recordIdentifier>
-                                    <mods:recordChangeDate encoding="iso8601">{recordChangeDate}</mods:recordChangeDate>
-                                </mods:recordInfo>
-                                <mods:genre displayLabel="document type">issue</mods:genre>
-                                <mods:typeOfResource>text</mods:typeOfResource>
-                            </mods:mods>
-                        </mets:xmlData>
-                    </mets:mdWrap>
-                </mets:dmdSec>
-                <mets:amdSec xmlns:dv="http://dfg-viewer.de/" ID="amd">
-                    <mets:rightsMD ID="RIGHTS">
-                        <mets:mdWrap MIMETYPE="text/xml" MDTYPE="OTHER" OTHERMDTYPE="DVRIGHTS">
-                            <mets:xmlData>
-                                <dv:rights>
-                                <dv:owner>{metadata['institution']['name']}</dv:owner>
-                                        <dv:ownerLogo>{metadata['institution']['logoURL']}</dv:ownerLogo>
-                                        <dv:ownerSiteURL>{metadata['institution']['siteURL']}</dv:ownerSiteURL>
-                                        <dv:ownerContact>{metadata['institution']['contact']}</dv:ownerContact>
-                                        <dv:license>{metadata['institution']['license']}</dv:license>
-                                        {'<dv:sponsor>' + metadata['institution']['sponsor'] + '</dv:sponsor>' if 'sponsor' in metadata['institution'] else ''}
-                                </dv:rights>
-                            </mets:xmlData>
-                        </mets:mdWrap>
-                    </mets:rightsMD>
-                </mets:amdSec>
-                <mets:fileSec>
-                    <mets:fileGrp USE="DEFAULT">
-                        {flgrp(jpgs)}
-                    </mets:fileGrp>
-                    <mets:fileGrp USE="THUMBS">
-                        {flgrp_thumbs(thumbs)}
-                    </mets:fileGrp>
-                    {flgrp_fulltext(jpgs, OCR, create_filegrp_fulltext)}
-                </mets:fileSec>
-                <mets:structMap TYPE="PHYSICAL">
-                    <mets:div ID="phys" CONTENTIDS="NULL" TYPE="physSequence">
-                        {structMapPhysical(jpgs, OCR, create_filegrp_fulltext)}
-                    </mets:div>
-                </mets:structMap>
-                <mets:structMap TYPE="LOGICAL">
-                    <mets:div TYPE="issue" ID="LOG" DMDID="dmd" ADMID="amd" ORDER="1" ORDERLABEL="{dateissued}" LABEL="{metadata['objects']['title'] + ' ' + modsnumber }"></mets:div>
-                </mets:structMap>
-                <mets:structLink>
-                        {structLink('LOG', jpgs, 0)}
-                </mets:structLink>
-            </mets:mets>
-        """
-
-        metsvorlage = re.sub("&", "&amp;", metsvorlage)
-        try:
-            # Output auf Validität prüfen und speichern
-            doc = etree.fromstring(metsvorlage)
-        except etree.XMLSyntaxError as e:
-            logger.warning(f"Fehler beim parsen des erstellen XML: {e}")
-            return
-        else:
-            with open(outputfolder / (identifier + "_mets.xml"), "w") as f:
-                f.write(etree.tostring(doc, encoding="unicode", pretty_print=True))
-            logger.info(f"Wrote METS/MODS: {issue.name}_mets.xml")
+        metsstart = time.perf_counter()
+        with metrics.stage("mets", len(jpgs)):
+            try:
+                doc = mets.newspaperDocument(
+                    metadata,
+                    __version__,
+                    identifier,
+                    zdb_id,
+                    dateissued,
+                    modsnumber,
+                    datecreated,
+                    recordChangeDate,
+                    jpgs,
+                    thumbs,
+                    OCR == True or create_filegrp_fulltext == True,
+                )
+            except ValueError as e:
+                # z.B. Steuerzeichen in den Metadaten, die in XML nicht erlaubt sind
+                logger.warning(f"Fehler beim Erstellen des XML: {e}")
+                return False
+            else:
+                with archive.openOutput(outputfolder / (identifier + "_mets.xml")) as f:
+                    mets.writeDocument(doc, f)
+                logger.info(f"Wrote METS/MODS: {issue['name']}_mets.xml")
+                if hooks.HOOKS["mets_written"]:
+                    hooks.emit(
+                        "mets_written",
+                        {
+                            "path": outputfolder / (identifier + "_mets.xml"),
+                            "pages": len(jpgs),
+                            "seconds": time.perf_counter() - metsstart,
+                        },
+                    )
+                outputs.append(outputfolder / (identifier + "_mets.xml"))
+                outputs = archive.archivedOutputs(outputs)
+                written = True
+        metrics.zipStage(len(jpgs))
+        ocrfailed = helpers.takeOcrFailures()
+        if incremental and ocrfailed > 0:
+            logger.warning(
+                f"{issue['name']} nicht im Manifest gespeichert, {ocrfailed} Seiten ohne OCR"
+            )
+        return {
+            "folder": issue["path"],
+            "outputs": outputs,
+            "sources": manifests.fingerprint(issue) if incremental else None,
+            # fehlende ALTO Dateien: nicht im Manifest speichern, beim nächsten Lauf neu
+            "complete": ocrfailed == 0,
+            # in einem Worker-Prozess mit --zip: die Einträge für die ZIP Dateien
+            "members": archive.takeMembers(),
+        }
+    finally:
+        archive.endUnit(failed=not written)
 
 
 def monographMETS(
-    folder,
+    index: dict,
     metadata,
     do_thumbs,
     OCR,
@@ -362,201 +367,156 @@ def monographMETS(
     renameimages,
     max_dimensions,
     jpg_quality,
+    fast_scaling: bool = False,
+    manifest: dict = None,
 ):
     i = 0
-    bookfolders = [f for f in folder.glob("*") if f.is_dir()]
+    bookfolders = index["folders"]
     for book in bookfolders:
         # jedes Buch ist ein Pfad zu einem Ordner
-        booktitle = book.name.split("_")[0]
+        booktitle = book["name"].split("_")[0]
         datecreated = time.strftime("%Y-%m-%dT%H:%M:%SZ")
         i += 1
         print(f"Fortschritt: {i} von {len(bookfolders)} Büchern", flush=True)
-        strukturdaten = [f for f in book.glob("*") if f.is_dir()]
-        additionalslogs = []
-        additionalslogsDMDIDs = []
-        slink = ""
-        if "imagebaseurl" in metadata["objects"]:
-            imagebaseurl = metadata["objects"]["imagebaseurl"]
-        else:
-            imagebaseurl = None
-        if strukturdaten:
-            alljpgs = []
-            allthumbs = []
-            print("Strukturdaten erkannt", flush=True)
-            idno = 1
-            maxnumber = 0
-
-            for elem in natsorted(strukturdaten):
-                elemname = elem.name.split("_")[-1]
-                print(f"Bearbeite Strukturelement {elemname}", flush=True)
-                structjpgs, structthumbs = processImages(
-                    elem,
+        if manifest is not None and manifests.isUnchanged(manifest, book):
+            logger.info(f"{book['name']} ist unverändert und wird übersprungen")
+            continue
+        outputs = []
+        archive.beginUnit(book["name"])
+        # Fehler einer vorher abgebrochenen Einheit nicht mitzählen
+        helpers.takeOcrFailures()
+        metrics.beginUnit(book["name"])
+        hooks.beginUnit(book["name"], book["path"], scan.countPages(book))
+        written = False
+        try:
+            strukturdaten = book["folders"]
+            additionalslogsDMDIDs = []
+            links = []
+            if "imagebaseurl" in metadata["objects"]:
+                imagebaseurl = metadata["objects"]["imagebaseurl"]
+            else:
+                imagebaseurl = None
+            if strukturdaten:
+                alljpgs = []
+                allthumbs = []
+                print("Strukturdaten erkannt", flush=True)
+                idno = 1
+                maxnumber = 0
+
+                for elem in strukturdaten:
+                    elemname = elem["name"].split("_")[-1]
+                    print(f"Bearbeite Strukturelement {elemname}", flush=True)
+                    structjpgs, structthumbs, structoutputs = processImages(
+                        elem,
+                        max_dimensions,
+                        jpg_quality,
+                        tesseract_language,
+                        booktitle.replace(" ", "_")
+                        + "_"
+                        + elemname.replace(" ", "_")
+                        + "_",
+                        do_thumbs,
+                        outputfolder,
+                        renameimages,
+                        OCR,
+                        imagebaseurl,
+                        fast_scaling,
+                    )
+                    alljpgs.extend(structjpgs)
+                    allthumbs.extend(structthumbs)
+                    outputs.extend(structoutputs)
+                    # wir müssen wissen bei welcher Physischen Seite wird an sich sind
+                    # ein elem ist ein Unterornder unter dem book
+                    # structjpgs = [f for f in list(Path(elem).glob("**/*.jpg"))]
+                    links.append(
+                        mets.structLink(f"LOG_{idno + 1}", len(structjpgs), maxnumber)
+                    )
+                    maxnumber += len(structjpgs)
+
+                    idno += 1
+                    # für jede Strukturebene wird eine weitere dmdSec erstellt
+                    d = {"name": "", "idno": ""}
+                    d["name"] = elemname
+                    d["idno"] = idno
+                    additionalslogsDMDIDs.append(d)
+
+                links.append(mets.structLink("LOG_1", len(alljpgs), 0))
+            else:
+                alljpgs, allthumbs, outputs = processImages(
+                    book,
                     max_dimensions,
                     jpg_quality,
                     tesseract_language,
-                    booktitle.replace(" ", "_")
-                    + "_"
-                    + elemname.replace(" ", "_")
-                    + "_",
+                    booktitle.replace(" ", "_"),
                     do_thumbs,
                     outputfolder,
                     renameimages,
                     OCR,
                     imagebaseurl,
+                    fast_scaling,
                 )
-                alljpgs.extend(structjpgs)
-                allthumbs.extend(structthumbs)
-                # wir müssen wissen bei welcher Physischen Seite wird an sich sind
-                # ein elem ist ein Unterornder unter dem book
-                # structjpgs = [f for f in list(Path(elem).glob("**/*.jpg"))]
-                slink += structLink(f"LOG_{idno + 1}", structjpgs, maxnumber)
-                maxnumber += len(structjpgs)
-
-                idno += 1
-                # für jede Strukturebene eine weitere dmdSec erstellen und die an eine Liste mit weiteren dmdSecs anhängen
-                additionalslogs.append(createDMDsec(elemname, idno))
-                d = {"name": "", "idno": ""}
-                d["name"] = elemname
-                d["idno"] = idno
-                additionalslogsDMDIDs.append(d)
-
-            slink += structLink(f"LOG_1", alljpgs, 0)
-        else:
-            alljpgs, allthumbs = processImages(
-                book,
-                max_dimensions,
-                jpg_quality,
-                tesseract_language,
-                booktitle.replace(" ", "_"),
-                do_thumbs,
-                outputfolder,
-                renameimages,
-                OCR,
-                imagebaseurl,
-            )
-            slink += structLink(f"LOG_1", alljpgs, 0)
-
-        if len(additionalslogsDMDIDs) != 0:
-            structmapLogical = f'<mets:div ADMID="AMD" DMDID="DMDLOG_1" ID="LOG_1" LABEL="{booktitle}" TYPE="monograph">'
-            orderid = 0
-            for id in additionalslogsDMDIDs:
-                orderid += 1
-                idno = id["idno"]
-                titel = id["name"]
-                structmapLogical += f'<mets:div ID="LOG_{idno}" DMDID="DMDLOG_{idno}" LABEL="{titel}" TYPE="chapter" ORDER="{orderid}"/>\n'
-            structmapLogical += "</mets:div>"
-        else:
-            # wenn es keine Strukturelemente unterhalb des Buches gibt
-            structmapLogical = f'<mets:div ID="LOG_1" DMDID="DMDLOG_1" LABEL="{booktitle}" TYPE="monograph" ORDER="1"/>\n'
-        recordid = (
-            metadata["institution"]["isil"]
-            + "_"
-            + booktitle.replace(" ", "_").replace(":", "_")
-        )
-        metsvorlage = f"""
-    <mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.loc.gov/mods/v3 http://www.loc.gov/standards/mods/v3/mods-3-8.xsd http://www.loc.gov/METS/ http://www.loc.gov/standards/mets/mets.xsd">
-        <mets:metsHdr CREATEDATE="{time.strftime("%Y-%m-%dT%H:%M:%SZ")}" LASTMODDATE="{datecreated}">
-                    <mets:agent ROLE="CREATOR" TYPE="ORGANIZATION">
-                        <mets:name>{metadata['institution']['name']}</mets:name>
-                    </mets:agent>
-                    <mets:agent ROLE="OTHER" TYPE="OTHER" OTHERTYPE="SOFTWARE">
-                        <mets:name>Structmeta {__version__}</mets:name>
-                    </mets:agent>
-
-        </mets:metsHdr>
-        <mets:dmdSec ID="DMDLOG_1">
-            <mets:mdWrap MDTYPE="MODS">
-                <mets:xmlData>
-                    <mods:mods xmlns:mods="http://www.loc.gov/mods/v3">
-                        <mods:location>
-                            <mods:physicalLocation valueURI="http://ld.zdb-services.de/resource/organisations/{metadata['institution']['isil']}">{metadata['institution']['name']}</mods:physicalLocation>
-                        </mods:location>
-                        <mods:originInfo eventType="publication">
-                           {'<mods:edition>' + metadata['objects']['auflage'] + '</mods:edition>' if 'auflage' in metadata['objects'] else ''}
-                            {'<mods:publisher>' + metadata['objects']['verlag'] + '</mods:publisher>' if 'auflage' in metadata['objects'] else ''}
-                            <mods:place><mods:placeTerm type="text">{metadata['objects']['erscheinungsort']}</mods:placeTerm></mods:place>
-                            {'<mods:dateIssued>' + metadata['objects']['erscheinungsjahr'] + '</mods:dateIssued>' if 'auflage' in metadata['objects'] else ''}
-                        </mods:originInfo>
-                        <mods:originInfo eventType="digitization">
-                            <mods:place>
-                                <mods:placeTerm type="text">{metadata['objects']['place_of_digitization']}</mods:placeTerm>
-                            </mods:place>
-                            <mods:dateCaptured encoding="iso8601">{metadata['objects']['year_of_digitization']}</mods:dateCaptured>
-                            <mods:publisher>{metadata['institution']['name']}</mods:publisher>
-                            <mods:edition>[Electronic ed.]</mods:edition>
-                        </mods:originInfo>
-                        {'<mods:name type="personal"><mods:displayForm>' + metadata['objects']['autor'] + '</mods:displayForm><mods:role><mods:roleTerm authority="marcrelator" type="code">aut</mods:roleTerm></mods:role> </mods:name>'}
-                        <mods:recordInfo>
-                            <mods:recordIdentifier source="{metadata['institution']['isil']}">{recordid}</mods:recordIdentifier>
-                            <mods:recordCreationDate encoding="iso8601">{datecreated}</mods:recordCreationDate>
-                            <mods:recordInfoNote type="license">{metadata['institution']['license']}</mods:recordInfoNote>
-                        </mods:recordInfo>
-                        <mods:titleInfo>
-                            <mods:title>{booktitle}</mods:title>
-                        </mods:titleInfo>
-                        <mods:language><mods:languageTerm authority="iso639-2b" type="code">{metadata['objects']['sprache']}</mods:languageTerm></mods:language>
-                        <mods:physicalDescription>
-                            <mods:extent>{len(alljpgs)}</mods:extent>
-                        </mods:physicalDescription>
-                        <mods:typeOfResource>text</mods:typeOfResource>
-                    </mods:mods>
-                </mets:xmlData>
-            </mets:mdWrap>
-        </mets:dmdSec>
-        {("").join(additionalslogs)}
-        <mets:amdSec ID="AMD">
-            <mets:rightsMD ID="RIGHTS">
-                <mets:mdWrap MDTYPE="OTHER" MIMETYPE="text/xml" OTHERMDTYPE="DVRIGHTS">
-                    <mets:xmlData>
-                        <dv:rights xmlns:dv="http://dfg-viewer.de/">
-                            <dv:owner>{metadata['institution']['name']}</dv:owner>
-                            <dv:ownerLogo>{metadata['institution']['logoURL']}</dv:ownerLogo>
-                            <dv:ownerSiteURL>{metadata['institution']['siteURL']}</dv:ownerSiteURL>
-                            <dv:ownerContact>{metadata['institution']['contact']}</dv:ownerContact>
-                            <dv:license>{metadata['institution']['license']}</dv:license>
-                            {'<dv:sponsor>' + metadata['institution']['sponsor'] + '</dv:sponsor>' if 'sponsor' in metadata['institution'] else ''}
-                        </dv:rights>
-                    </mets:xmlData>
-                </mets:mdWrap>
-            </mets:rightsMD>
-        </mets:amdSec>
-        <mets:fileSec>
-            <mets:fileGrp USE="DEFAULT">
-                {flgrp(alljpgs)}
-            </mets:fileGrp>
-            <mets:fileGrp USE="THUMBS">
-                {flgrp_thumbs(allthumbs)}
-            </mets:fileGrp>
-        </mets:fileSec>
-        <mets:structMap TYPE="LOGICAL">
-                {structmapLogical}
-        </mets:structMap>
-        <mets:structMap TYPE="PHYSICAL">
-            <mets:div ID="phys" CONTENTIDS="NULL" TYPE="physSequence">
-                {structMapPhysical(alljpgs, OCR, create_filegrp_fulltext)}
-            </mets:div>
-        </mets:structMap>
-        <mets:structLink>
-                {slink}
-        </mets:structLink>
-    </mets:mets>
-    """
+                links.append(mets.structLink("LOG_1", len(alljpgs), 0))
 
-        metsvorlage = re.sub("&", "&amp;", metsvorlage)
-        try:
-            # Output auf Validität prüfen und speichern
-            doc = etree.fromstring(metsvorlage)
-        except etree.XMLSyntaxError as e:
-            logger.warning(f"Fehler beim parsen des erstellen XML: {e}")
-            return
-        else:
-            with open(outputfolder / (book.name + "_mets.xml"), "w") as f:
-                f.write(etree.tostring(doc, encoding="unicode", pretty_print=True))
-            logger.info(f"Wrote METS/MODS: {book.name}_mets.xml")
+            recordid = (
+                metadata["institution"]["isil"]
+                + "_"
+                + booktitle.replace(" ", "_").replace(":", "_")
+            )
+            metsstart = time.perf_counter()
+            with metrics.stage("mets", len(alljpgs)):
+                try:
+                    doc = mets.monographDocument(
+                        metadata,
+                        __version__,
+                        booktitle,
+                        recordid,
+                        datecreated,
+                        alljpgs,
+                        allthumbs,
+                        additionalslogsDMDIDs,
+                        links,
+                        OCR == True or create_filegrp_fulltext == True,
+                    )
+                except ValueError as e:
+                    logger.warning(f"Fehler beim Erstellen des XML: {e}")
+                    return
+                else:
+                    with archive.openOutput(
+                        outputfolder / (book["name"] + "_mets.xml")
+                    ) as f:
+                        mets.writeDocument(doc, f)
+                    logger.info(f"Wrote METS/MODS: {book['name']}_mets.xml")
+                    if hooks.HOOKS["mets_written"]:
+                        hooks.emit(
+                            "mets_written",
+                            {
+                                "path": outputfolder / (book["name"] + "_mets.xml"),
+                                "pages": len(alljpgs),
+                                "seconds": time.perf_counter() - metsstart,
+                            },
+                        )
+                    ocrfailed = helpers.takeOcrFailures()
+                    if manifest is not None and ocrfailed > 0:
+                        # fehlende ALTO Dateien: beim nächsten Lauf neu bearbeiten
+                        logger.warning(
+                            f"{book['name']} nicht im Manifest gespeichert, {ocrfailed} Seiten ohne OCR"
+                        )
+                    elif manifest is not None:
+                        outputs.append(outputfolder / (book["name"] + "_mets.xml"))
+                        manifests.recordUnit(
+                            manifest,
+                            book["path"],
+                            manifests.fingerprint(book),
+                            archive.archivedOutputs(outputs),
+                        )
+                    written = True
+            metrics.zipStage(len(alljpgs))
+        finally:
+            archive.endUnit(failed=not written)
 
 
 def processImages(
-    folder: Path,
+    folder: dict,
     max_dimensions: Union[int, bool],
     jpg_quality: int,
     tesseract_language: Union[str, bool],
@@ -566,104 +526,130 @@ def processImages(
     renameimages: bool,
     OCR: bool,
     imagebaseurl: Union[str, bool],
+    fast_scaling: bool = False,
 ):
     """
-    Diese Funktion regelt alle Angelegenheiten, die die Bilder betreffen:
+    Diese Funktion regelt alle Angelegenheiten, die die Bilder betreffen.
+    folder ist ein Ordner aus dem Index (siehe scan.scanFolder).
     Return:
         - eine Liste mit Pfaden zu den Bilddateien als JPG im Ausgabe Ordner
         - eine Liste mit Pfaden zu den Thumbnails als JPG im Ausgabe Ordner
+        - eine Liste aller in den Ausgabe Ordner geschriebenen Dateien
     """
-    # In der Subfunktion getpictures werden ggf. die Bilder auch komprimiert/kleingerechnet
-    jpgs, existingthumbs, initialpictureformat, alltiffs = getpictures(
-        folder, max_dimensions, jpg_quality, outputfolder
-    )
-    # initialjpgs sollte immer auf die Originalpfade verweisen
-    # jpgs verweist immer auf die entweder erzeugten oder kopierten
-    initialjpgs = jpgs
+    alljpgs, existingthumbs, alltiffs = findpictures(folder)
+    if len(alljpgs) != 0:
+        sources = alljpgs
+    elif len(alltiffs) != 0:
+        sources = alltiffs
+    else:
+        sys.exit("Keine TIFs und keine JPGs gefunden")
+    initialpictureformat = sources[0].suffix.replace(".", "")
+    fromjpgs = initialpictureformat in ["jpg", "jpeg"]
 
     # --------------------------------------
-    # Umbenennen
+    # Derivate planen
     # --------------------------------------
+    # Pro Seite werden die Zielpfade für das Auslieferungs-JPG und das Thumbnail festgelegt,
+    # damit jede Seite in createDerivatives nur einmal dekodiert werden muss.
+    # Die Nummerierung beim Umbenennen folgt wie in renamePictures der natürlichen Sortierung.
+    pages = []
+    n = 0
+    for j in sources:
+        n += 1
+        padded_n = str(n).zfill(3)
+        suffix = j.suffix if fromjpgs else ".jpg"
+        if renameimages == True:
+            stem = identifier + "_" + padded_n
+        else:
+            stem = j.stem
+        page = {
+            "source": j,
+            "jpg": Path(outputfolder / "binaries" / (stem + suffix)),
+            # TIFs werden immer konvertiert, JPGs nur wenn sie verkleinert werden sollen. Sonst wird kopiert.
+            "convert": not fromjpgs or bool(max_dimensions),
+            "thumb": None,
+        }
+        if do_thumbs == True and len(existingthumbs) == 0:
+            page["thumb"] = Path(outputfolder / "binaries" / (stem + "_thumb" + suffix))
+        pages.append(page)
+
+    start = metrics.counters()
+    with profiling.profiled("conversion"):
+        thumbstats = helpers.createDerivatives(
+            pages, logger, max_dimensions, jpg_quality, fast_scaling
+        )
+    metrics.conversionStage(len(pages), start, thumbstats)
+
+    outputs = [page["jpg"] for page in pages]
+    outputs.extend([page["thumb"] for page in pages if page["thumb"] is not None])
+
     if renameimages == True:
-        # wenn umbenannt werde soll:
-        jpgs = helpers.renamePictures(jpgs, identifier, outputfolder, "")
+        jpgs = [page["jpg"] for page in pages]
+    elif fromjpgs:
+        # ohne Umbenennen verweist jpgs auf die Originale, die Namen sind dieselben
+        jpgs = alljpgs
     else:
-        # wenn nicht umbennant werden soll, schauen ob wir ursprünglich JPGs hatten
-        if initialpictureformat in ["jpg", "jpeg"]:
-            # wenn ja, werden die in den outputerfolder kopiert. Wenn nicht sind die JPGs aus den TIF Dateien ja eh dahin erstellt worden
-            if max_dimensions:
-                # wenn max_dimensions vergeben ist, sind die Bilder ja schon verkleinert im Output-Ordner.
-                pass
-            else:
-                for j in initialjpgs:
-                    shutil.copy(str(j), str(Path(outputfolder / "binaries" / j.name)))
-        # --------------------------------------
+        jpgs = [Path(outputfolder / "binaries" / (f.stem + ".jpg")) for f in alltiffs]
+
+    # --------------------------------------
     # Thumbnails
     # --------------------------------------
-    # zwei Möglichkeiten: Es gibt bereits Thumbnails: Dann kopieren - es gibt keine? Dann ggf. erstellen
+    # zwei Möglichkeiten: Es gibt bereits Thumbnails: Dann kopieren - es gibt keine? Dann wurden sie ggf. oben erstellt
     if len(existingthumbs) != 0:
-        # Es gibt bereits Thumbnails
-        if do_thumbs == True:
-            print("Es sind schon Thumbnails vorhanden", flush=True)
-            pass
-        if renameimages == True:
-            # vorhandene Thumbs umbenennen und in den output Ordner kopieren
-            thumbs = helpers.renamePictures(
-                existingthumbs, identifier, outputfolder, "_thumb"
-            )
-        else:
-            # es gibt schon welche und die sollen nicht umbennant weden. Dann werden sie in den Output ordner kopiert.
-            for j in existingthumbs:
-                shutil.copy(str(j), str(Path(outputfolder / "binaries" / j.name)))
-            thumbs = [Path(outputfolder / "binaries" / t) for t in existingthumbs]
-    else:
-        # Es gibt noch keine Thumbails
-        if do_thumbs == True:
+        with metrics.stage("thumbnails", len(existingthumbs)):
+            # Es gibt bereits Thumbnails
+            if do_thumbs == True:
+                print("Es sind schon Thumbnails vorhanden", flush=True)
+                pass
             if renameimages == True:
-                if initialpictureformat in ["jpg", "jpeg"]:
-
-                    helpers.generate_thumbails(
-                        initialjpgs, logger, outputfolder, identifier, rename=True
-                    )
-                    thumbs = [Path(j.stem + "_thumb.jpg") for j in jpgs]
-                else:
-                    helpers.generate_thumbails(
-                        jpgs, logger, outputfolder, identifier, rename=True
-                    )
-                    thumbs = [Path(j.stem + "_thumb.jpg") for j in jpgs]
-            else:
-                # Thumbnails erstellen
-                helpers.generate_thumbails(
-                    jpgs, logger, outputfolder, identifier, rename=False
+                # vorhandene Thumbs umbenennen und in den output Ordner kopieren
+                thumbs = helpers.renamePictures(
+                    existingthumbs, identifier, outputfolder, "_thumb"
                 )
-                thumbs = [Path(j.stem + "_thumb.jpg") for j in jpgs]
-        else:
-            # es gibt keine Thumbnails und es sollen auch keine generiert werden.
-            thumbs = [Path(j.stem + "_thumb.jpg") for j in jpgs]
+                outputs.extend(thumbs)
+            else:
+                # es gibt schon welche und die sollen nicht umbennant weden. Dann werden sie in den Output ordner kopiert.
+                copies = [
+                    (j, Path(outputfolder / "binaries" / j.name))
+                    for j in existingthumbs
+                ]
+                archive.copyOutputs(copies)
+                outputs.extend(path for j, path in copies)
+                thumbs = [Path(outputfolder / "binaries" / t) for t in existingthumbs]
+            if hooks.HOOKS["thumbnail_written"]:
+                # die Ziele wurden in derselben Reihenfolge an outputs angehängt
+                for source, thumb in zip(
+                    existingthumbs, outputs[-len(existingthumbs) :]
+                ):
+                    hooks.emit(
+                        "thumbnail_written",
+                        {
+                            "source": source,
+                            "thumb": thumb,
+                            "method": "copy",
+                            "bytes": source.stat().st_size,
+                            "seconds": None,
+                        },
+                    )
+    else:
+        # es gibt keine Thumbnails: entweder wurden sie erstellt oder es sollen keine generiert werden.
+        thumbs = [Path(j.stem + "_thumb" + j.suffix) for j in jpgs]
     # --------------------------------------
     # OCR
     # --------------------------------------
 
     if OCR == True:
-        if len(alltiffs) != 0:
-            # Wenn es TIFFs waren, dann OCR auf die TIFFs - dann dürfen die JPGs aber nicht kleingerechnet werden...
-            helpers.ocr(
-                alltiffs,
-                logger,
-                tesseract_language,
-                outputfolder,
-                renameimages,
-                identifier,
-            )
-        else:
-            helpers.ocr(
-                jpgs,
+        # OCR immer auf die Ausgangsdateien - dann dürfen die JPGs auch kleingerechnet werden
+        with metrics.stage("ocr", len(sources)):
+            altos = helpers.ocr(
+                sources,
                 logger,
                 tesseract_language,
                 outputfolder,
                 renameimages,
                 identifier,
             )
+        outputs.extend(altos)
     # --------------------------------------
     # URL Prefix
     # --------------------------------------
@@ -677,11 +663,11 @@ def processImages(
             imagebaseurl + str(j.parent.name) + "/" + str(j.stem) + str(j.suffix)
             for j in jpgs
         ]
-    return jpgs, thumbs
+    return jpgs, thumbs, outputs
 
 
 def journalMETS(
-    folder,
+    index: dict,
     metadata,
     do_thumbs,
     OCR,
@@ -691,203 +677,154 @@ def journalMETS(
     renameimages,
     max_dimensions,
     jpg_quality,
+    fast_scaling: bool = False,
+    manifest: dict = None,
 ):
     """
     Ausgabe: Pro Jahrgang eine METS Datei, in der die einzelnen Ausgaben eigene dmdSecs haben.
     """
     i = 0
-    volumefolders = [f for f in folder.glob("*") if f.is_dir()]
+    volumefolders = index["folders"]
     for volume in volumefolders:
-        # volume ist ein Path
+        # volume ist ein Ordner aus dem Index
         i += 1
         print(f"Fortschritt: {i} von {len(volumefolders)} Jahrgängen", flush=True)
-        year = volume.name.split("_")[1]
-        dateissued = year + "-01-01"
-        title = volume.name.split("_")[0]
-        datecreated = time.strftime("%Y-%m-%dT%H:%M:%SZ")
-        strukturdaten = [f for f in volume.glob("*") if f.is_dir()]
-        additionalslogs = []
-        additionalslogsDMDIDs = []
-        slink = ""
-        if "imagebaseurl" in metadata["objects"]:
-            imagebaseurl = metadata["objects"]["imagebaseurl"]
-        else:
-            imagebaseurl = None
-
-        # -------------------------------------------------------
-        if strukturdaten:
-            alljpgs = []
-            allthumbs = []
-            print("Strukturdaten erkannt", flush=True)
-            idno = 1
-            maxnumber = 0
-
-            for elem in natsorted(strukturdaten):
-                elemname = elem.name.split("_")[-1]
-                structjpgs, structthumbs = processImages(
-                    elem,
+        if manifest is not None and manifests.isUnchanged(manifest, volume):
+            logger.info(f"{volume['name']} ist unverändert und wird übersprungen")
+            continue
+        outputs = []
+        archive.beginUnit(volume["name"])
+        # Fehler einer vorher abgebrochenen Einheit nicht mitzählen
+        helpers.takeOcrFailures()
+        metrics.beginUnit(volume["name"])
+        hooks.beginUnit(volume["name"], volume["path"], scan.countPages(volume))
+        written = False
+        try:
+            year = volume["name"].split("_")[1]
+            dateissued = year + "-01-01"
+            title = volume["name"].split("_")[0]
+            datecreated = time.strftime("%Y-%m-%dT%H:%M:%SZ")
+            strukturdaten = volume["folders"]
+            additionalslogsDMDIDs = []
+            links = []
+            if "imagebaseurl" in metadata["objects"]:
+                imagebaseurl = metadata["objects"]["imagebaseurl"]
+            else:
+                imagebaseurl = None
+
+            # -------------------------------------------------------
+            if strukturdaten:
+                alljpgs = []
+                allthumbs = []
+                print("Strukturdaten erkannt", flush=True)
+                idno = 1
+                maxnumber = 0
+
+                for elem in strukturdaten:
+                    elemname = elem["name"].split("_")[-1]
+                    structjpgs, structthumbs, structoutputs = processImages(
+                        elem,
+                        max_dimensions,
+                        jpg_quality,
+                        tesseract_language,
+                        title.replace(" ", "_")
+                        + "_"
+                        + year
+                        + "_"
+                        + elemname.replace(" ", "_")
+                        + "_",
+                        do_thumbs,
+                        outputfolder,
+                        renameimages,
+                        OCR,
+                        imagebaseurl,
+                        fast_scaling,
+                    )
+                    alljpgs.extend(structjpgs)
+                    allthumbs.extend(structthumbs)
+                    outputs.extend(structoutputs)
+                    # wir müssen wissen bei welcher Physischen Seite wird an sich sind
+                    # ein elem ist ein Unterornder unter dem Volume
+                    # structjpgs = [f for f in list(Path(elem).glob("**/*.jpg"))]
+                    links.append(
+                        mets.structLink(f"LOG_{idno + 1}", len(structjpgs), maxnumber)
+                    )
+                    maxnumber += len(structjpgs)
+
+                    idno += 1
+                    # für jede Strukturebene wird eine weitere dmdSec erstellt
+                    d = {"name": "", "idno": ""}
+                    d["name"] = elemname
+                    d["idno"] = idno
+                    additionalslogsDMDIDs.append(d)
+
+                links.append(mets.structLink("LOG_1", len(alljpgs), 0))
+            else:
+                alljpgs, thumbs, outputs = processImages(
+                    volume,
                     max_dimensions,
                     jpg_quality,
                     tesseract_language,
-                    title.replace(" ", "_")
-                    + "_"
-                    + year
-                    + "_"
-                    + elemname.replace(" ", "_")
-                    + "_",
+                    title.replace(" ", "_") + "_" + year,
                     do_thumbs,
                     outputfolder,
                     renameimages,
                     OCR,
                     imagebaseurl,
+                    fast_scaling,
                 )
-                alljpgs.extend(structjpgs)
-                allthumbs.extend(structthumbs)
-                # wir müssen wissen bei welcher Physischen Seite wird an sich sind
-                # ein elem ist ein Unterornder unter dem Volume
-                # structjpgs = [f for f in list(Path(elem).glob("**/*.jpg"))]
-                slink += structLink(f"LOG_{idno + 1}", structjpgs, maxnumber)
-                maxnumber += len(structjpgs)
-
-                idno += 1
-                # für jede Strukturebene eine weitere dmdSec erstellen und die an eine Liste mit weiteren dmdSecs anhängen
-                additionalslogs.append(createDMDsec(elemname, idno))
-                d = {"name": "", "idno": ""}
-                d["name"] = elemname
-                d["idno"] = idno
-                additionalslogsDMDIDs.append(d)
-
-            slink += structLink(f"LOG_1", alljpgs, 0)
-        else:
-            alljpgs, thumbs = processImages(
-                volume,
-                max_dimensions,
-                jpg_quality,
-                tesseract_language,
-                title.replace(" ", "_") + "_" + year,
-                do_thumbs,
-                outputfolder,
-                renameimages,
-                OCR,
-                imagebaseurl,
-            )
 
-        structmaplogical = ""
-        orderid = 0
-        for id in additionalslogsDMDIDs:
-            orderid += 1
-            idno = id["idno"]
-            titel = id["name"]
-            structmaplogical += f'<mets:div ID="LOG_{idno}" DMDID="DMDLOG_{idno}" LABEL="{titel}" TYPE="chapter" ORDER="{orderid}"/>\n'
-
-        recordIdentifier = (
-            metadata["institution"]["isil"] + "_" + title + "_" + dateissued
-        )
-
-        metsvorlage = f"""
-    <mets:mets xmlns:mets="http://www.loc.gov/METS/" xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" xsi:schemaLocation="http://www.loc.gov/mods/v3 http://www.loc.gov/standards/mods/v3/mods-3-8.xsd http://www.loc.gov/METS/ http://www.loc.gov/standards/mets/mets.xsd">
-        <mets:metsHdr CREATEDATE="{time.strftime("%Y-%m-%dT%H:%M:%SZ")}" LASTMODDATE="{datecreated}">
-                    <mets:agent
-                        xmlns:dv="http://dfg-viewer.de/" ROLE="CREATOR" TYPE="ORGANIZATION">
-                        <mets:name>{metadata['institution']['name']}</mets:name>
-                    </mets:agent>
-                    <mets:agent ROLE="OTHER" TYPE="OTHER" OTHERTYPE="SOFTWARE">
-                        <mets:name>Structmeta {__version__}</mets:name>
-                    </mets:agent>
-        </mets:metsHdr>
-        <mets:dmdSec ID="DMDLOG_1">
-            <mets:mdWrap MDTYPE="MODS">
-                <mets:xmlData>
-                    <mods:mods xmlns:mods="http://www.loc.gov/mods/v3">
-                        <mods:location>
-                            <mods:physicalLocation valueURI="http://ld.zdb-services.de/resource/organisations/{metadata['institution']['isil']}">{metadata['institution']['name']}</mods:physicalLocation>
-                        </mods:location>
-                        <mods:originInfo eventType="publication">
-                            {'<mods:edition>' + metadata['objects']['auflage'] + '</mods:edition>' if 'auflage' in metadata['objects'] else ''}
-                            {'<mods:publisher>' + metadata['objects']['verlag'] + '</mods:publisher>' if 'auflage' in metadata['objects'] else ''}
-                            <mods:place><mods:placeTerm type="text">{metadata['objects']['erscheinungsort']}</mods:placeTerm></mods:place>
-                            <mods:dateIssued encoding="iso8601" keyDate="yes">{dateissued}</mods:dateIssued>
-                        </mods:originInfo>
-                        <mods:originInfo eventType="digitization">
-                            <mods:place>
-                                <mods:placeTerm type="text">{metadata['objects']['place_of_digitization']}</mods:placeTerm>
-                            </mods:place>
-                            <mods:dateCaptured encoding="iso8601">{metadata['objects']['year_of_digitization']}</mods:dateCaptured>
-                            <mods:publisher>{metadata['institution']['name']}</mods:publisher>
-                            <mods:edition>[Electronic ed.]</mods:edition>
-                        </mods:originInfo>
-                        <mods:recordInfo>
-                            <mods:recordIdentifier source="{metadata['institution']['isil']}">{metadata['institution']['isil'] + '_' + title + '_' + dateissued}</mods:recordIdentifier>
-                            <mods:recordCreationDate encoding="iso8601">{datecreated}</mods:recordCreationDate>
-                            <mods:recordInfoNote type="license">{metadata['institution']['license']}</mods:recordInfoNote>
-                        </mods:recordInfo>
-                        <mods:titleInfo>
-                            <mods:title>{title}</mods:title>
-                        </mods:titleInfo>
-                        <mods:language><mods:languageTerm authority="iso639-2b" type="code">{metadata['objects']['sprache']}</mods:languageTerm></mods:language>
-                        <mods:physicalDescription>
-                            <mods:extent>{len(alljpgs)}</mods:extent>
-                        </mods:physicalDescription>
-                        <mods:typeOfResource>text</mods:typeOfResource>
-                    </mods:mods>
-                </mets:xmlData>
-            </mets:mdWrap>
-        </mets:dmdSec>
-        {("").join(additionalslogs)}
-        <mets:amdSec ID="AMD">
-            <mets:rightsMD ID="RIGHTS">
-                <mets:mdWrap MDTYPE="OTHER" MIMETYPE="text/xml" OTHERMDTYPE="DVRIGHTS">
-                    <mets:xmlData>
-                        <dv:rights xmlns:dv="http://dfg-viewer.de/">
-                            <dv:owner>{metadata['institution']['name']}</dv:owner>
-                            <dv:ownerLogo>{metadata['institution']['logoURL']}</dv:ownerLogo>
-                            <dv:ownerSiteURL>{metadata['institution']['siteURL']}</dv:ownerSiteURL>
-                            <dv:ownerContact>{metadata['institution']['contact']}</dv:ownerContact>
-                            <dv:license>{metadata['institution']['license']}</dv:license>
-                            {'<dv:sponsor>' + metadata['institution']['sponsor'] + '</dv:sponsor>' if 'sponsor' in metadata['institution'] else ''}
-                        </dv:rights>
-                    </mets:xmlData>
-                </mets:mdWrap>
-            </mets:rightsMD>
-        </mets:amdSec>
-        <mets:fileSec>
-            <mets:fileGrp USE="DEFAULT">
-                {flgrp(alljpgs)}
-            </mets:fileGrp>
-            <mets:fileGrp USE="THUMBS">
-                {flgrp_thumbs(allthumbs)}
-            </mets:fileGrp>
-            {flgrp_fulltext(alljpgs, OCR, create_filegrp_fulltext)}
-        </mets:fileSec>
-        <mets:structMap TYPE="LOGICAL">
-            <mets:div ID="LOG_1" DMDID="DMDLOG_1" LABEL="{title}" ADMID="AMD" TYPE="monograph">
-                {structmaplogical}
-            </mets:div>
-        </mets:structMap>
-        <mets:structMap TYPE="PHYSICAL">
-            <mets:div ID="phys" CONTENTIDS="NULL" TYPE="physSequence">
-                {structMapPhysical(alljpgs, OCR, create_filegrp_fulltext)}
-            </mets:div>
-        </mets:structMap>
-        <mets:structLink>
-                {slink}
-        </mets:structLink>
-    </mets:mets>
-    """
-
-        """
-        Output auf Validität prüfen und speichern
-        """
-        metsvorlage = re.sub("&", "&amp;", metsvorlage)
-        try:
-            doc = etree.fromstring(metsvorlage)
-        except etree.XMLSyntaxError as e:
-            logger.warning(f"Fehler beim parsen des erstellen XML: {e}")
-            return
-        else:
-            with open(outputfolder / (volume.name + "_mets.xml"), "w") as f:
-                f.write(etree.tostring(doc, encoding="unicode", pretty_print=True))
-            logger.info(f"Wrote METS/MODS: {volume.name}_mets.xml")
+            metsstart = time.perf_counter()
+            with metrics.stage("mets", len(alljpgs)):
+                try:
+                    doc = mets.journalDocument(
+                        metadata,
+                        __version__,
+                        title,
+                        dateissued,
+                        datecreated,
+                        alljpgs,
+                        allthumbs,
+                        additionalslogsDMDIDs,
+                        links,
+                        OCR == True or create_filegrp_fulltext == True,
+                    )
+                except ValueError as e:
+                    logger.warning(f"Fehler beim Erstellen des XML: {e}")
+                    return
+                else:
+                    with archive.openOutput(
+                        outputfolder / (volume["name"] + "_mets.xml")
+                    ) as f:
+                        mets.writeDocument(doc, f)
+                    logger.info(f"Wrote METS/MODS: {volume['name']}_mets.xml")
+                    if hooks.HOOKS["mets_written"]:
+                        hooks.emit(
+                            "mets_written",
+                            {
+                                "path": outputfolder / (volume["name"] + "_mets.xml"),
+                                "pages": len(alljpgs),
+                                "seconds": time.perf_counter() - metsstart,
+                            },
+                        )
+                    ocrfailed = helpers.takeOcrFailures()
+                    if manifest is not None and ocrfailed > 0:
+                        # fehlende ALTO Dateien: beim nächsten Lauf neu bearbeiten
+                        logger.warning(
+                            f"{volume['name']} nicht im Manifest gespeichert, {ocrfailed} Seiten ohne OCR"
+                        )
+                    elif manifest is not None:
+                        outputs.append(outputfolder / (volume["name"] + "_mets.xml"))
+                        manifests.recordUnit(
+                            manifest,
+                            volume["path"],
+                            manifests.fingerprint(volume),
+                            archive.archivedOutputs(outputs),
+                        )
+                    written = True
+            metrics.zipStage(len(alljpgs))
+        finally:
+            archive.endUnit(failed=not written)
 
 
 def verify_toml(d, key):
@@ -900,42 +837,57 @@ def verify_toml(d, key):
     return True
 
 
-@Gooey(
-    program_name="Structmeta",
-    required_cols=1,
-    requires_shell=False,
-    default_size=(600, 715),
-    menu=[
-        {
-            "name": "Help",
-            "items": [
-                {
-                    "type": "AboutDialog",
-                    "menuTitle": "About",
-                    "name": "Structmeta",
-                    "description": "METS/MODS aus Ordnerstrukturen erzeugen",
-                    "version": __version__,
-                    "copyright": "2022",
-                    "developer": "Karl Krägelin (mail@karlkraeglin.de)",
-                    "license": "MIT",
-                }
-            ],
-        }
-    ],
-)
 def main():
-    parser = GooeyParser(description=__version__)
+    """Grafische Oberfläche (Gooey), Einstiegspunkt structmeta"""
+    from gooey import Gooey
+
+    Gooey(**GOOEY)(_guiMain)()
+
+
+def _guiMain():
+    run(argumentParser(gui=True).parse_args())
+
+
+def cli():
+    """
+    Kommandozeile ohne grafische Oberfläche, Einstiegspunkt structmeta-cli. Gooey,
+    PyMuPDF und pytesseract werden dabei nur geladen, wenn sie gebraucht werden.
+    """
+    parser = argumentParser(gui=False)
+    args = parser.parse_args()
+    if args.Metadaten is None or args.Ordner is None:
+        parser.error("--metadata und --folder müssen angegeben werden")
+    run(args)
+
+
+def _gui(gui: bool, **options) -> dict:
+    # Optionen nur für Gooey: widget, gooey_options und metavar als Beschriftung von
+    # Schaltern (argparse erlaubt bei store_true kein metavar)
+    return options if gui else {}
+
+
+def argumentParser(gui: bool):
+    """Die Optionen von structmeta, mit gui=True als GooeyParser für die Oberfläche"""
+    if gui:
+        from gooey import GooeyParser
+
+        parser = GooeyParser(description=__version__)
+    else:
+        parser = argparse.ArgumentParser(
+            prog="structmeta-cli",
+            description=f"structmeta {__version__}: METS/MODS aus Ordnerstrukturen erzeugen",
+        )
     parser.add_argument(
         "--metadata",
         dest="Metadaten",
         help="Bitte hier die TOML Datei auswählen",
-        widget="FileChooser",
+        **_gui(gui, widget="FileChooser"),
     )
     parser.add_argument(
         "--folder",
         dest="Ordner",
         help="Hier den Ordner mit Bilddateien auswählen",
-        widget="DirChooser",
+        **_gui(gui, widget="DirChooser"),
     )
 
     opt = parser.add_argument_group(
@@ -946,7 +898,7 @@ def main():
         "--output",
         metavar="Ausgabe-Ordner",
         help="Angabe eines Ausgabe-Ordners",
-        widget="DirChooser",
+        **_gui(gui, widget="DirChooser"),
     )
     opt.add_argument(
         "--thumbnails",
@@ -956,19 +908,45 @@ def main():
     )
     opt.add_argument(
         "--zip",
-        metavar="Zip files",
         action="store_true",
         help="Zippe die erstellten Dateien (JPGs und METS Dateien und ggf. erzeugte ALTO XML Dateien)",
+        **_gui(gui, metavar="Zip files"),
+    )
+    opt.add_argument(
+        "--workers",
+        metavar="Prozesse",
+        type=int,
+        default=1,
+        help="Anzahl der Zeitungsausgaben, die parallel bearbeitet werden",
+        **_gui(gui, widget="IntegerField"),
+    )
+    opt.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Überspringe Ausgaben/Jahrgänge/Bücher, die sich seit dem letzten Lauf in diesen Ausgabe-Ordner nicht geändert haben",
+        **_gui(gui, metavar="Inkrementell"),
+    )
+    opt.add_argument(
+        "--plan",
+        action="store_true",
+        help="Nur planen: schreibt structmeta_plan.json mit Einheiten, Seiten, geschätzter Ausgabegröße und Dauer in den Ausgabe-Ordner, ohne Bilder zu bearbeiten",
+        **_gui(gui, metavar="Plan"),
+    )
+    opt.add_argument(
+        "--profile",
+        action="store_true",
+        help="Profiling mit cProfile pro Schritt und Prozess, schreibt pstats Dateien in structmeta_profile im Ausgabe-Ordner",
+        **_gui(gui, metavar="Profiling"),
     )
     opt.add_argument(
         "--rename",
-        metavar="Rename Images",
         action="store_true",
         help="Bennene die Bilddateien eindeutig um",
+        **_gui(gui, metavar="Rename Images"),
     )
 
     mutual_parser = opt.add_mutually_exclusive_group(
-        gooey_options={"title": "Volltext Funktionalitäten"}
+        **_gui(gui, gooey_options={"title": "Volltext Funktionalitäten"})
     )
     mutual_parser.add_argument(
         "--noocr",
@@ -981,12 +959,16 @@ def main():
     )
     mutual_parser.add_argument(
         "--fulltext",
-        metavar="FileGrp FULLTEXT",
         action="store_true",
         help="Erstelle eine fileGrp FULLTEXT auf Basis der Bildnamen",
+        **_gui(gui, metavar="FileGrp FULLTEXT"),
     )
 
-    args = parser.parse_args()
+    return parser
+
+
+def run(args):
+    """Bearbeitet den Eingabe-Ordner mit den Optionen aus argumentParser"""
     metadata = read_metadata(args.Metadaten)
 
     mandatory_fields = [
@@ -1008,11 +990,14 @@ def main():
     except KeyError as e:
         sys.exit(e)
 
+    # Warnungen zur TOML Datei, werden erst ins Log geschrieben, wenn es angelegt ist
+    warnings = []
     inputfolder = Path(args.Ordner)
     thumbnails = args.Thumbnails
     zip = args.zip
     renameimages = args.rename
     output = args.output
+    workers = max(args.workers, 1)
     try:
         metadata["images"]["max_dimensions"]
     except:
@@ -1026,18 +1011,79 @@ def main():
         jpg_quality = 90
     else:
         jpg_quality = metadata["images"]["jpg_quality"]
+
+    try:
+        metadata["images"]["fast_scaling"]
+    except:
+        fast_scaling = False
+    else:
+        fast_scaling = metadata["images"]["fast_scaling"]
+
+    try:
+        metadata["images"]["link"]
+    except:
+        link = "auto"
+    else:
+        link = metadata["images"]["link"]
+        if link not in ["auto"] + archive.LINKS:
+            warnings.append(
+                f"Unbekannter Wert für [images] link '{link}', verwende 'auto'"
+            )
+            link = "auto"
+    try:
+        copyworkers = int(metadata["images"]["copy_workers"])
+    except:
+        copyworkers = 4
+    archive.setupLinks(link, copyworkers)
+
+    try:
+        metadata["cache"]["folder"]
+    except:
+        cachefolder = None
+    else:
+        cachefolder = metadata["cache"]["folder"]
+        try:
+            cachesize = metadata["cache"]["max_size"]
+        except:
+            cachesize = 10000
+        cache.setupCache(cachefolder, cachesize)
+
+    try:
+        metadata["zip"]["shard"]
+    except:
+        zipshard = "none"
+    else:
+        zipshard = metadata["zip"]["shard"]
+        if zipshard not in ["none", "unit", "size"]:
+            warnings.append(
+                f"Unbekannter Wert für [zip] shard '{zipshard}', verwende 'none'"
+            )
+            zipshard = "none"
+    try:
+        zipsize = int(metadata["zip"]["max_size"])
+    except:
+        zipsize = 2000
+
+    try:
+        metadata["hooks"]["modules"]
+    except:
+        hookmodules = []
+    else:
+        hookmodules = metadata["hooks"]["modules"]
+        if isinstance(hookmodules, str):
+            hookmodules = [hookmodules]
+    try:
+        hooks.setupHooks(hookmodules, logger)
+    except Exception as e:
+        sys.exit(f"Fehler beim Laden der Hooks: {e}")
     ocr = args.OCR
     if ocr == True:
         try:
-            pytesseract.pytesseract.tesseract_cmd = metadata["OCR"][
-                "tesseract_executable"
-            ]
+            metadata["OCR"]["tesseract_executable"]
         except:
             pass
         else:
-            pytesseract.pytesseract.tesseract_cmd = metadata["OCR"][
-                "tesseract_executable"
-            ]
+            helpers.TESSERACT["cmd"] = metadata["OCR"]["tesseract_executable"]
 
         try:
             tesseract_language = metadata["OCR"]["tesseract_language"]
@@ -1045,13 +1091,50 @@ def main():
             tesseract_language = None
         else:
             tesseract_language = metadata["OCR"]["tesseract_language"]
+
+        try:
+            metadata["OCR"]["workers"]
+        except:
+            pass
+        else:
+            helpers.TESSERACT["workers"] = max(int(metadata["OCR"]["workers"]), 1)
+        try:
+            metadata["OCR"]["engine"]
+        except:
+            pass
+        else:
+            if metadata["OCR"]["engine"] in ["single", "batch"]:
+                helpers.TESSERACT["engine"] = metadata["OCR"]["engine"]
+            else:
+                warnings.append(
+                    f"Unbekannte OCR engine '{metadata['OCR']['engine']}', verwende 'single'"
+                )
         try:
-            tver = pytesseract.get_tesseract_version()
-        except Exception as e:
-            print(f"Fehler: {e}", flush=True)
-            ocr = False
+            metadata["OCR"]["timeout"]
+        except:
+            pass
         else:
-            print(f"Tesseract Version: {tver}", flush=True)
+            helpers.TESSERACT["timeout"] = max(int(metadata["OCR"]["timeout"]), 1)
+        try:
+            metadata["OCR"]["existing_alto"]
+        except:
+            pass
+        else:
+            helpers.TESSERACT["existing_alto"] = metadata["OCR"]["existing_alto"]
+        # der Plan startet kein Tesseract, er nimmt an, dass die OCR laufen kann
+        if not args.plan:
+            try:
+                tver = helpers.tesseract().get_tesseract_version()
+            except Exception as e:
+                print(f"Fehler: {e}", flush=True)
+                if helpers.TESSERACT["existing_alto"]:
+                    # Seiten mit vorhandenem ALTO brauchen kein Tesseract
+                    print("Verwende nur die vorhandenen ALTO Dateien", flush=True)
+                else:
+                    ocr = False
+            else:
+                print(f"Tesseract Version: {tver}", flush=True)
+                helpers.TESSERACT["version"] = str(tver)
     else:
         tesseract_language = None
     create_filegrp_fulltext = args.fulltext
@@ -1064,7 +1147,78 @@ def main():
 
     outputfolder.mkdir(exist_ok=True)
 
+    if args.profile:
+        try:
+            profilememory = bool(metadata["profile"]["memory"])
+        except:
+            profilememory = False
+        profiling.setupProfile(
+            outputfolder / profiling.PROFILEFOLDER, profilememory, run=True
+        )
+    for warning in warnings:
+        print(f"Warnung: {warning}", flush=True)
+    # den Eingabe-Ordner nur einmal lesen, alles weitere arbeitet mit dem Index
+    print("Lese Eingabe-Ordner", flush=True)
+    runstart = time.perf_counter()
+    with metrics.stage("discovery") as record:
+        index = scan.scanFolder(inputfolder, sortpages=not args.plan)
+        record["pages"] = scan.countPages(index)
+
+    runsettings = manifests.runSettings(
+        metadata,
+        thumbnails,
+        ocr,
+        create_filegrp_fulltext,
+        tesseract_language,
+        renameimages,
+        max_dimensions,
+        jpg_quality,
+        fast_scaling,
+        helpers.TESSERACT["version"] if ocr else None,
+        helpers.TESSERACT["engine"] if ocr else None,
+        helpers.TESSERACT["existing_alto"] if ocr else None,
+        zip,
+        zipshard,
+    )
+    if args.plan:
+        # Trockenlauf: nur den Plan schreiben, es wird nichts bearbeitet
+        estimates = dict(plans.ESTIMATES)
+        try:
+            metadata["plan"]
+        except:
+            pass
+        else:
+            estimates.update(metadata["plan"])
+        if args.incremental and Path(outputfolder, manifests.MANIFESTNAME).exists():
+            manifest = manifests.openManifest(outputfolder, runsettings)
+        else:
+            manifest = None
+        plan = plans.planRun(
+            index,
+            {
+                "type": metadata["objects"]["type"],
+                "do_thumbs": thumbnails,
+                "OCR": ocr,
+                "max_dimensions": max_dimensions,
+                "jpg_quality": jpg_quality,
+                "workers": workers,
+                "ocr_workers": helpers.TESSERACT["workers"],
+                "existing_alto": helpers.TESSERACT["existing_alto"],
+                "estimates": estimates,
+            },
+            manifest,
+        )
+        planfile = plans.writePlan(plan, outputfolder)
+        for line in plans.summary(plan):
+            print(line, flush=True)
+        print(f"Plan geschrieben: {planfile}", flush=True)
+        return
+
     Path(outputfolder, "binaries").mkdir(exist_ok=True)
+    if args.incremental:
+        manifest = manifests.openManifest(outputfolder, runsettings)
+    else:
+        manifest = None
     # ------------------------------------------------
     logger.remove()
     lognamefilename = time.strftime("%Y-%m-%d_%H-%M-%S") + "_structmeta.log"
@@ -1076,16 +1230,44 @@ def main():
         format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | <level>{level: <8}</level> | <level>{message}</level>",
         enqueue=True,
     )
+    # Messwerte pro Schritt und Einheit neben dem Log (siehe metrics.py)
+    metricsfile = logfile.with_name(logfile.stem + "_metrics.jsonl")
+    metrics.setupMetrics(metricsfile)
     logger.log("PARAMETER", f"Input Ordner: {str(inputfolder)}")
     logger.log("PARAMETER", f"Output Ordner: {str(outputfolder)}")
     logger.log("PARAMETER", f"OCR: {ocr}")
     logger.log("PARAMETER", f"tesseract_language: {tesseract_language}")
+    logger.log("PARAMETER", f"OCR workers: {helpers.TESSERACT['workers']}")
+    logger.log("PARAMETER", f"OCR engine: {helpers.TESSERACT['engine']}")
+    logger.log("PARAMETER", f"OCR timeout: {helpers.TESSERACT['timeout']}")
+    logger.log("PARAMETER", f"existing_alto: {helpers.TESSERACT['existing_alto']}")
     logger.log("PARAMETER", f"renameimages: {renameimages}")
+    logger.log("PARAMETER", f"workers: {workers}")
+    logger.log("PARAMETER", f"fast_scaling: {fast_scaling}")
+    logger.log("PARAMETER", f"link: {archive.ARCHIVE['link']}")
+    logger.log("PARAMETER", f"copy_workers: {archive.ARCHIVE['copy_workers']}")
+    logger.log("PARAMETER", f"incremental: {args.incremental}")
+    logger.log("PARAMETER", f"cache: {cachefolder}")
+    logger.log("PARAMETER", f"zip: {zip}")
+    logger.log("PARAMETER", f"zip shard: {zipshard}")
+    logger.log("PARAMETER", f"metrics: {metricsfile}")
+    logger.log("PARAMETER", f"profile: {profiling.PROFILE['folder']}")
+    logger.log("PARAMETER", f"profile memory: {profiling.PROFILE['memory']}")
+    logger.log("PARAMETER", f"hooks: {hookmodules}")
+    for warning in warnings:
+        logger.warning(warning)
     # ------------------------------------------------
+    logger.info(
+        f"{len(index['folders'])} Einheiten mit {scan.countPages(index)} Bildern gefunden"
+    )
+    if zip:
+        # alle erzeugten Dateien werden direkt in die ZIP Dateien geschrieben
+        print("Schreibe direkt in ZIP Dateien", flush=True)
+        archive.openArchives(inputfolder, outputfolder, zipshard, zipsize)
     if metadata["objects"]["type"] == "journal":
         logger.info(f"Bearbeite als Journal")
         journalMETS(
-            inputfolder,
+            index,
             metadata,
             thumbnails,
             ocr,
@@ -1095,10 +1277,12 @@ def main():
             renameimages,
             max_dimensions,
             jpg_quality,
+            fast_scaling,
+            manifest=manifest,
         )
     elif metadata["objects"]["type"] == "monograph":
         monographMETS(
-            inputfolder,
+            index,
             metadata,
             thumbnails,
             ocr,
@@ -1108,10 +1292,12 @@ def main():
             renameimages,
             max_dimensions,
             jpg_quality,
+            fast_scaling,
+            manifest=manifest,
         )
     elif metadata["objects"]["type"] == "newspaper":
         newspaperMETS(
-            inputfolder,
+            index,
             metadata,
             thumbnails,
             ocr,
@@ -1121,12 +1307,17 @@ def main():
             renameimages,
             max_dimensions,
             jpg_quality,
+            fast_scaling,
+            workers,
+            manifest,
         )
     else:
         logger.error("Fehler")
     # ------------------------------------------------
     if zip:
-        helpers.zipfiles(inputfolder, outputfolder, logger, logfile, ocr)
+        metrics.beginUnit(None)
+        with metrics.stage("zip"):
+            archive.closeArchives(logger)
 
         try:
             # wenn nicht gezippt wird, sind die Ordner nicht leer und werden nicht gelöscht
@@ -1135,11 +1326,24 @@ def main():
             logger.error(f"Konnte {outputfolder}/binaries nicht löschen")
         else:
             logger.info(f"{outputfolder}/binaries gelöscht")
-            logger.debug("Vorgang beendet")
-    else:
-        logger.debug("Vorgang beendet")
+    # ------------------------------------------------
+    # Zusammenfassung der Messwerte: Seiten pro Sekunde je Schritt
+    summary = metrics.summary(time.perf_counter() - runstart)
+    for name, stage in summary["stages"].items():
+        pps = f"{stage['pages_per_second']:.1f}" if stage["pages_per_second"] else "-"
+        logger.info(
+            f"{name}: {stage['pages']} Seiten in {stage['wall_seconds']:.1f} s ({pps} Seiten/s)"
+        )
+    logger.info(f"Laufzeit: {summary['run_seconds']:.1f} s, Messwerte in {metricsfile}")
+    if profiling.PROFILE["folder"] is not None:
+        profiling.finish()
+        logger.info(
+            f"Profile in {profiling.PROFILE['folder']}, Auswertung mit python -m structmeta.profiling {profiling.PROFILE['folder']}"
+        )
+    logger.debug("Vorgang beendet")
 
 
 if __name__ == "__main__":
-
+    # nötig für die Worker-Prozesse in der gebündelten Windows Version
+    multiprocessing.freeze_support()
     main()
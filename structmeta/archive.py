@@ -0,0 +1,468 @@
+"""
+Ausgabe der erzeugten Dateien.
+
+Ohne --zip werden JPGs, Thumbnails, ALTO und METS Dateien wie bisher in den Ausgabe-Ordner
+bzw. in dessen Unterordner binaries geschrieben. Mit --zip werden sie direkt als Einträge
+in die ZIP Dateien geschrieben, sobald sie erzeugt sind: alles aus binaries in die
+*_binaries.zip, die METS Dateien in die *_mets.zip. Die Dateien müssen so nicht erst
+auf die Platte geschrieben und für das Zippen wieder gelesen werden.
+
+Worker-Prozesse können nicht in die ZIP Dateien des Hauptprozesses schreiben. Dort werden
+die Einträge gesammelt und mit dem Ergebnis der Einheit an den Hauptprozess übergeben,
+der sie dann in die ZIP Dateien schreibt.
+
+Die ZIP Dateien werden erst mit ihrem ersten Eintrag angelegt, ein Lauf ohne neue Einträge
+(z.B. mit --incremental ohne Änderungen) erzeugt also keine leeren Archive. Bis zum Ende
+des Laufs heißen sie *.zip.part und werden erst in closeArchives umbenannt. Ein
+abgebrochener Lauf hinterlässt so keine ZIP Dateien, die wie eine fertige Lieferung aussehen.
+
+Bereits komprimierte Bilder (JPGs) werden unkomprimiert gespeichert, ALTO und METS mit
+Deflate komprimiert. Das Komprimieren passiert dort, wo eine Datei erzeugt wird, also
+parallel in den OCR Threads und in den Worker-Prozessen. Unter dem Lock wird nur noch der
+fertige Eintrag angehängt (siehe zipwriter).
+
+Mit [zip] shard in der TOML Datei werden die Archive aufgeteilt:
+
+    shard = "unit"  # ein Paar Archive pro Ausgabe, Jahrgang bzw. Buch
+    shard = "size"  # neues Paar Archive, sobald max_size (in MB) erreicht ist
+
+Der Name bekommt dann ein Suffix, z.B. <Zeitstempel>__<Ordner>_binaries_1802-01-01.zip
+bzw. <Zeitstempel>__<Ordner>_binaries_001.zip. Eine Einheit wird nie auf mehrere Archive
+verteilt. Beim Aufteilen schreiben Worker-Prozesse ihre Archive selbst, also gleichzeitig.
+
+Bilder, die unverändert übernommen werden, werden ohne --zip nicht unbedingt kopiert.
+Mit [images] link in der TOML Datei wird festgelegt, wie sie in den Ausgabe-Ordner kommen:
+
+    link = "auto"             # reflink, sonst copy_file_range, sonst kopieren (Standard)
+    link = "hardlink"         # harter Link, Ausgabe und Original sind dieselbe Datei
+    link = "reflink"          # Copy-on-Write Kopie (z.B. btrfs, XFS), sonst wie copy_file_range
+    link = "copy_file_range"  # Kopie im Kernel, auf NFS ggf. auf dem Server, sonst kopieren
+    link = "copy"             # wie bisher mit shutil.copy
+
+Geht ein Verfahren nicht (z.B. anderes Dateisystem), wird das nächste genommen. Die
+Kopien einer Einheit laufen mit [images] copy_workers Threads gleichzeitig.
+"""
+
+import errno
+
+import io
+import multiprocessing
+import multiprocessing.util
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Union
+from . import hooks
+from . import zipwriter
+
+# mode: "files" (in den Ausgabe-Ordner schreiben), "zip" (in die ZIP Dateien schreiben)
+#   oder "collect" (Worker-Prozess: Einträge für den Hauptprozess sammeln)
+# shard: "none", "unit" oder "size", max_size in Bytes
+# prefix: Pfad der Archive ohne "_binaries.zip", paths: die aktuell beschriebenen Archive
+#   (fertige Namen, geschrieben wird bis closeArchives nach <Name>.part)
+# counter: Nummer des letzten Archivs bei shard = "size", von allen Prozessen geteilt
+# link: Verfahren für unveränderte Dateien ohne --zip, copy_workers: gleichzeitige Kopien
+ARCHIVE = {
+    "mode": "files",
+    "shard": "none",
+    "max_size": 0,
+    "prefix": None,
+    "binaries": None,
+    "mets": None,
+    "paths": [],
+    "counter": None,
+    "members": [],
+    "link": "auto",
+    "copy_workers": 4,
+}
+
+LINKS = ["hardlink", "reflink", "copy_file_range", "copy"]
+
+# Zeit und Bytes für ZIP Einträge seit dem letzten takeZipStats (für metrics)
+ZIPSTATS = {"seconds": 0.0, "cpu_seconds": 0.0, "bytes": 0}
+
+# Verfahren, die in diesem Prozess schon einmal nicht funktioniert haben
+_unsupported = set()
+
+# ioctl für eine Copy-on-Write Kopie unter Linux (aus linux/fs.h)
+FICLONE = 0x40049409
+
+# an ein Archiv darf nur ein Thread gleichzeitig anhängen (z.B. OCR in Threads)
+_lock = threading.Lock()
+
+# Dateitypen, die schon komprimiert sind und unkomprimiert ins ZIP kommen, alles andere mit Deflate
+STORED = [".jpg", ".jpeg", ".jp2", ".png", ".gif", ".zip"]
+
+
+def openArchives(
+    inputfolder: Path, outputfolder: Path, shard: str = "none", max_size: int = 2000
+) -> None:
+    """
+    Legt die Namen der ZIP Dateien fest, alle folgenden Ausgaben werden dort hinein
+    geschrieben. Die Dateien selbst entstehen erst mit dem ersten Eintrag (siehe _archive).
+    Beim Aufteilen (shard) werden die Namen erst mit beginUnit festgelegt.
+
+    Arguments:
+        shard -- "none", "unit" oder "size"
+
+        max_size -- maximale Größe eines Archivs in MB bei shard = "size"
+    """
+    t = time.strftime("%Y-%m-%d_%H-%M-%S")
+    ARCHIVE["prefix"] = outputfolder / (t + "__" + inputfolder.name)
+    ARCHIVE["shard"] = shard
+    ARCHIVE["max_size"] = max_size * 1024 * 1024
+    ARCHIVE["mode"] = "zip"
+    ARCHIVE["paths"] = []
+    if shard == "none":
+        _open("")
+    elif shard == "size":
+        ARCHIVE["counter"] = multiprocessing.Value("i", 0)
+
+
+def closeArchives(logger) -> None:
+    """
+    Schließt die ZIP Dateien und gibt allen Archiven des Laufs (auch denen der
+    Worker-Prozesse) ihren fertigen Namen.
+    """
+    for name in ["binaries", "mets"]:
+        zipObj = ARCHIVE[name]
+        if zipObj is not None:
+            logger.info(
+                f"{len(zipObj['entries'])} Dateien in {_finalPath(zipObj['path']).name}"
+            )
+    _close()
+    prefix = ARCHIVE["prefix"]
+    for part in sorted(prefix.parent.iterdir()):
+        if part.name.startswith(prefix.name + "_") and part.name.endswith(".zip.part"):
+            part.rename(_finalPath(part))
+    ARCHIVE["mode"] = "files"
+    print("ZIP Vorgang abgeschlossen", flush=True)
+
+
+def _open(suffix: str) -> None:
+    # nur die Namen, die Dateien legt _archive mit dem ersten Eintrag an
+    prefix = str(ARCHIVE["prefix"])
+    ARCHIVE["paths"] = [
+        Path(prefix + "_binaries" + suffix + ".zip"),
+        Path(prefix + "_mets" + suffix + ".zip"),
+    ]
+
+
+def _archive(name: str) -> dict:
+    # das Archiv "binaries" bzw. "mets", wird beim ersten Eintrag als <Name>.part angelegt
+    if ARCHIVE[name] is None:
+        path = ARCHIVE["paths"][0 if name == "binaries" else 1]
+        ARCHIVE[name] = zipwriter.openZip(_partPath(path))
+    return ARCHIVE[name]
+
+
+def _partPath(path: Path) -> Path:
+    return Path(str(path) + ".part")
+
+
+def _finalPath(path: Union[Path, str]) -> Path:
+    path = Path(path)
+    return path.with_suffix("") if path.suffix == ".part" else path
+
+
+def _close() -> None:
+    with _lock:
+        for name in ["binaries", "mets"]:
+            if ARCHIVE[name] is not None:
+                zipwriter.closeZip(ARCHIVE[name])
+                ARCHIVE[name] = None
+
+
+def beginUnit(name: str) -> None:
+    """
+    Muss vor den Ausgaben einer Einheit (Ausgabe, Jahrgang, Buch) aufgerufen werden.
+    Legt beim Aufteilen die Archive für die Einheit an bzw. beginnt neue Archive,
+    wenn die aktuellen max_size erreicht haben.
+    """
+    if ARCHIVE["mode"] != "zip" or ARCHIVE["shard"] == "none":
+        return
+    if ARCHIVE["shard"] == "unit":
+        _open("_" + name)
+        return
+    if (
+        ARCHIVE["binaries"] is not None
+        and ARCHIVE["binaries"]["size"] >= ARCHIVE["max_size"]
+    ):
+        _close()
+        ARCHIVE["paths"] = []
+    if len(ARCHIVE["paths"]) == 0:
+        with ARCHIVE["counter"].get_lock():
+            ARCHIVE["counter"].value += 1
+            n = ARCHIVE["counter"].value
+        _open("_" + str(n).zfill(3))
+
+
+def endUnit(failed: bool = False) -> None:
+    """
+    Muss nach den Ausgaben einer Einheit aufgerufen werden, auch bei Fehlern. Schließt beim
+    Aufteilen pro Einheit die Archive der Einheit. Mit failed (z.B. wenn die METS Datei
+    nicht erstellt werden konnte) werden sie gelöscht, statt die Bilder ohne METS
+    auszuliefern.
+    """
+    if ARCHIVE["mode"] == "zip" and ARCHIVE["shard"] == "unit":
+        _close()
+        if failed:
+            for path in ARCHIVE["paths"]:
+                _partPath(path).unlink(missing_ok=True)
+
+
+def archiveSettings() -> dict:
+    """Ausgabemodus zur Übergabe an Worker-Prozesse"""
+    settings = {"link": ARCHIVE["link"], "copy_workers": ARCHIVE["copy_workers"]}
+    if ARCHIVE["mode"] != "zip":
+        settings["mode"] = ARCHIVE["mode"]
+    elif ARCHIVE["shard"] == "none":
+        # es gibt nur ein Paar Archive, das schreibt der Hauptprozess
+        settings.update({"mode": "collect", "paths": ARCHIVE["paths"]})
+    else:
+        settings.update(
+            {
+                "mode": "zip",
+                "shard": ARCHIVE["shard"],
+                "max_size": ARCHIVE["max_size"],
+                "prefix": ARCHIVE["prefix"],
+                "counter": ARCHIVE["counter"],
+            }
+        )
+    return settings
+
+
+def setupLinks(link: str, copy_workers: int) -> None:
+    """
+    Legt fest, wie unveränderte Dateien ohne --zip in den Ausgabe-Ordner kommen.
+
+    Arguments:
+        link -- "auto" oder eines von LINKS
+
+        copy_workers -- Anzahl der Kopien, die gleichzeitig laufen
+    """
+    ARCHIVE["link"] = link
+    ARCHIVE["copy_workers"] = max(copy_workers, 1)
+
+
+def setupArchive(settings: dict) -> None:
+    """Setzt den Ausgabemodus in einem Worker-Prozess"""
+    ARCHIVE.update(settings)
+    # geforkte Prozesse erben die Archive des Hauptprozesses, die gehören ihnen nicht
+    ARCHIVE["binaries"] = None
+    ARCHIVE["mets"] = None
+    ARCHIVE["members"] = []
+    if ARCHIVE["mode"] == "zip":
+        # beim Aufteilen legt jeder Worker-Prozess seine Archive selbst fest
+        ARCHIVE["paths"] = []
+        # das zuletzt beschriebene Archiv wird beim Beenden des Prozesses geschlossen
+        multiprocessing.util.Finalize(None, _close, exitpriority=10)
+
+
+def archivedOutputs(outputs: List[Path]) -> List[Path]:
+    """
+    Die Dateien, in denen die erzeugten Ausgaben tatsächlich liegen: ohne --zip die
+    Ausgaben selbst, mit --zip die ZIP Dateien (z.B. für das Manifest).
+    """
+    if ARCHIVE["mode"] == "files":
+        return outputs
+    return list(ARCHIVE["paths"])
+
+
+def _archivename(path: Path) -> str:
+    # wie bisher beim Zippen: alles aus binaries in die binaries.zip, der Rest zu den METS
+    return "binaries" if path.parent.name == "binaries" else "mets"
+
+
+def writeOutput(path: Path, data: Union[bytes, str]) -> None:
+    """Schreibt eine erzeugte Datei, je nach Ausgabemodus auf die Platte oder ins ZIP"""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if ARCHIVE["mode"] == "zip":
+        start = time.perf_counter()
+        with _zipstats(len(data)):
+            # komprimiert wird in diesem Thread, unter _lock nur angehängt
+            member = newMember(path.name, data)
+            with _lock:
+                zipObj = _archive(_archivename(path))
+                zipwriter.addEntry(zipObj, member)
+        if hooks.HOOKS["zip_member_added"]:
+            _memberAdded(zipObj, member, time.perf_counter() - start)
+    elif ARCHIVE["mode"] == "collect":
+        # komprimiert wird im Worker-Prozess, der Hauptprozess hängt nur noch an
+        with _zipstats(len(data)):
+            member = newMember(path.name, data)
+        ARCHIVE["members"].append((_archivename(path), member))
+    else:
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+@contextmanager
+def openOutput(path: Path):
+    """
+    Öffnet eine Ausgabedatei zum schrittweisen Schreiben (z.B. METS mit etree.xmlfile).
+    Mit --zip und in Worker-Prozessen wird der Inhalt im Speicher gesammelt und dann wie
+    bei writeOutput geschrieben, so blockiert das Schreiben der Datei keine anderen
+    Einträge.
+    """
+    if ARCHIVE["mode"] in ["zip", "collect"]:
+        f = io.BytesIO()
+        yield f
+        writeOutput(path, f.getvalue())
+    else:
+        with open(path, "wb") as f:
+            yield f
+
+
+def copyOutput(source: Path, path: Path) -> None:
+    """Übernimmt eine vorhandene Datei (z.B. ein Original-JPG) unverändert in die Ausgabe"""
+    if ARCHIVE["mode"] in ["zip", "collect"]:
+        # gelesen wird außerhalb von _lock, JPGs werden dabei nicht komprimiert
+        writeOutput(path, source.read_bytes())
+    else:
+        linkFile(source, path)
+
+
+def copyOutputs(pairs: List[tuple]) -> None:
+    """
+    Übernimmt mehrere vorhandene Dateien unverändert in die Ausgabe, ohne --zip mit
+    copy_workers Threads gleichzeitig (hilft vor allem auf Netzlaufwerken).
+
+    Arguments:
+        pairs -- Liste mit (Ausgangsdatei, Zielpfad)
+    """
+    if ARCHIVE["mode"] != "files" or ARCHIVE["copy_workers"] == 1 or len(pairs) < 2:
+        for source, path in pairs:
+            copyOutput(source, path)
+        return
+    with ThreadPoolExecutor(max_workers=ARCHIVE["copy_workers"]) as executor:
+        # list(), damit Fehler in den Threads hier ankommen
+        list(executor.map(lambda pair: copyOutput(*pair), pairs))
+
+
+def linkFile(source: Path, path: Path) -> None:
+    """
+    Legt path als Kopie bzw. Link von source an, mit dem Verfahren aus [images] link.
+    Geht ein Verfahren auf diesem System oder Dateisystem nicht, wird das nächste genommen.
+    """
+    if ARCHIVE["link"] == "auto":
+        links = LINKS[1:]
+    else:
+        links = LINKS[LINKS.index(ARCHIVE["link"]) :]
+    if path.exists():
+        # kann aus einem früheren Lauf ein harter Link auf die Ausgangsdatei sein, die darf
+        # beim Überschreiben nicht abgeschnitten werden
+        path.unlink()
+    for link in links:
+        if link in _unsupported:
+            continue
+        if link == "copy":
+            shutil.copy(str(source), str(path))
+            return
+        try:
+            if link == "hardlink":
+                os.link(source, path)
+            else:
+                _copyInKernel(source, path, link)
+        except (OSError, AttributeError, ImportError) as e:
+            if isinstance(e, OSError) and e.errno not in [
+                errno.EXDEV,
+                errno.EPERM,
+                errno.EINVAL,
+                errno.ENOSYS,
+                errno.EOPNOTSUPP,
+                errno.ENOTTY,
+                errno.EMLINK,
+            ]:
+                raise
+            # z.B. anderes Dateisystem oder nicht unterstützt: für den Rest des Laufs abschalten
+            _unsupported.add(link)
+        else:
+            return
+
+
+def _copyInKernel(source: Path, path: Path, link: str) -> None:
+    # reflink (FICLONE) oder copy_file_range, die Daten gehen dabei nicht durch Python
+    with open(source, "rb") as src, open(path, "wb") as dst:
+        if link == "reflink":
+            import fcntl
+
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        else:
+            size = os.fstat(src.fileno()).st_size
+            copied = 0
+            while copied < size:
+                n = os.copy_file_range(src.fileno(), dst.fileno(), size - copied)
+                if n == 0:
+                    break
+                copied += n
+    # wie shutil.copy auch die Zugriffsrechte übernehmen
+    shutil.copymode(str(source), str(path))
+
+
+def takeMembers() -> list:
+    """Gibt die in einem Worker-Prozess gesammelten Einträge zurück und leert die Liste"""
+    members = ARCHIVE["members"]
+    ARCHIVE["members"] = []
+    return members
+
+
+def addMembers(members: list) -> None:
+    """Schreibt die Einträge eines Worker-Prozesses in die ZIP Dateien"""
+    added = []
+    # komprimiert haben die Worker-Prozesse, hier werden nur die fertigen Daten geschrieben
+    with _zipstats(sum(member["compress_size"] for name, member in members)), _lock:
+        for name, member in members:
+            start = time.perf_counter()
+            zipwriter.addEntry(_archive(name), member)
+            added.append((ARCHIVE[name], member, time.perf_counter() - start))
+    if hooks.HOOKS["zip_member_added"]:
+        for zipObj, member, seconds in added:
+            _memberAdded(zipObj, member, seconds)
+
+
+def _memberAdded(zipObj: dict, member: dict, seconds: float) -> None:
+    # Hook für einen Eintrag, außerhalb von _lock, damit ein langsamer Hook nicht blockiert
+    hooks.emit(
+        "zip_member_added",
+        {
+            "archive": _finalPath(zipObj["path"]),
+            "name": member["name"],
+            "bytes": member["file_size"],
+            "compressed_bytes": member["compress_size"],
+            "seconds": seconds,
+        },
+    )
+
+
+@contextmanager
+def _zipstats(size: int):
+    # thread_time, weil gleichzeitig andere Threads (OCR, Kopien) rechnen können
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    yield
+    ZIPSTATS["seconds"] += time.perf_counter() - wall
+    ZIPSTATS["cpu_seconds"] += time.thread_time() - cpu
+    ZIPSTATS["bytes"] += size
+
+
+def takeZipStats() -> dict:
+    """Gibt Zeit und Bytes für ZIP Einträge seit dem letzten Aufruf zurück"""
+    stats = dict(ZIPSTATS)
+    ZIPSTATS.update({"seconds": 0.0, "cpu_seconds": 0.0, "bytes": 0})
+    return stats
+
+
+def newMember(arcname: str, data: bytes) -> dict:
+    """
+    Bereitet einen ZIP Eintrag vor: JPGs usw. unkomprimiert, alles andere mit Deflate.
+    Läuft in dem Thread bzw. Worker-Prozess, der die Datei erzeugt.
+    """
+    return zipwriter.prepareEntry(
+        arcname, data, compress=Path(arcname).suffix.lower() not in STORED
+    )
@@ -0,0 +1,230 @@
+"""
+Inhaltsadressierter Cache für Bildderivate und OCR Ergebnisse.
+
+Erzeugte JPGs und Thumbnails werden unter einem Schlüssel aus dem Hash der Ausgangsdatei
+und den Konvertierungsparametern (max_dimensions, jpg_quality, Thumbnail Größe, ...)
+abgelegt, ALTO Dateien unter dem Hash des Bildes, der Sprache, der Tesseract Version und
+der OCR engine. Der Cache kann von mehreren Läufen und Projekten gemeinsam benutzt werden.
+Wird die maximale Größe überschritten, werden die am längsten nicht benutzten Einträge
+gelöscht (das Änderungsdatum eines Eintrags wird bei jedem Treffer aktualisiert).
+
+Konfiguration in der TOML Datei:
+
+    [cache]
+    folder = "/pfad/zum/cache"
+    max_size = 20000  # in MB
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Union
+
+# wird in main() bzw. in den Worker-Prozessen mit setupCache gesetzt
+# size: aktuelle Größe in Bytes, ein von allen Prozessen geteilter Zähler (multiprocessing.Value)
+CACHE = {"folder": None, "max_size": 0, "size": None}
+
+# Hashes der Ausgangsdateien pro Prozess merken: (Pfad, Größe, mtime) -> Hash
+_hashes = {}
+
+
+def setupCache(folder: Union[Path, str, None], max_size: int, size: int = None):
+    """
+    Aktiviert den Cache.
+
+    Arguments:
+        folder -- Ordner des Caches oder None, um den Cache abzuschalten
+
+        max_size -- maximale Größe in MB
+
+        size -- der Zähler für die Größe aus dem Hauptprozess (Worker-Prozesse), sonst wird
+                gezählt und ein neuer Zähler angelegt
+    """
+    if folder is None:
+        CACHE["folder"] = None
+        return
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    CACHE["folder"] = folder
+    CACHE["max_size"] = max_size * 1024 * 1024
+    if size is None:
+        size = multiprocessing.Value("q", _diskSize()[0])
+    CACHE["size"] = size
+
+
+def cacheSettings() -> dict:
+    """Konfiguration des Caches zur Übergabe an Worker-Prozesse"""
+    return {
+        "folder": CACHE["folder"],
+        "max_size": CACHE["max_size"] // (1024 * 1024),
+        "size": CACHE["size"],
+    }
+
+
+def filehash(path: Path) -> str:
+    """SHA-256 Hash des Inhalts einer Datei"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def sourceHash(source: Path) -> str:
+    """SHA-256 der Ausgangsdatei, pro Prozess gemerkt solange sich Größe und mtime nicht ändern"""
+    stat = source.stat()
+    k = (str(source), stat.st_size, stat.st_mtime)
+    if k not in _hashes:
+        _hashes[k] = filehash(source)
+    return _hashes[k]
+
+
+def derivativeParams(
+    kind: str, max_dimensions, jpg_quality: int = None, fast_scaling: bool = False
+) -> dict:
+    """
+    Konvertierungsparameter, die in den Schlüssel eines Derivats eingehen.
+
+    Arguments:
+        kind -- "jpg" für Auslieferungs-JPGs, "thumb" für Thumbnails
+
+        max_dimensions -- bei Thumbnails die Verkleinerung, aus der das Thumbnail berechnet wird (oder None)
+    """
+    params = {"kind": kind, "max_dimensions": max_dimensions, "fast": fast_scaling}
+    if kind == "jpg":
+        params["jpg_quality"] = jpg_quality
+    else:
+        params["size"] = 250
+    return params
+
+
+def ocrParams(
+    tesseract_language: Union[str, None], tesseract_version: str, engine: str
+) -> dict:
+    """
+    Parameter, die in den Schlüssel einer ALTO Datei eingehen. Die engine gehört dazu,
+    weil ein aus dem Batch aufgeteiltes ALTO andere Seiten IDs hat als eines pro Seite.
+    """
+    return {
+        "kind": "alto",
+        "lang": tesseract_language,
+        "tesseract": tesseract_version,
+        "engine": engine,
+    }
+
+
+def cacheKey(source: Path, params: dict) -> Union[str, None]:
+    """
+    Schlüssel aus dem Inhalt der Ausgangsdatei und den Konvertierungsparametern.
+    None, wenn der Cache nicht aktiv ist.
+    """
+    if CACHE["folder"] is None:
+        return None
+    h = hashlib.sha256(sourceHash(source).encode())
+    h.update(json.dumps(params, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def _entry(key: str) -> Path:
+    return CACHE["folder"] / key[:2] / key
+
+
+def cacheGet(key: Union[str, None], target: Path) -> bool:
+    """Kopiert einen Eintrag nach target. Gibt False zurück, wenn es keinen gibt."""
+    if key is None:
+        return False
+    entry = _entry(key)
+    try:
+        shutil.copyfile(entry, target)
+        # für die LRU Verdrängung als benutzt markieren
+        os.utime(entry)
+    except OSError:
+        return False
+    return True
+
+
+def cacheRead(key: Union[str, None]) -> Union[bytes, None]:
+    """Inhalt eines Eintrags oder None, wenn es keinen gibt"""
+    if key is None:
+        return None
+    entry = _entry(key)
+    try:
+        data = entry.read_bytes()
+        os.utime(entry)
+    except OSError:
+        return None
+    return data
+
+
+def cachePut(key: Union[str, None], path: Path) -> None:
+    """Legt eine erzeugte Datei im Cache ab"""
+    if key is None:
+        return
+    _store(key, lambda tmp: shutil.copyfile(path, tmp))
+
+
+def cacheWrite(key: Union[str, None], data: bytes) -> None:
+    """Legt erzeugte Daten im Cache ab"""
+    if key is None:
+        return
+    _store(key, lambda tmp: tmp.write_bytes(data))
+
+
+def _store(key: str, write) -> None:
+    entry = _entry(key)
+    entry.parent.mkdir(exist_ok=True)
+    # erst unter temporärem Namen schreiben, damit andere Prozesse keine halben Dateien lesen
+    tmp = entry.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        write(tmp)
+        size = tmp.stat().st_size
+        # ein vorhandener Eintrag (z.B. von einem anderen Prozess) wird ersetzt
+        try:
+            size -= entry.stat().st_size
+        except OSError:
+            pass
+        os.replace(tmp, entry)
+    except OSError:
+        tmp.unlink(missing_ok=True)
+        return
+    with CACHE["size"].get_lock():
+        CACHE["size"].value += size
+        full = CACHE["size"].value > CACHE["max_size"]
+    if full:
+        evict()
+
+
+def _diskSize() -> tuple:
+    # Größe aller Einträge auf der Platte und die Einträge als (mtime, Größe, Pfad)
+    entries = []
+    for f in CACHE["folder"].glob("*/*"):
+        if f.suffix == ".tmp":
+            # wird gerade von einem anderen Prozess geschrieben
+            continue
+        try:
+            stat = f.stat()
+        except OSError:
+            # schon von einem anderen Prozess gelöscht
+            continue
+        entries.append((stat.st_mtime, stat.st_size, f))
+    return sum(e[1] for e in entries), entries
+
+
+def evict() -> None:
+    """
+    Löscht die am längsten nicht benutzten Einträge, bis der Cache auf 90% der maximalen
+    Größe ist. Die Größe wird dafür neu von der Platte gezählt, damit auch Einträge
+    anderer Prozesse und Läufe mitzählen.
+    """
+    size, entries = _diskSize()
+    for mtime, s, f in sorted(entries, key=lambda e: e[0]):
+        if size <= CACHE["max_size"] * 0.9:
+            break
+        f.unlink(missing_ok=True)
+        size -= s
+    with CACHE["size"].get_lock():
+        CACHE["size"].value = size
@@ -1,17 +1,67 @@
-import pytesseract
 from natsort import natsorted
 from PIL import Image, ImageFile
 from pathlib import Path
-import zipfile
-import time
-import fitz  # PyMuPDF
 import io
+import copy
 import re
-from typing import List, Tuple
-import shutil
+from typing import List, Tuple, Union
+import os
+import subprocess
+import tempfile
+import time
+from lxml import etree
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .cache import (
+    cacheKey,
+    cacheGet,
+    cachePut,
+    cacheRead,
+    cacheWrite,
+    derivativeParams,
+    ocrParams,
+)
+from .archive import writeOutput, copyOutputs
+from . import hooks
+
+# Einstellungen für die Texterkennung, werden in main() aus dem Abschnitt [OCR] der TOML gesetzt
+#   workers: Anzahl gleichzeitiger Tesseract Prozesse
+#   engine: "single" (ein Tesseract Aufruf pro Seite) oder "batch" (ein Aufruf pro Einheit)
+#   version: erkannte Tesseract Version, Teil des Schlüssels im OCR Cache
+#   existing_alto: vorhandene ALTO Dateien neben den Bildern nehmen (z.B. aus PDF2JPG --alto)
+#   cmd: Pfad zu Tesseract ([OCR] tesseract_executable), None = tesseract aus dem PATH
+#   timeout: Sekunden pro Seite, nach denen ein hängender Tesseract Prozess beendet wird
+TESSERACT = {
+    "workers": 1,
+    "engine": "single",
+    "version": None,
+    "existing_alto": False,
+    "cmd": None,
+    "timeout": 300,
+}
+
+# Seiten ohne ALTO Datei nach OCR Fehlern seit dem letzten takeOcrFailures (für das Manifest)
+OCRFAILED = {"pages": 0}
+
+
+def tesseract():
+    """
+    pytesseract wird erst bei Bedarf geladen, damit Läufe ohne OCR (und --help) schnell
+    starten. Setzt dabei den Pfad zu Tesseract aus TESSERACT["cmd"].
+    """
+    import pytesseract
 
+    if TESSERACT["cmd"] is not None:
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT["cmd"]
+    return pytesseract
 
-def extractImagesFromPDF(pdffile: Path, outputfolder: Path, compressionlevel: int):
+
+def extractImagesFromPDF(
+    pdffile: Path, outputfolder: Path, compressionlevel: int, alto: bool = False
+):
+    """
+    Mit alto=True wird die Textebene jeder Seite als ALTO neben das JPG geschrieben
+    (siehe pdftext.pageAlto).
+    """
 
     if date := re.search(r"\d{1,}\.\d{1,}\.\d{2,}", pdffile.stem):
         d = re.sub(r"(\d+)\.(\d+)\.(\d+)", r"\3-\2-\1", date[0])
@@ -20,35 +70,51 @@ def extractImagesFromPDF(pdffile: Path, outputfolder: Path, compressionlevel: in
         isodate = isodate[0]
     else:
         isodate = None
+    # PyMuPDF nur laden, wenn wirklich PDFs bearbeitet werden
+    import fitz  # PyMuPDF
+    from .pdftext import pageAlto
+
     # open the file
     pdf_file = fitz.open(pdffile)
     # iterate over PDF pages
     for page_index in range(len(pdf_file)):
         # get the page itself
         page = pdf_file[page_index]
+        extracted = None
         for image_index, img in enumerate(page.get_images(), start=1):
             # get the XREF of the image
             xref = img[0]
             # extract the image bytes
             base_image = pdf_file.extract_image(xref)
             image_bytes = base_image["image"]
-            # load it to PIL
-            image = Image.open(io.BytesIO(image_bytes))
-            # save it to local disk
             if isodate:
                 filename = f"{isodate}--{pdffile.stem}_{page_index+1:02}.jpg"
             else:
                 filename = f"{pdffile.stem}__{page_index+1:02}.jpg"
+            # bei mehreren Bildern auf der Seite bleibt (wie beim JPG) das letzte
+            extracted = (xref, base_image["width"], base_image["height"], filename)
+            if base_image["ext"] in ["jpeg", "jpg"]:
+                # schon ein JPG (DCTDecode): unverändert schreiben, ohne Dekodieren und
+                # erneutes Komprimieren, das wäre langsam und kostet Qualität
+                Path(outputfolder, filename).write_bytes(image_bytes)
+                continue
+            # load it to PIL
+            image = Image.open(io.BytesIO(image_bytes))
+            # save it to local disk
             image.save(Path(outputfolder, filename), "JPEG", quality=compressionlevel)
+        if alto and extracted is not None:
+            xml = pageAlto(page, *extracted)
+            if xml is not None:
+                Path(outputfolder, Path(extracted[3]).stem + ".xml").write_bytes(xml)
 
 
 def renamePictures(
     listofjpgs: list, recordIdentifier: str, outputfolder: Path, suffix: str
 ) -> list:
     newjpgs = []
-    # Die Sortierung spinnt, weil sie bspw. 10 vor 1 sieht
-    listofjpgs = natsorted(listofjpgs)
+    # listofjpgs ist schon natürlich sortiert (siehe scan.scanFolder), sonst käme bspw. 10 vor 1
     n = 0
+    copies = []
 
     for j in listofjpgs:
         n += 1
@@ -61,7 +127,8 @@ def renamePictures(
             j.rename(Path(outputfolder / "binaries" / renamedjpgpath))
         else:
             # wenn die Datei noch nicht im Ausgangsordner liegt wird sie dahin verschoben
-            shutil.copy(str(j), str(Path(outputfolder / "binaries" / renamedjpgpath)))
+            copies.append((j, Path(outputfolder / "binaries" / renamedjpgpath)))
+    copyOutputs(copies)
     return newjpgs
 
 
@@ -72,60 +139,481 @@ def ocr(
     outputfolder: Path,
     rename: bool,
     recordIdentifier: str,
-) -> None:
+    workers: int = None,
+) -> List[Path]:
+    """
+    Erstellt mit Tesseract pro Bild eine ALTO XML Datei im Ausgabe Ordner.
+
+    Mit workers > 1 (Default: TESSERACT["workers"]) laufen mehrere Tesseract Prozesse
+    gleichzeitig. Jeder davon rechnet dann nur mit einem OpenMP Thread, damit die Kerne
+    nicht überbucht werden. Die Namen der ALTO Dateien hängen nur von der Reihenfolge
+    der Bilder ab und sind dieselben wie bei der Bearbeitung nacheinander.
+
+    Mit TESSERACT["engine"] == "batch" wird Tesseract nicht pro Seite, sondern pro Worker
+    nur einmal mit einer Liste aller Bilder aufgerufen (siehe ocrBatch).
+
+    Ist der Cache aktiv, werden Seiten, deren Bild mit derselben Sprache, derselben
+    Tesseract Version und derselben engine schon erkannt wurde, aus dem Cache genommen.
+
+    Mit TESSERACT["existing_alto"] wird für Seiten, neben deren Bild schon eine ALTO
+    Datei mit demselben Namen liegt (z.B. die Textebene eines PDFs, siehe pdftext), diese
+    übernommen und Tesseract gar nicht aufgerufen.
+
+    listofimages muss natürlich sortiert sein (wie im Index, siehe scan.scanFolder),
+    die Nummerierung der ALTO Dateien folgt dieser Reihenfolge.
+
+    Returns:
+        Liste der geschriebenen ALTO Dateien, Seiten mit Fehlern zählt takeOcrFailures
+    """
+    if workers is None:
+        workers = TESSERACT["workers"]
     if tesseract_language is not None:
         print(f"Führe OCR mit Sprache '{tesseract_language}' durch", flush=True)
     else:
         print(f"Führe OCR durch", flush=True)
-    listofimages = natsorted(listofimages)
+    if TESSERACT["version"] is not None:
+        params = ocrParams(
+            tesseract_language, TESSERACT["version"], TESSERACT["engine"]
+        )
+    else:
+        params = None
+    jobs = []
     i = 0
     for j in listofimages:
         i += 1
         padded_n = str(i).zfill(3)
-        print(f"OCR Datei {i} von {len(listofimages)} ({j})", flush=True)
         if rename == True:
             altoname = Path(
                 outputfolder / "binaries" / (recordIdentifier + "_" + padded_n + ".xml")
             )
         else:
             altoname = Path(outputfolder / "binaries" / (j.stem + ".xml"))
+        key = cacheKey(j, params) if params is not None else None
+        jobs.append((j, altoname, key))
+
+    cached = []
+    existing = 0
+    for j, altoname, key in jobs:
+        start = time.perf_counter()
+        if TESSERACT["existing_alto"] and j.with_suffix(".xml").is_file():
+            logger.debug(f"{altoname} aus {j.with_suffix('.xml')}")
+            xml = setAltoFilename(j.with_suffix(".xml").read_bytes(), j)
+            writeOutput(altoname, xml)
+            cached.append(altoname)
+            existing += 1
+            if hooks.HOOKS["ocr_done"]:
+                hooks.emit(
+                    "ocr_done",
+                    {
+                        "source": j,
+                        "alto": altoname,
+                        "method": "existing",
+                        "seconds": time.perf_counter() - start,
+                    },
+                )
+            continue
+        xml = cacheRead(key)
+        if xml is not None:
+            logger.debug(f"{altoname} aus dem Cache")
+            writeOutput(altoname, setAltoFilename(xml, j))
+            cached.append(altoname)
+            if hooks.HOOKS["ocr_done"]:
+                hooks.emit(
+                    "ocr_done",
+                    {
+                        "source": j,
+                        "alto": altoname,
+                        "method": "cache",
+                        "seconds": time.perf_counter() - start,
+                    },
+                )
+    if existing > 0:
+        print(f"{existing} vorhandene ALTO Dateien übernommen", flush=True)
+    if len(cached) > existing:
+        print(f"{len(cached) - existing} OCR Dateien aus dem Cache", flush=True)
+    alljobs = jobs
+    jobs = [job for job in jobs if job[1] not in cached]
+
+    if workers > 1 and len(jobs) > 1:
+        # Tesseract parallelisiert intern mit OpenMP. Bei mehreren Prozessen wird das
+        # abgeschaltet, sofern es nicht schon von außen festgelegt wurde.
+        os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+    if TESSERACT["engine"] == "batch" and len(jobs) > 0:
+        # zusammenhängende Teile der Seitenliste, ein Tesseract Aufruf pro Teil
+        size = -(-len(jobs) // max(min(workers, len(jobs)), 1))
+        chunks = [jobs[k : k + size] for k in range(0, len(jobs), size)]
+        with ThreadPoolExecutor(max_workers=max(len(chunks), 1)) as executor:
+            futures = {
+                executor.submit(ocrBatch, chunk, tesseract_language, logger): chunk
+                for chunk in chunks
+            }
+            i = 0
+            for future in as_completed(futures):
+                for j, altoname, key in futures[future]:
+                    i += 1
+                    print(f"OCR Datei {i} von {len(jobs)} ({j})", flush=True)
+        # Reihenfolge wie bei der Bearbeitung nacheinander
+        results = [future.result() for future in futures]
+        altos = [a for chunk in results for a in chunk]
+    elif workers > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    ocrPage, j, altoname, tesseract_language, logger, key
+                ): j
+                for j, altoname, key in jobs
+            }
+            i = 0
+            for future in as_completed(futures):
+                i += 1
+                print(f"OCR Datei {i} von {len(jobs)} ({futures[future]})", flush=True)
+        # Reihenfolge wie bei der Bearbeitung nacheinander
+        altos = [future.result() for future in futures]
+    else:
+        altos = []
+        i = 0
+        for j, altoname, key in jobs:
+            i += 1
+            print(f"OCR Datei {i} von {len(jobs)} ({j})", flush=True)
+            altos.append(ocrPage(j, altoname, tesseract_language, logger, key))
+    # Reihenfolge der Seiten, egal ob aus dem Cache oder neu erkannt
+    done = set(cached) | {a for a in altos if a is not None}
+    OCRFAILED["pages"] += len(alljobs) - len(done)
+    return [altoname for j, altoname, key in alljobs if altoname in done]
+
+
+def takeOcrFailures() -> int:
+    """
+    Gibt die Anzahl der Seiten zurück, für die seit dem letzten Aufruf wegen eines OCR
+    Fehlers keine ALTO Datei geschrieben wurde
+    """
+    pages = OCRFAILED["pages"]
+    OCRFAILED["pages"] = 0
+    return pages
+
+
+def ocrBatch(jobs: List[tuple], tesseract_language: str, logger) -> list:
+    """
+    OCR für mehrere Bilder mit einem einzigen Tesseract Aufruf. Tesseract bekommt eine
+    Textdatei mit den Bildpfaden, startet dadurch nur einmal und lädt die Sprachmodelle
+    nur einmal. Das ALTO mit allen Seiten wird danach in eine Datei pro Seite aufgeteilt.
+    Schlägt der Aufruf fehl oder braucht er länger als TESSERACT["timeout"] pro Seite,
+    wird jede Seite einzeln mit ocrPage erkannt.
+
+    Arguments:
+        jobs -- Liste von (Bildpfad, Pfad der ALTO Datei, Cache Schlüssel oder None)
+
+    Returns:
+        Liste der ALTO Pfade in der Reihenfolge von jobs (None bei Fehlern)
+    """
+    if len(jobs) == 0:
+        return []
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        listfile = Path(tmp, "images.txt")
+        listfile.write_text("\n".join(str(job[0]) for job in jobs) + "\n")
+        cmd = [
+            tesseract().pytesseract.tesseract_cmd,
+            str(listfile),
+            str(Path(tmp, "out")),
+        ]
+        if tesseract_language is not None:
+            cmd += ["-l", tesseract_language]
+        cmd += ["-c", "tessedit_create_alto=1"]
         try:
-            xml = pytesseract.image_to_alto_xml(Image.open(j), lang=tesseract_language)
+            subprocess.run(
+                cmd,
+                check=True,
+                capture_output=True,
+                timeout=TESSERACT["timeout"] * len(jobs),
+            )
+            pages = splitAlto(Path(tmp, "out.xml").read_bytes())
         except Exception as e:
-            logger.error(e)
+            logger.warning(f"Batch OCR fehlgeschlagen, erkenne Seiten einzeln: {e}")
+            pages = []
+    if len(pages) != len(jobs):
+        if len(pages) != 0:
+            logger.warning(
+                f"Batch OCR lieferte {len(pages)} statt {len(jobs)} Seiten, erkenne Seiten einzeln"
+            )
+        return [
+            ocrPage(j, altoname, tesseract_language, logger, key)
+            for j, altoname, key in jobs
+        ]
+    seconds = (time.perf_counter() - start) / len(jobs)
+    altos = []
+    for (j, altoname, key), doc in zip(jobs, pages):
+        # im Original steht hier die Liste der Bilder, nicht das Bild der Seite
+        for filename in doc.iter("{*}fileName"):
+            filename.text = str(j)
+        xml = etree.tostring(doc, xml_declaration=True, encoding="UTF-8")
+        writeOutput(altoname, xml)
+        cacheWrite(key, xml)
+        altos.append(altoname)
+        if hooks.HOOKS["ocr_done"]:
+            hooks.emit(
+                "ocr_done",
+                {"source": j, "alto": altoname, "method": "batch", "seconds": seconds},
+            )
+    return altos
+
+
+def setAltoFilename(xml: bytes, image: Path) -> bytes:
+    """Trägt in ein ALTO aus dem Cache den Pfad des aktuellen Bildes ein"""
+    root = etree.fromstring(xml)
+    filenames = [f for f in root.iter("{*}fileName") if f.text != str(image)]
+    if len(filenames) == 0:
+        return xml
+    for f in filenames:
+        f.text = str(image)
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8")
+
+
+def splitAlto(xml: bytes) -> list:
+    """Teilt ein ALTO Dokument mit mehreren Seiten in ein Dokument pro Seite auf"""
+    root = etree.fromstring(xml)
+    layout = root.find("{*}Layout")
+    pages = list(layout)
+    docs = []
+    for page in pages:
+        if not isinstance(page.tag, str):
+            continue
+        for other in list(layout):
+            layout.remove(other)
+        layout.append(page)
+        docs.append(copy.deepcopy(root))
+    return docs
+
+
+def ocrPage(
+    image: Path, altoname: Path, tesseract_language: str, logger, key: str = None
+) -> Union[Path, None]:
+    """
+    OCR für ein Bild, gibt den Pfad der ALTO Datei zurück oder None bei einem Fehler.
+    Mit key wird das Ergebnis im Cache abgelegt. Tesseract wird nach TESSERACT["timeout"]
+    Sekunden abgebrochen.
+    """
+    start = time.perf_counter()
+    try:
+        # Tesseract liest die Datei selbst, so muss pytesseract das Bild nicht erst
+        # dekodieren und als temporäre Datei neu schreiben
+        xml = tesseract().image_to_alto_xml(
+            str(image), lang=tesseract_language, timeout=TESSERACT["timeout"]
+        )
+    except Exception as e:
+        logger.error(e)
+        return None
+    else:
+        writeOutput(altoname, xml)
+        cacheWrite(key, xml)
+        if hooks.HOOKS["ocr_done"]:
+            hooks.emit(
+                "ocr_done",
+                {
+                    "source": image,
+                    "alto": altoname,
+                    "method": "tesseract",
+                    "seconds": time.perf_counter() - start,
+                },
+            )
+        return altoname
+
+
+def scaleImage(img: Image.Image, size: int, fast: bool = False) -> None:
+    """
+    Verkleinert ein Bild (in place) auf maximal size x size Pixel.
+
+    Mit fast=True wird bei JPGs schon beim Dekodieren von libjpeg im DCT Raum verkleinert
+    (draft mode, nur wirksam solange das Bild noch nicht geladen ist). Danach wird mit
+    reduce() so weit wie möglich ganzzahlig verkleinert und erst der Rest neu berechnet.
+    Das kostet etwas Qualität, spart aber viel Rechenzeit und Speicher.
+    """
+    if fast:
+        img.draft(img.mode, (size, size))
+        img.thumbnail((size, size), reducing_gap=1.0)
+    else:
+        img.thumbnail((size, size))
+
+
+def createDerivatives(
+    pages: List[dict],
+    logger,
+    max_dimensions: int,
+    jpg_quality: int,
+    fast_scaling: bool = False,
+):
+    """
+    Erzeugt alle Bildderivate einer Seite aus einer einzigen Dekodierung der Ausgangsdatei:
+    das Auslieferungs-JPG (ggf. auf max_dimensions verkleinert) und das 250px Thumbnail.
+    Ist der Derivate-Cache aktiv, wird eine Seite gar nicht dekodiert, wenn beide Derivate
+    schon im Cache liegen.
+
+    Arguments:
+        pages -- Liste mit einem dict pro Seite:
+            "source": Pfad zur Ausgangsdatei (TIF oder JPG)
+            "jpg": Zielpfad des Auslieferungs-JPGs
+            "convert": True, wenn das JPG neu berechnet werden soll, sonst wird die Ausgangsdatei kopiert
+            "thumb": Zielpfad des Thumbnails oder None
+
+        fast_scaling -- schnelle Verkleinerung, siehe scaleImage
+
+    Returns:
+        Zeit und Bytes der neu berechneten Thumbnails (für metrics), sie entstehen aus
+        derselben Dekodierung wie die JPGs
+    """
+    thumbstats = {"thumbs": 0, "seconds": 0.0, "cpu_seconds": 0.0, "bytes": 0}
+    converts = [p for p in pages if p["convert"]]
+    thumbs = len([p for p in pages if p["thumb"] is not None])
+    reducejpgs = len(converts) != 0 and converts[0]["source"].suffix.lower() in [
+        ".jpg",
+        ".jpeg",
+    ]
+    if reducejpgs:
+        print(f"Verkleinere {len(converts)} JPGs", flush=True)
+        logger.info(f"Verkleinere {len(converts)} JPGs")
+    elif len(converts) != 0:
+        print(f"Erstelle JPGs aus {len(converts)} Dateien", flush=True)
+        logger.info(f"Erstelle JPGs aus {len(converts)} Dateien")
+    if thumbs != 0:
+        print(f"Erstelle Thumbnails für {thumbs} Dateien", flush=True)
+    ImageFile.LOAD_TRUNCATED_IMAGES = True
+    # unveränderte JPGs vorab, ggf. gleichzeitig, in die Ausgabe übernehmen
+    copyOutputs([(p["source"], p["jpg"]) for p in pages if not p["convert"]])
+    if hooks.HOOKS["page_converted"]:
+        for p in pages:
+            if not p["convert"]:
+                hooks.emit(
+                    "page_converted",
+                    {
+                        "source": p["source"],
+                        "jpg": p["jpg"],
+                        "method": "copy",
+                        "seconds": None,
+                    },
+                )
+    for page in pages:
+        j = page["source"]
+        start = time.perf_counter()
+        if page["convert"]:
+            jpgkey = cacheKey(
+                j,
+                derivativeParams("jpg", max_dimensions, jpg_quality, fast_scaling),
+            )
+            data = cacheRead(jpgkey)
+            havejpg = data is not None
+            if havejpg:
+                writeOutput(page["jpg"], data)
+                logger.debug(f"{page['jpg']} aus dem Cache")
+                if hooks.HOOKS["page_converted"]:
+                    hooks.emit(
+                        "page_converted",
+                        {
+                            "source": j,
+                            "jpg": page["jpg"],
+                            "method": "cache",
+                            "seconds": time.perf_counter() - start,
+                        },
+                    )
         else:
-            with open(altoname, "wb") as f:
-                f.write(xml)
-
-
-def zipfiles(inputfolder: Path, outputfolder: Path, logger, logname: str, OCR: bool):
-    print("Zippe Daten...", flush=True)
-    t = time.strftime("%Y-%m-%d_%H-%M-%S")
-    binarieszip = outputfolder / (t + "__" + inputfolder.name + "_binaries.zip")
-    metszip = outputfolder / (t + "__" + inputfolder.name + "_mets.zip")
-
-    with zipfile.ZipFile(binarieszip, "w", compression=zipfile.ZIP_DEFLATED) as zipObj:
-        for f in list(Path(outputfolder / "binaries").rglob("*.jpg")):
-            zipObj.write(f, arcname=f.name)
-            f.unlink(missing_ok=True)
-        logger.info("JPGs gezippt")
-    if OCR == True:
-        with zipfile.ZipFile(
-            binarieszip, "a", compression=zipfile.ZIP_DEFLATED
-        ) as zipObj:
-            for f in list(Path(outputfolder / "binaries").rglob("*.xml")):
-                zipObj.write(f, arcname=f.name)
-                f.unlink(missing_ok=True)
-            logger.info("ALTO XML gezippt")
-
-    with zipfile.ZipFile(metszip, "w", compression=zipfile.ZIP_DEFLATED) as zipObj:
-        for f in list(Path(outputfolder).glob("*.xml")):
-            zipObj.write(f, arcname=f.name)
-            f.unlink(missing_ok=True)
-        print("METS Dateien gezippt", flush=True)
-        logger.info("METS Dateien gezippt")
-
-    print("ZIP Vorgang abgeschlossen", flush=True)
+            havejpg = True
+        if page["thumb"] is not None:
+            thumbstart = time.perf_counter()
+            thumbkey = cacheKey(
+                j,
+                derivativeParams(
+                    "thumb",
+                    max_dimensions if page["convert"] else None,
+                    fast_scaling=fast_scaling,
+                ),
+            )
+            data = cacheRead(thumbkey)
+            havethumb = data is not None
+            if havethumb:
+                writeOutput(page["thumb"], data)
+                logger.debug(f"{page['thumb']} aus dem Cache")
+                if hooks.HOOKS["thumbnail_written"]:
+                    hooks.emit(
+                        "thumbnail_written",
+                        {
+                            "source": j,
+                            "thumb": page["thumb"],
+                            "method": "cache",
+                            "bytes": len(data),
+                            "seconds": time.perf_counter() - thumbstart,
+                        },
+                    )
+        else:
+            havethumb = True
+        if havejpg and havethumb:
+            # Seite muss gar nicht dekodiert werden
+            continue
+        try:
+            img = Image.open(j)
+        except Exception as e:
+            logger.error(e)
+            continue
+        if page["convert"]:
+            try:
+                # als Default keine Skalierung, nur wenn max_dimensions vergeben wurde
+                if max_dimensions:
+                    scaleImage(img, max_dimensions, fast_scaling)
+                if not havejpg:
+                    buffer = io.BytesIO()
+                    img.save(buffer, "jpeg", quality=jpg_quality)
+                    writeOutput(page["jpg"], buffer.getvalue())
+            except Exception as e:
+                logger.error(e)
+                continue
+            else:
+                if havejpg:
+                    pass
+                elif reducejpgs:
+                    logger.debug(f"JPG verkleinert und in {page['jpg']} geschrieben.")
+                    cacheWrite(jpgkey, buffer.getvalue())
+                else:
+                    logger.debug(f"Converted TIF to JPG and saved to {page['jpg']}.")
+                    cacheWrite(jpgkey, buffer.getvalue())
+                if not havejpg and hooks.HOOKS["page_converted"]:
+                    hooks.emit(
+                        "page_converted",
+                        {
+                            "source": j,
+                            "jpg": page["jpg"],
+                            "method": "convert",
+                            "seconds": time.perf_counter() - start,
+                        },
+                    )
+        if not havethumb:
+            # das Thumbnail wird aus dem bereits dekodierten (und ggf. verkleinerten) Bild berechnet
+            wall = time.perf_counter()
+            cpu = time.thread_time()
+            try:
+                scaleImage(img, 250, fast_scaling)
+                buffer = io.BytesIO()
+                img.save(buffer, "jpeg")
+                writeOutput(page["thumb"], buffer.getvalue())
+            except Exception as e:
+                logger.info(e)
+            else:
+                logger.debug(f"Saved {page['thumb']}")
+                cacheWrite(thumbkey, buffer.getvalue())
+                thumbstats["thumbs"] += 1
+                thumbstats["bytes"] += len(buffer.getvalue())
+                if hooks.HOOKS["thumbnail_written"]:
+                    hooks.emit(
+                        "thumbnail_written",
+                        {
+                            "source": j,
+                            "thumb": page["thumb"],
+                            "method": "scale",
+                            "bytes": len(buffer.getvalue()),
+                            "seconds": time.perf_counter() - wall,
+                        },
+                    )
+            thumbstats["seconds"] += time.perf_counter() - wall
+            thumbstats["cpu_seconds"] += time.thread_time() - cpu
+    return thumbstats
 
 
 def createJPGfromTIFF(
@@ -134,12 +622,19 @@ def createJPGfromTIFF(
     max_dimensions: int,
     jpg_quality: int,
     outputfolder: Path,
+    fast_scaling: bool = False,
 ):
     print(f"Erstelle JPGs aus {len(listoftiffs)} Dateien", flush=True)
     logger.info(f"Erstelle JPGs aus {len(listoftiffs)} Dateien", flush=True)
     listoftiffs = natsorted(listoftiffs)
     for j in listoftiffs:
         jpgfilename = j.stem + ".jpg"
+        key = cacheKey(
+            j, derivativeParams("jpg", max_dimensions, jpg_quality, fast_scaling)
+        )
+        if cacheGet(key, Path(outputfolder / "binaries" / jpgfilename)):
+            logger.debug(f"{jpgfilename} aus dem Cache")
+            continue
         try:
             img = Image.open(j)
         except Exception as e:
@@ -149,7 +644,7 @@ def createJPGfromTIFF(
             try:
                 # als Default keine Skalierung, nur wenn max_dimensions vergeben wurde
                 if max_dimensions:
-                    img.thumbnail((max_dimensions, max_dimensions))
+                    scaleImage(img, max_dimensions, fast_scaling)
                 img.save(
                     Path(outputfolder / "binaries" / jpgfilename),
                     "jpeg",
@@ -161,6 +656,7 @@ def createJPGfromTIFF(
                 logger.debug(
                     f"Converted TIF to JPG and saved to {str(Path(outputfolder / 'binaries' / jpgfilename))}."
                 )
+                cachePut(key, Path(outputfolder / "binaries" / jpgfilename))
 
 
 def reduceJPGs(
@@ -169,12 +665,19 @@ def reduceJPGs(
     max_dimensions: int,
     jpg_quality: int,
     outputfolder: Path,
+    fast_scaling: bool = False,
 ):
     print(f"Verkleinere {len(list_of_images)} JPGs", flush=True)
     logger.info(f"Verkleinere {len(list_of_images)} JPGs")
     list_of_images = natsorted(list_of_images)
     for j in list_of_images:
         filename = j.stem + ".jpg"
+        key = cacheKey(
+            j, derivativeParams("jpg", max_dimensions, jpg_quality, fast_scaling)
+        )
+        if cacheGet(key, Path(outputfolder / "binaries" / filename)):
+            logger.debug(f"{filename} aus dem Cache")
+            continue
         try:
             img = Image.open(j)
         except Exception as e:
@@ -182,7 +685,7 @@ def reduceJPGs(
             pass
         else:
             try:
-                img.thumbnail((max_dimensions, max_dimensions))
+                scaleImage(img, max_dimensions, fast_scaling)
             except Exception as e:
                 logger.error(e)
             else:
@@ -194,10 +697,16 @@ def reduceJPGs(
                 logger.debug(
                     f"JPG verkleinert und in {str(Path(outputfolder / 'binaries' / filename))} geschrieben."
                 )
+                cachePut(key, Path(outputfolder / "binaries" / filename))
 
 
 def generate_thumbails(
-    listofjpgs: list, logger, outputfolder: Path, recordIdentifier: str, rename: bool
+    listofjpgs: list,
+    logger,
+    outputfolder: Path,
+    recordIdentifier: str,
+    rename: bool,
+    fast_scaling: bool = False,
 ):
     print(f"Erstelle Thumbnails für {len(listofjpgs)} Dateien", flush=True)
     ImageFile.LOAD_TRUNCATED_IMAGES = True
@@ -215,6 +724,10 @@ def generate_thumbails(
             )
         else:
             thumbfn = Path(outputfolder / "binaries" / (j.stem + "_thumb" + j.suffix))
+        key = cacheKey(j, derivativeParams("thumb", None, fast_scaling=fast_scaling))
+        if cacheGet(key, thumbfn):
+            logger.debug(f"{thumbfn} aus dem Cache")
+            continue
         try:
             img = Image.open(j)
         except Exception as e:
@@ -222,7 +735,7 @@ def generate_thumbails(
             pass
         else:
             try:
-                img.thumbnail((250, 250))
+                scaleImage(img, 250, fast_scaling)
             except Exception as e:
                 logger.info(e)
             else:
@@ -232,3 +745,4 @@ def generate_thumbails(
                     logger.info(e)
                 else:
                     logger.debug(f"Saved {thumbfn}")
+                    cachePut(key, thumbfn)
@@ -0,0 +1,125 @@
+"""
+Hooks für eigene Auswertungen während eines Laufs (z.B. Monitoring, Prüfsummen,
+Fortschrittsanzeigen), ohne die Ausgaben auf der Konsole auswerten zu müssen.
+
+Ein Hook ist eine Funktion callback(event, payload), die mit register für ein Ereignis
+eingetragen wird. payload ist ein dict, Zeiten sind in Sekunden. Jeder payload enthält
+unit, den Namen der gerade bearbeiteten Einheit (siehe beginUnit), dazu:
+
+    unit_started      -- path, pages
+    page_converted    -- source, jpg, method ("convert", "cache", "copy"), seconds
+    thumbnail_written -- source, thumb, method ("scale", "cache", "copy"), bytes, seconds
+    ocr_done          -- source, alto, method ("tesseract", "batch", "cache", "existing"), seconds
+    mets_written      -- path, pages, seconds
+    zip_member_added  -- archive, name, bytes, compressed_bytes, seconds
+
+Bei übernommenen Dateien (method "copy") ist seconds None, sie werden gemeinsam kopiert.
+Bei "batch" ist seconds der Anteil der Seite am gemeinsamen Tesseract Aufruf.
+
+Die Hooks werden in dem Prozess aufgerufen, in dem das Ereignis passiert, bei OCR und ZIP
+Einträgen auch aus mehreren Threads gleichzeitig. Damit sie bei --workers auch in den
+Worker-Prozessen eingetragen sind, werden sie über Module in der TOML Datei geladen:
+
+    [hooks]
+    modules = ["mein_monitoring", "/pfad/zu/pruefsummen.py"]
+
+Jedes Modul muss eine Funktion register() haben, die mit hooks.register die Callbacks
+einträgt. Ohne eingetragene Hooks kosten die Ereignisse nichts: vor jedem Aufruf wird
+geprüft, ob es für das Ereignis überhaupt Hooks gibt (if HOOKS[event]), erst dann wird
+der payload gebaut.
+"""
+
+import importlib
+import importlib.util
+from pathlib import Path
+from typing import Callable, List
+
+EVENTS = [
+    "unit_started",
+    "page_converted",
+    "thumbnail_written",
+    "ocr_done",
+    "mets_written",
+    "zip_member_added",
+]
+
+# Ereignis -> eingetragene Callbacks
+HOOKS = {event: [] for event in EVENTS}
+
+# modules: Module aus der TOML Datei, logger: für Fehler in den Callbacks
+# unit: die gerade bearbeitete Einheit, loaded: von den Modulen eingetragene (event, callback)
+SETTINGS = {"modules": [], "logger": None, "unit": None, "loaded": []}
+
+
+def register(event: str, callback: Callable) -> None:
+    """Trägt callback(event, payload) für ein Ereignis ein"""
+    if event not in HOOKS:
+        raise ValueError(f"Unbekanntes Ereignis {event}, möglich: {', '.join(EVENTS)}")
+    HOOKS[event].append(callback)
+
+
+def unregister(event: str, callback: Callable) -> None:
+    """Entfernt einen Callback wieder"""
+    HOOKS[event].remove(callback)
+
+
+def emit(event: str, payload: dict) -> None:
+    """
+    Ruft die Callbacks eines Ereignisses auf. Ein Fehler in einem Callback wird nur
+    geloggt, der Lauf geht weiter.
+    """
+    payload.setdefault("unit", SETTINGS["unit"])
+    for callback in HOOKS[event]:
+        try:
+            callback(event, payload)
+        except Exception as e:
+            if SETTINGS["logger"] is not None:
+                SETTINGS["logger"].warning(
+                    f"Fehler im Hook {getattr(callback, '__name__', callback)} für {event}: {e}"
+                )
+
+
+def beginUnit(name: str, path: Path, pages: int) -> None:
+    """Alle folgenden Ereignisse des Prozesses gehören zu dieser Einheit"""
+    SETTINGS["unit"] = name
+    if HOOKS["unit_started"]:
+        emit("unit_started", {"path": path, "pages": pages})
+
+
+def setupHooks(modules: List[str], logger) -> None:
+    """
+    Lädt die Module und ruft ihre register() Funktion auf. Die Hooks, die ein früherer
+    Aufruf aus Modulen eingetragen hat, werden vorher entfernt, so werden sie in
+    Worker-Prozessen (fork) und bei mehreren Läufen nicht doppelt eingetragen. Direkt mit
+    register eingetragene Hooks bleiben erhalten.
+
+    Arguments:
+        modules -- Modulnamen (müssen importierbar sein) oder Pfade zu .py Dateien
+    """
+    for event, callback in SETTINGS["loaded"]:
+        if callback in HOOKS[event]:
+            HOOKS[event].remove(callback)
+    SETTINGS["loaded"] = []
+    SETTINGS["modules"] = list(modules)
+    SETTINGS["logger"] = logger
+    for name in modules:
+        if name.endswith(".py"):
+            spec = importlib.util.spec_from_file_location(Path(name).stem, name)
+            if spec is None:
+                raise ImportError(f"Kann {name} nicht laden")
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+        else:
+            module = importlib.import_module(name)
+        if not hasattr(module, "register"):
+            raise ImportError(f"{name} hat keine Funktion register()")
+        # register() hängt an, neu sind also die Callbacks hinter den bisherigen
+        before = {event: len(callbacks) for event, callbacks in HOOKS.items()}
+        module.register()
+        for event, callbacks in HOOKS.items():
+            SETTINGS["loaded"] += [(event, c) for c in callbacks[before[event] :]]
+
+
+def hooksSettings() -> dict:
+    """Module zur Übergabe an Worker-Prozesse"""
+    return {"modules": SETTINGS["modules"]}
@@ -0,0 +1,234 @@
+"""
+Manifest für inkrementelle Läufe.
+
+Im Ausgabe-Ordner wird eine SQLite Datei geführt, in der pro bearbeiteter Einheit
+(Zeitungsausgabe, Jahrgang, Buch) die Ausgangsdateien mit Größe, Änderungsdatum und
+Hash, die verwendeten Einstellungen und die erzeugten Dateien stehen. Bei einem
+erneuten Lauf mit --incremental werden Einheiten übersprungen, an denen sich nichts
+geändert hat und deren Ausgabedateien noch vorhanden sind.
+
+Größe und Änderungsdatum der Ausgangsdateien kommen aus dem Index des Eingabe-Ordners
+(siehe scan.scanFolder), die Ordner werden dafür nicht noch einmal gelesen.
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Union
+from .cache import filehash
+from .scan import allFiles
+
+MANIFESTNAME = "structmeta_manifest.sqlite"
+
+
+def openManifest(outputfolder: Path, settings: dict) -> dict:
+    """
+    Öffnet (oder erstellt) das Manifest im Ausgabe-Ordner.
+
+    Arguments:
+        outputfolder -- Ausgabe-Ordner
+
+        settings -- alle Einstellungen, die die Ausgabe beeinflussen (siehe runSettings)
+
+    Returns:
+        manifest -- dict mit der Datenbankverbindung ("db") und den Einstellungen als JSON ("settings")
+    """
+    db = sqlite3.connect(str(Path(outputfolder, MANIFESTNAME)))
+    db.execute("""CREATE TABLE IF NOT EXISTS units (
+            unit TEXT PRIMARY KEY,
+            settings TEXT NOT NULL,
+            outputs TEXT NOT NULL,
+            updated TEXT NOT NULL
+        )""")
+    db.execute("""CREATE TABLE IF NOT EXISTS sources (
+            unit TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            mtime REAL NOT NULL,
+            hash TEXT NOT NULL,
+            PRIMARY KEY (unit, path)
+        )""")
+    db.commit()
+    return {"db": db, "settings": json.dumps(settings, sort_keys=True, default=str)}
+
+
+def runSettings(
+    metadata: dict,
+    do_thumbs: bool,
+    OCR: bool,
+    create_filegrp_fulltext: bool,
+    tesseract_language: Union[str, None],
+    renameimages: bool,
+    max_dimensions: Union[int, None],
+    jpg_quality: int,
+    fast_scaling: bool,
+    tesseract_version: Union[str, None],
+    ocr_engine: Union[str, None],
+    existing_alto: Union[bool, None],
+    zip: bool,
+    zipshard: str,
+) -> dict:
+    """
+    Alle Einstellungen eines Laufs, die sich auf die erzeugten Dateien auswirken.
+    tesseract_version ist bei --plan None, Tesseract wird dort nicht gestartet.
+    """
+    return {
+        # die TOML Metadaten landen in den METS Dateien
+        "metadata": metadata,
+        "do_thumbs": do_thumbs,
+        "OCR": OCR,
+        "create_filegrp_fulltext": create_filegrp_fulltext,
+        "tesseract_language": tesseract_language,
+        "renameimages": renameimages,
+        "max_dimensions": max_dimensions,
+        "jpg_quality": jpg_quality,
+        "fast_scaling": fast_scaling,
+        "tesseract_version": tesseract_version,
+        "ocr_engine": ocr_engine,
+        "existing_alto": existing_alto,
+        # mit --zip stehen die Ausgaben (je nach shard) in anderen Dateien
+        "zip": zip,
+        "zipshard": zipshard if zip else None,
+    }
+
+
+def unitName(folder: Path) -> str:
+    """Schlüssel einer Einheit im Manifest, z.B. '984399-1/1802-01-01'"""
+    return folder.parent.name + "/" + folder.name
+
+
+def sourceFiles(unit: dict) -> dict:
+    """
+    Alle Dateien einer Einheit aus dem Index, inklusive der Unterordner für
+    Strukturelemente: Pfad -> (Größe, Änderungsdatum)
+    """
+    return allFiles(unit)
+
+
+def fingerprint(unit: dict) -> List[dict]:
+    """
+    Erfasst Größe, Änderungsdatum und Hash aller Ausgangsdateien einer Einheit.
+    Kann auch in einem Worker-Prozess laufen, das Ergebnis wird mit recordUnit gespeichert.
+
+    Arguments:
+        unit -- Ordner der Einheit aus dem Index (siehe scan.scanFolder)
+    """
+    sources = []
+    for f, (size, mtime) in sorted(sourceFiles(unit).items()):
+        sources.append(
+            {
+                "path": f.relative_to(unit["path"]).as_posix(),
+                "size": size,
+                "mtime": mtime,
+                "hash": filehash(f),
+            }
+        )
+    return sources
+
+
+def isUnchanged(manifest: dict, unit: dict) -> bool:
+    """
+    Prüft, ob eine Einheit seit dem letzten Lauf unverändert ist: gleiche Einstellungen,
+    gleiche Ausgangsdateien und alle damals erzeugten Dateien sind noch vorhanden.
+    Hashes werden nur für Dateien berechnet, deren Größe oder Änderungsdatum abweicht.
+    Stimmt der Hash noch (z.B. nach touch oder einer Kopie ohne Zeitstempel), wird das
+    neue Änderungsdatum gespeichert, damit die Datei beim nächsten Lauf nicht wieder
+    gehasht werden muss.
+    """
+    return compareUnit(manifest, unit, hashing=True) == "unchanged"
+
+
+def compareUnit(manifest: dict, unit: dict, hashing: bool) -> str:
+    """
+    Vergleicht eine Einheit mit dem Manifest (siehe isUnchanged).
+
+    Arguments:
+        hashing -- False für --plan: es werden nur Größe und Änderungsdatum verglichen,
+                   keine Datei gelesen und nichts gespeichert
+
+    Returns:
+        "unchanged", "changed" oder ohne hashing "possibly_changed", wenn sich nur das
+        Änderungsdatum einzelner Dateien unterscheidet
+    """
+    db = manifest["db"]
+    folder = unit["path"]
+    name = unitName(folder)
+    row = db.execute(
+        "SELECT settings, outputs FROM units WHERE unit = ?", (name,)
+    ).fetchone()
+    if row is None or not _sameSettings(row[0], manifest["settings"], hashing):
+        return "changed"
+    if not all(Path(o).exists() for o in json.loads(row[1])):
+        return "changed"
+    known = {
+        path: (size, mtime, hash)
+        for path, size, mtime, hash in db.execute(
+            "SELECT path, size, mtime, hash FROM sources WHERE unit = ?", (name,)
+        )
+    }
+    files = sourceFiles(unit)
+    if len(files) != len(known):
+        return "changed"
+    touched = []
+    for f, (size, mtime) in files.items():
+        path = f.relative_to(folder).as_posix()
+        if path not in known:
+            return "changed"
+        knownsize, knownmtime, hash = known[path]
+        if size != knownsize:
+            return "changed"
+        if mtime != knownmtime:
+            if hashing and filehash(f) != hash:
+                return "changed"
+            touched.append((mtime, name, path))
+    if len(touched) == 0:
+        return "unchanged"
+    if not hashing:
+        return "possibly_changed"
+    with db:
+        db.executemany(
+            "UPDATE sources SET mtime = ? WHERE unit = ? AND path = ?", touched
+        )
+    return "unchanged"
+
+
+def _sameSettings(recorded: str, settings: str, hashing: bool) -> bool:
+    # ohne hashing (--plan) ist die Tesseract Version nicht bekannt, sie wird dann als
+    # unverändert angenommen
+    if recorded == settings:
+        return True
+    if hashing:
+        return False
+    recorded, settings = json.loads(recorded), json.loads(settings)
+    if settings.get("tesseract_version") is not None:
+        return False
+    recorded.pop("tesseract_version", None)
+    settings.pop("tesseract_version", None)
+    return recorded == settings
+
+
+def recordUnit(
+    manifest: dict, folder: Path, sources: List[dict], outputs: List[Path]
+) -> None:
+    """
+    Speichert eine erfolgreich bearbeitete Einheit im Manifest. Mit --zip sind outputs
+    die ZIP Dateien, in die die Einheit geschrieben wurde (siehe archive.archivedOutputs).
+    """
+    db = manifest["db"]
+    unit = unitName(folder)
+    with db:
+        db.execute("DELETE FROM sources WHERE unit = ?", (unit,))
+        db.executemany(
+            "INSERT INTO sources (unit, path, size, mtime, hash) VALUES (?, ?, ?, ?, ?)",
+            [(unit, s["path"], s["size"], s["mtime"], s["hash"]) for s in sources],
+        )
+        db.execute(
+            "INSERT OR REPLACE INTO units (unit, settings, outputs, updated) VALUES (?, ?, ?, ?)",
+            (
+                unit,
+                manifest["settings"],
+                json.dumps([str(o) for o in outputs]),
+                time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            ),
+        )
@@ -0,0 +1,218 @@
+"""
+Messwerte pro Schritt und Einheit.
+
+Für jeden Schritt einer Einheit (Ausgabe, Jahrgang, Buch) wird ein Datensatz als eine
+Zeile JSON in eine Datei neben dem Log geschrieben (JSON Lines):
+
+    stage           -- discovery, conversion, thumbnails, ocr, mets, zip
+    unit            -- Name der Einheit (siehe beginUnit), bei Schritten für den ganzen
+                       Lauf null. Bei Strukturelementen gibt es pro Element einen Datensatz.
+    pages           -- bearbeitete Seiten
+    wall_seconds    -- verstrichene Zeit
+    cpu_seconds     -- CPU Zeit des Prozesses inklusive beendeter Kindprozesse (Tesseract)
+    bytes_read      -- gelesene Bytes des Prozesses (Linux, sonst null)
+    bytes_written   -- geschriebene Bytes des Prozesses (Linux, sonst null)
+    pid, time       -- Prozess und Zeitpunkt, bei --workers schreiben alle Prozesse hinein
+
+Am Ende des Laufs folgt eine Zusammenfassung mit Seiten pro Sekunde je Schritt
+("stage": "summary"). Thumbnails, die bei der Konvertierung aus demselben dekodierten
+Bild entstehen, werden aus der Konvertierung herausgerechnet. Der Schritt zip enthält
+die Zeit für das Komprimieren und Schreiben der ZIP Einträge, die bei direktem Schreiben
+ins ZIP auch in den anderen Schritten enthalten ist.
+"""
+
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Union
+from .archive import takeZipStats
+from . import profiling
+
+# path: Datei für die Messwerte, wird in main() bzw. in den Worker-Prozessen gesetzt
+# pending: Datensätze von vor setupMetrics (z.B. discovery), werden dann nachgetragen
+# unit: die gerade bearbeitete Einheit
+METRICS = {"path": None, "pending": [], "unit": None}
+
+STAGES = ["discovery", "conversion", "thumbnails", "ocr", "mets", "zip"]
+
+
+def setupMetrics(path: Union[Path, str, None]) -> None:
+    """Legt die Datei für die Messwerte fest und schreibt bisher gesammelte Datensätze"""
+    METRICS["path"] = path
+    pending = METRICS["pending"]
+    METRICS["pending"] = []
+    for record in pending:
+        _write(record)
+
+
+def metricsSettings() -> dict:
+    """Datei für die Messwerte zur Übergabe an Worker-Prozesse"""
+    return {"path": METRICS["path"]}
+
+
+def beginUnit(name: Union[str, None]) -> None:
+    """Alle folgenden Datensätze des Prozesses gehören zu dieser Einheit"""
+    METRICS["unit"] = name
+    profiling.beginUnit(name)
+
+
+def counters() -> dict:
+    """Aktuelle Zähler des Prozesses"""
+    t = os.times()
+    c = {
+        "wall": time.perf_counter(),
+        # process_time ist genauer als os.times, das nur in Ticks zählt
+        "cpu": time.process_time() + t.children_user + t.children_system,
+        "read": None,
+        "written": None,
+    }
+    try:
+        with open("/proc/self/io", "rb") as f:
+            values = dict(line.split(b": ") for line in f.read().splitlines())
+    except OSError:
+        # nur unter Linux verfügbar
+        pass
+    else:
+        c["read"] = int(values[b"rchar"])
+        c["written"] = int(values[b"wchar"])
+    return c
+
+
+@contextmanager
+def stage(name: str, pages: int = 0):
+    """
+    Misst einen Schritt, mit --profile auch im Profiler des Schritts. Der Datensatz wird
+    zurückgegeben, z.B. um die Anzahl der Seiten erst nach dem Schritt einzutragen
+    (record["pages"] = n).
+    """
+    record = {"stage": name, "unit": METRICS["unit"], "pages": pages}
+    start = counters()
+    try:
+        with profiling.profiled(name):
+            yield record
+    finally:
+        measured(record, start)
+        addRecord(record)
+
+
+def measured(record: dict, start: dict) -> dict:
+    """Trägt die Differenz der Zähler seit start in den Datensatz ein"""
+    end = counters()
+    record["wall_seconds"] = end["wall"] - start["wall"]
+    record["cpu_seconds"] = end["cpu"] - start["cpu"]
+    if start["read"] is not None:
+        record["bytes_read"] = end["read"] - start["read"]
+        record["bytes_written"] = end["written"] - start["written"]
+    else:
+        record["bytes_read"] = None
+        record["bytes_written"] = None
+    return record
+
+
+def conversionStage(pages: int, start: dict, thumbstats: dict) -> None:
+    """
+    Datensätze für createDerivatives: die Thumbnails (siehe Rückgabe von
+    createDerivatives) werden aus der Konvertierung herausgerechnet.
+    """
+    record = {"stage": "conversion", "unit": METRICS["unit"], "pages": pages}
+    measured(record, start)
+    if thumbstats["thumbs"] != 0:
+        record["wall_seconds"] -= thumbstats["seconds"]
+        # die Zeiten kommen aus verschiedenen Uhren, nicht unter 0
+        record["cpu_seconds"] = max(
+            record["cpu_seconds"] - thumbstats["cpu_seconds"], 0.0
+        )
+        if record["bytes_written"] is not None:
+            record["bytes_written"] -= thumbstats["bytes"]
+    addRecord(record)
+    if thumbstats["thumbs"] != 0:
+        addRecord(
+            {
+                "stage": "thumbnails",
+                "unit": METRICS["unit"],
+                "pages": thumbstats["thumbs"],
+                "wall_seconds": thumbstats["seconds"],
+                "cpu_seconds": thumbstats["cpu_seconds"],
+                "bytes_read": 0,
+                "bytes_written": thumbstats["bytes"],
+            }
+        )
+
+
+def zipStage(pages: int) -> None:
+    """Datensatz für die ZIP Einträge der Einheit (siehe archive.takeZipStats)"""
+    stats = takeZipStats()
+    if stats["bytes"] == 0:
+        # ohne --zip bzw. nichts geschrieben
+        return
+    addRecord(
+        {
+            "stage": "zip",
+            "unit": METRICS["unit"],
+            "pages": pages,
+            "wall_seconds": stats["seconds"],
+            "cpu_seconds": stats["cpu_seconds"],
+            "bytes_read": None,
+            "bytes_written": stats["bytes"],
+        }
+    )
+
+
+def addRecord(record: dict) -> None:
+    """Schreibt einen Datensatz, z.B. einen aus einem anderen Schritt herausgerechneten"""
+    record.setdefault("pid", os.getpid())
+    record.setdefault("time", time.strftime("%Y-%m-%dT%H:%M:%S"))
+    if METRICS["path"] is None:
+        METRICS["pending"].append(record)
+    else:
+        _write(record)
+
+
+def _write(record: dict) -> None:
+    # eine Zeile mit einem write im Anhängemodus, so kommen sich die Prozesse nicht in die Quere
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with open(METRICS["path"], "a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def summary(run_seconds: float) -> dict:
+    """Fasst die Datensätze des Laufs pro Schritt zusammen und hängt das Ergebnis an"""
+    stages = {}
+    with open(METRICS["path"], encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["stage"] == "summary":
+                continue
+            s = stages.setdefault(
+                record["stage"],
+                {
+                    "records": 0,
+                    "pages": 0,
+                    "wall_seconds": 0.0,
+                    "cpu_seconds": 0.0,
+                    "bytes_read": 0,
+                    "bytes_written": 0,
+                },
+            )
+            s["records"] += 1
+            for key in ["pages", "wall_seconds", "cpu_seconds"]:
+                s[key] += record[key]
+            for key in ["bytes_read", "bytes_written"]:
+                if record[key] is not None:
+                    s[key] += record[key]
+    for s in stages.values():
+        s["pages_per_second"] = (
+            s["pages"] / s["wall_seconds"] if s["wall_seconds"] > 0 else None
+        )
+    # bekannte Schritte in der Reihenfolge der Bearbeitung
+    ordered = {name: stages[name] for name in STAGES if name in stages}
+    ordered.update({k: v for k, v in stages.items() if k not in ordered})
+    result = {
+        "stage": "summary",
+        "run_seconds": run_seconds,
+        "stages": ordered,
+    }
+    addRecord(result)
+    return result
@@ -0,0 +1,662 @@
+"""
+Aufbau der METS/MODS Dokumente.
+
+Die Dokumente werden direkt als lxml Elemente erzeugt. Texte und Attributwerte werden
+dabei von lxml maskiert (z.B. & im Namen der Institution), das Dokument muss also nicht
+erst als String zusammengesetzt und dann neu geparst werden. Aufbau, Reihenfolge und
+Namespace Deklarationen entsprechen den bisherigen Vorlagen.
+
+Die Teile, die mit der Seitenzahl wachsen (fileSec, PHYSICAL structMap und structLink),
+werden nicht als Elemente aufgebaut, sondern erst beim Schreiben mit etree.xmlfile Seite
+für Seite in die Datei geschrieben. Im Baum steht an ihrer Stelle nur ein Platzhalter.
+So bleibt der Speicherbedarf auch bei Jahrgängen mit mehr als 10000 Seiten gleich.
+
+Teile, die nur von der TOML Datei abhängen und damit für alle Einheiten eines Laufs gleich
+sind (Institution, dv:rights, Digitalisierung, Sprache, Zeitungstitel), werden pro Prozess
+einmal erzeugt und danach nur noch kopiert (siehe fragment).
+"""
+
+import copy
+import time
+from functools import partial
+from pathlib import Path
+from typing import List
+from lxml import etree
+from natsort import natsorted
+
+NS = {
+    "mets": "http://www.loc.gov/METS/",
+    "xlink": "http://www.w3.org/1999/xlink",
+    "mods": "http://www.loc.gov/mods/v3",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+    "dv": "http://dfg-viewer.de/",
+    "xs": "http://www.w3.org/2001/XMLSchema",
+}
+
+INDENT = "  "
+
+# die fertigen Teile zu den Metadaten, für die sie erzeugt wurden
+TEMPLATES = {"metadata": None, "fragments": {}}
+
+SCHEMALOCATION = "http://www.loc.gov/mods/v3 http://www.loc.gov/standards/mods/v3/mods-3-8.xsd http://www.loc.gov/METS/ http://www.loc.gov/standards/mets/mets.xsd"
+
+
+def qname(name: str) -> str:
+    """'mets:file' -> '{http://www.loc.gov/METS/}file', Namen ohne Präfix bleiben wie sie sind"""
+    if ":" not in name:
+        return name
+    prefix, local = name.split(":", 1)
+    return "{" + NS[prefix] + "}" + local
+
+
+def nsmap(*prefixes: str) -> dict:
+    """Namespace Deklarationen für ein Element, z.B. nsmap('mods')"""
+    return {p: NS[p] for p in prefixes}
+
+
+def sub(
+    parent: etree._Element,
+    name: str,
+    attrib: dict = None,
+    text=None,
+    ns: dict = None,
+) -> etree._Element:
+    """
+    Hängt ein Element an parent an.
+
+    Arguments:
+        name -- Name mit Präfix, z.B. 'mets:file'
+
+        attrib -- Attribute in der Reihenfolge, in der sie geschrieben werden sollen
+
+        text -- Textinhalt, wird in einen String umgewandelt
+
+        ns -- zusätzliche Namespace Deklarationen an diesem Element (siehe nsmap)
+    """
+    attrib = {qname(k): str(v) for k, v in (attrib or {}).items()}
+    el = etree.SubElement(parent, qname(name), attrib, nsmap=ns)
+    if text is not None:
+        el.text = str(text)
+    return el
+
+
+def metsRoot(attrib: dict, *prefixes: str) -> etree._Element:
+    """Wurzelelement mets:mets mit xsi:schemaLocation als letztem Attribut"""
+    attrib = {qname(k): str(v) for k, v in attrib.items()}
+    attrib[qname("xsi:schemaLocation")] = SCHEMALOCATION
+    return etree.Element(qname("mets:mets"), attrib, nsmap=nsmap(*prefixes))
+
+
+def fragment(metadata: dict, name: str, build, *args) -> etree._Element:
+    """
+    Kopie eines Teils, der für alle Einheiten eines Laufs gleich ist. Beim ersten
+    Aufruf wird er mit build(parent, metadata, *args) erzeugt. Ändern sich die
+    Metadaten, werden alle Teile neu erzeugt.
+
+    Arguments:
+        name -- Name des Teils, zusammen mit args der Schlüssel
+    """
+    if TEMPLATES["metadata"] != metadata:
+        TEMPLATES["metadata"] = copy.deepcopy(metadata)
+        TEMPLATES["fragments"] = {}
+    key = (name,) + args
+    if key not in TEMPLATES["fragments"]:
+        # im Eltern-Element sind die Namespaces deklariert, die auch die Dokumente haben
+        parent = etree.Element(
+            qname("mets:mets"), nsmap=nsmap("mets", "xlink", "mods", "xsi")
+        )
+        TEMPLATES["fragments"][key] = build(parent, metadata, *args)
+    return copy.deepcopy(TEMPLATES["fragments"][key])
+
+
+def stream(root: etree._Element, streams: dict, name: str, write) -> None:
+    """
+    Platzhalter für einen Teil, der erst beim Schreiben erzeugt wird.
+
+    Arguments:
+        streams -- Platzhalter des Dokuments, name -> write
+
+        write -- Funktion (xf, depth), die den Teil mit etree.xmlfile schreibt
+    """
+    root.append(etree.Comment(name))
+    streams[name] = write
+
+
+def writeDocument(doc: dict, f) -> None:
+    """
+    Schreibt ein Dokument (siehe newspaperDocument usw.) eingerückt wie mit pretty_print
+    und wie bisher ohne XML Deklaration in die geöffnete Datei f.
+    """
+    with etree.xmlfile(f, encoding="utf-8") as xf:
+        _writeElement(xf, doc["root"], doc["streams"], 0)
+    f.write(b"\n")
+
+
+def _writeElement(xf, el: etree._Element, streams: dict, depth: int) -> None:
+    if depth > 0:
+        xf.write("\n" + INDENT * depth)
+    # nur die Namespaces deklarieren, die nicht schon vom Elternelement kommen
+    parent = el.getparent()
+    inscope = parent.nsmap if parent is not None else {}
+    ns = {p: uri for p, uri in el.nsmap.items() if inscope.get(p) != uri}
+    with xf.element(el.tag, dict(el.attrib), nsmap=ns or None):
+        if el.text is not None:
+            xf.write(el.text)
+        for child in el:
+            if child.tag is etree.Comment:
+                streams[child.text](xf, depth + 1)
+            else:
+                _writeElement(xf, child, streams, depth + 1)
+        if len(el) != 0:
+            xf.write("\n" + INDENT * depth)
+
+
+def _start(xf, depth: int, name: str, attrib: dict = None, ns: dict = None):
+    # Beginn eines Elements in einem Teil, der direkt geschrieben wird
+    xf.write("\n" + INDENT * depth)
+    attrib = {qname(k): str(v) for k, v in (attrib or {}).items()}
+    return xf.element(qname(name), attrib, nsmap=ns)
+
+
+def _end(xf, depth: int) -> None:
+    xf.write("\n" + INDENT * depth)
+
+
+def metsHdr(
+    root: etree._Element,
+    metadata: dict,
+    datecreated: str,
+    version: str,
+    dv: bool = True,
+) -> etree._Element:
+    """metsHdr mit der Institution und Structmeta als Agenten"""
+    hdr = sub(
+        root,
+        "mets:metsHdr",
+        {
+            "CREATEDATE": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "LASTMODDATE": datecreated,
+        },
+    )
+    hdr.append(fragment(metadata, "agent", institutionAgent, dv))
+    agent = sub(
+        hdr,
+        "mets:agent",
+        {"ROLE": "OTHER", "TYPE": "OTHER", "OTHERTYPE": "SOFTWARE"},
+    )
+    sub(agent, "mets:name", text=f"Structmeta {version}")
+    return hdr
+
+
+def institutionAgent(
+    parent: etree._Element, metadata: dict, dv: bool
+) -> etree._Element:
+    """mets:agent der Institution für den metsHdr"""
+    agent = sub(
+        parent,
+        "mets:agent",
+        {"ROLE": "CREATOR", "TYPE": "ORGANIZATION"},
+        ns=nsmap("dv") if dv else None,
+    )
+    sub(agent, "mets:name", text=metadata["institution"]["name"])
+    return agent
+
+
+def rightsAmdSec(
+    root: etree._Element, metadata: dict, amdid: str, newspaper: bool = False
+) -> etree._Element:
+    """amdSec mit den dv:rights aus dem Abschnitt [institution] der TOML"""
+    institution = metadata["institution"]
+    if newspaper:
+        amd = sub(root, "mets:amdSec", {"ID": amdid}, ns=nsmap("dv"))
+        mdwrapattrib = {"MIMETYPE": "text/xml", "MDTYPE": "OTHER"}
+        rightsns = None
+    else:
+        amd = sub(root, "mets:amdSec", {"ID": amdid})
+        mdwrapattrib = {"MDTYPE": "OTHER", "MIMETYPE": "text/xml"}
+        rightsns = nsmap("dv")
+    mdwrapattrib["OTHERMDTYPE"] = "DVRIGHTS"
+    rightsmd = sub(amd, "mets:rightsMD", {"ID": "RIGHTS"})
+    xmldata = sub(sub(rightsmd, "mets:mdWrap", mdwrapattrib), "mets:xmlData")
+    rights = sub(xmldata, "dv:rights", ns=rightsns)
+    sub(rights, "dv:owner", text=institution["name"])
+    sub(rights, "dv:ownerLogo", text=institution["logoURL"])
+    sub(rights, "dv:ownerSiteURL", text=institution["siteURL"])
+    sub(rights, "dv:ownerContact", text=institution["contact"])
+    sub(rights, "dv:license", text=institution["license"])
+    if "sponsor" in institution:
+        sub(rights, "dv:sponsor", text=institution["sponsor"])
+    return amd
+
+
+def modsSec(root: etree._Element, dmdid: str, ns: bool = True) -> etree._Element:
+    """dmdSec mit leerem mods:mods, gibt mods:mods zurück"""
+    dmd = sub(root, "mets:dmdSec", {"ID": dmdid})
+    xmldata = sub(sub(dmd, "mets:mdWrap", {"MDTYPE": "MODS"}), "mets:xmlData")
+    return sub(xmldata, "mods:mods", ns=nsmap("mods") if ns else None)
+
+
+def chapterDmdSec(root: etree._Element, elemname: str, idno: int) -> etree._Element:
+    """dmdSec für ein Strukturelement (Unterordner) mit dessen Titel"""
+    mods = modsSec(root, f"DMDLOG_{idno}")
+    sub(sub(mods, "mods:titleInfo"), "mods:title", text=elemname)
+    return mods
+
+
+def writeFileGrp(use: str, names, idprefix: str, mimetype: str, xf, depth: int) -> None:
+    with _start(xf, depth, "mets:fileGrp", {"USE": use}):
+        n = 0
+        for name in names:
+            n += 1
+            attrib = {"MIMETYPE": mimetype, "ID": f"{idprefix}_{n}"}
+            with _start(xf, depth + 1, "mets:file", attrib):
+                with _start(
+                    xf, depth + 2, "mets:FLocat", {"LOCTYPE": "URL", "xlink:href": name}
+                ):
+                    pass
+                _end(xf, depth + 1)
+        if n != 0:
+            _end(xf, depth)
+
+
+def writeFileSec(
+    jpgs: List[Path], thumbs: List[Path], fulltext: bool, xf, depth: int
+) -> None:
+    """
+    fileSec mit den Gruppen DEFAULT, THUMBS und bei fulltext FULLTEXT.
+    Die ALTO Dateien werden wie die JPGs benannt, in natürlicher Sortierung.
+    """
+    with _start(xf, depth, "mets:fileSec"):
+        names = (j.name for j in jpgs)
+        writeFileGrp("DEFAULT", names, "default", "image/jpg", xf, depth + 1)
+        names = (t.name for t in thumbs)
+        writeFileGrp("THUMBS", names, "thumb", "image/jpg", xf, depth + 1)
+        if fulltext:
+            names = (n.split(".")[0] + ".xml" for n in natsorted(j.name for j in jpgs))
+            writeFileGrp("FULLTEXT", names, "ocr", "text/xml", xf, depth + 1)
+        _end(xf, depth)
+
+
+def writePhysicalStructMap(pagecount: int, fulltext: bool, xf, depth: int) -> None:
+    """structMap PHYSICAL mit einem mets:div pro Seite"""
+    with _start(xf, depth, "mets:structMap", {"TYPE": "PHYSICAL"}):
+        seq = {"ID": "phys", "CONTENTIDS": "NULL", "TYPE": "physSequence"}
+        with _start(xf, depth + 1, "mets:div", seq):
+            for n in range(1, pagecount + 1):
+                page = {
+                    "TYPE": "page",
+                    "ID": f"phys_{n}",
+                    "CONTENTIDS": "NULL",
+                    "ORDER": n,
+                    "ORDERLABEL": n,
+                }
+                with _start(xf, depth + 2, "mets:div", page, ns=nsmap("xs")):
+                    fileids = [f"default_{n}", f"thumb_{n}"]
+                    if fulltext:
+                        fileids.append(f"ocr_{n}")
+                    for fileid in fileids:
+                        with _start(xf, depth + 3, "mets:fptr", {"FILEID": fileid}):
+                            pass
+                    _end(xf, depth + 2)
+            if pagecount != 0:
+                _end(xf, depth + 1)
+        _end(xf, depth)
+
+
+def structLink(divid: str, pagecount: int, startpage: int) -> tuple:
+    """
+    Verknüpfung eines logischen Elements mit seinen Seiten: die ID des mets:div und
+    pagecount Seiten ab der physischen Seite startpage. Die einzelnen mets:smLink
+    entstehen erst beim Schreiben.
+    """
+    return (divid, startpage, pagecount)
+
+
+def writeStructLink(links: List[tuple], xf, depth: int) -> None:
+    """structLink mit einem smLink pro Seite und Element aus links (siehe structLink)"""
+    with _start(xf, depth, "mets:structLink"):
+        n = 0
+        for divid, startpage, pagecount in links:
+            for page in range(startpage + 1, startpage + pagecount + 1):
+                n += 1
+                attrib = {"xlink:from": divid, "xlink:to": f"phys_{page}"}
+                with _start(xf, depth + 1, "mets:smLink", attrib):
+                    pass
+        if n != 0:
+            _end(xf, depth)
+
+
+def digitizationOriginInfo(mods: etree._Element, metadata: dict) -> etree._Element:
+    """originInfo der Digitalisierung bei Monographien und Zeitschriften"""
+    origin = sub(mods, "mods:originInfo", {"eventType": "digitization"})
+    sub(
+        sub(origin, "mods:place"),
+        "mods:placeTerm",
+        {"type": "text"},
+        metadata["objects"]["place_of_digitization"],
+    )
+    sub(
+        origin,
+        "mods:dateCaptured",
+        {"encoding": "iso8601"},
+        metadata["objects"]["year_of_digitization"],
+    )
+    sub(origin, "mods:publisher", text=metadata["institution"]["name"])
+    sub(origin, "mods:edition", text="[Electronic ed.]")
+    return origin
+
+
+def newspaperDigitization(mods: etree._Element, metadata: dict) -> etree._Element:
+    """originInfo der Digitalisierung bei Zeitungen"""
+    origin = sub(mods, "mods:originInfo", {"eventType": "digitization"})
+    sub(
+        origin,
+        "mods:dateCaptured",
+        {"encoding": "iso8601"},
+        metadata["objects"]["year_of_digitization"],
+    )
+    sub(origin, "mods:publisher", text=metadata["institution"]["name"])
+    return origin
+
+
+def language(mods: etree._Element, metadata: dict, newspaper: bool) -> etree._Element:
+    """mods:language mit der Sprache aus der TOML"""
+    if newspaper:
+        attrib = {
+            "type": "code",
+            "valueURI": "http://id.loc.gov/vocabulary/iso639-2/ger",
+        }
+    else:
+        attrib = {"authority": "iso639-2b", "type": "code"}
+    lang = sub(mods, "mods:language")
+    sub(lang, "mods:languageTerm", attrib, metadata["objects"]["sprache"])
+    return lang
+
+
+def hostItem(mods: etree._Element, metadata: dict, zdb_id: str) -> etree._Element:
+    """mods:relatedItem mit ZDB-ID und Titel der Zeitung"""
+    host = sub(mods, "mods:relatedItem", {"type": "host"})
+    sub(host, "mods:identifier", {"type": "zdb"}, zdb_id)
+    sub(sub(host, "mods:titleInfo"), "mods:title", text=metadata["objects"]["title"])
+    return host
+
+
+def newspaperDocument(
+    metadata: dict,
+    version: str,
+    identifier: str,
+    zdb_id: str,
+    dateissued: str,
+    modsnumber: str,
+    datecreated: str,
+    recordChangeDate: str,
+    jpgs: List[Path],
+    thumbs: List[Path],
+    fulltext: bool,
+) -> dict:
+    """METS/MODS einer Zeitungsausgabe, zum Schreiben mit writeDocument"""
+    institution = metadata["institution"]
+    objects = metadata["objects"]
+    root = metsRoot(
+        {"OBJID": identifier, "TYPE": "newspaper"}, "mets", "xlink", "mods", "xsi"
+    )
+    metsHdr(root, metadata, datecreated, version)
+    streams = {}
+
+    mods = modsSec(root, "dmd", ns=False)
+    part = sub(mods, "mods:part", {"order": dateissued.replace("-", "")})
+    sub(sub(part, "mods:detail", {"type": "issue"}), "mods:number", text=modsnumber)
+    origin = sub(mods, "mods:originInfo", {"eventType": "publication"})
+    sub(origin, "mods:dateIssued", {"encoding": "iso8601"}, dateissued)
+    mods.append(fragment(metadata, "newspaperDigitization", newspaperDigitization))
+    mods.append(fragment(metadata, "language", language, True))
+    sub(
+        sub(mods, "mods:physicalDescription"),
+        "mods:extent",
+        text=f"{len(jpgs)} Seiten",
+    )
+    mods.append(fragment(metadata, "host", hostItem, zdb_id))
+    record = sub(mods, "mods:recordInfo")
+    sub(record, "mods:recordIdentifier", {"source": institution["isil"]}, identifier)
+    sub(record, "mods:recordChangeDate", {"encoding": "iso8601"}, recordChangeDate)
+    sub(mods, "mods:genre", {"displayLabel": "document type"}, "issue")
+    sub(mods, "mods:typeOfResource", text="text")
+
+    root.append(fragment(metadata, "rights", rightsAmdSec, "amd", True))
+    stream(root, streams, "fileSec", partial(writeFileSec, jpgs, thumbs, fulltext))
+    stream(
+        root,
+        streams,
+        "physical",
+        partial(writePhysicalStructMap, len(jpgs), fulltext),
+    )
+    structmap = sub(root, "mets:structMap", {"TYPE": "LOGICAL"})
+    sub(
+        structmap,
+        "mets:div",
+        {
+            "TYPE": "issue",
+            "ID": "LOG",
+            "DMDID": "dmd",
+            "ADMID": "amd",
+            "ORDER": "1",
+            "ORDERLABEL": dateissued,
+            "LABEL": objects["title"] + " " + modsnumber,
+        },
+    )
+    links = [structLink("LOG", len(jpgs), 0)]
+    stream(root, streams, "structLink", partial(writeStructLink, links))
+    return {"root": root, "streams": streams}
+
+
+def monographDocument(
+    metadata: dict,
+    version: str,
+    booktitle: str,
+    recordid: str,
+    datecreated: str,
+    jpgs: List[Path],
+    thumbs: List[Path],
+    chapters: List[dict],
+    links: List[tuple],
+    fulltext: bool,
+) -> dict:
+    """
+    METS/MODS eines Buches, zum Schreiben mit writeDocument.
+
+    Arguments:
+        chapters -- pro Strukturelement ein dict mit "name" und "idno" (Nummer der dmdSec)
+
+        links -- Verknüpfungen der logischen Elemente mit den Seiten (siehe structLink)
+    """
+    institution = metadata["institution"]
+    objects = metadata["objects"]
+    root = metsRoot({}, "mets", "xlink", "xsi")
+    metsHdr(root, metadata, datecreated, version, dv=False)
+    streams = {}
+
+    mods = modsSec(root, "DMDLOG_1")
+    sub(
+        sub(mods, "mods:location"),
+        "mods:physicalLocation",
+        {
+            "valueURI": "http://ld.zdb-services.de/resource/organisations/"
+            + institution["isil"]
+        },
+        institution["name"],
+    )
+    origin = sub(mods, "mods:originInfo", {"eventType": "publication"})
+    if "auflage" in objects:
+        sub(origin, "mods:edition", text=objects["auflage"])
+        sub(origin, "mods:publisher", text=objects["verlag"])
+    sub(
+        sub(origin, "mods:place"),
+        "mods:placeTerm",
+        {"type": "text"},
+        objects["erscheinungsort"],
+    )
+    if "auflage" in objects:
+        sub(origin, "mods:dateIssued", text=objects["erscheinungsjahr"])
+    mods.append(fragment(metadata, "digitization", digitizationOriginInfo))
+    name = sub(mods, "mods:name", {"type": "personal"})
+    sub(name, "mods:displayForm", text=objects["autor"])
+    sub(
+        sub(name, "mods:role"),
+        "mods:roleTerm",
+        {"authority": "marcrelator", "type": "code"},
+        "aut",
+    )
+    record = sub(mods, "mods:recordInfo")
+    sub(record, "mods:recordIdentifier", {"source": institution["isil"]}, recordid)
+    sub(record, "mods:recordCreationDate", {"encoding": "iso8601"}, datecreated)
+    sub(record, "mods:recordInfoNote", {"type": "license"}, institution["license"])
+    sub(sub(mods, "mods:titleInfo"), "mods:title", text=booktitle)
+    mods.append(fragment(metadata, "language", language, False))
+    sub(sub(mods, "mods:physicalDescription"), "mods:extent", text=len(jpgs))
+    sub(mods, "mods:typeOfResource", text="text")
+
+    for chapter in chapters:
+        chapterDmdSec(root, chapter["name"], chapter["idno"])
+    root.append(fragment(metadata, "rights", rightsAmdSec, "AMD", False))
+    # Bücher haben keine FULLTEXT Gruppe, verweisen aber in der PHYSICAL structMap auf die OCR
+    stream(root, streams, "fileSec", partial(writeFileSec, jpgs, thumbs, False))
+    structmap = sub(root, "mets:structMap", {"TYPE": "LOGICAL"})
+    if len(chapters) != 0:
+        book = sub(
+            structmap,
+            "mets:div",
+            {
+                "ADMID": "AMD",
+                "DMDID": "DMDLOG_1",
+                "ID": "LOG_1",
+                "LABEL": booktitle,
+                "TYPE": "monograph",
+            },
+        )
+        chapterDivs(book, chapters)
+    else:
+        # wenn es keine Strukturelemente unterhalb des Buches gibt
+        sub(
+            structmap,
+            "mets:div",
+            {
+                "ID": "LOG_1",
+                "DMDID": "DMDLOG_1",
+                "LABEL": booktitle,
+                "TYPE": "monograph",
+                "ORDER": "1",
+            },
+        )
+    stream(
+        root,
+        streams,
+        "physical",
+        partial(writePhysicalStructMap, len(jpgs), fulltext),
+    )
+    stream(root, streams, "structLink", partial(writeStructLink, links))
+    return {"root": root, "streams": streams}
+
+
+def journalDocument(
+    metadata: dict,
+    version: str,
+    title: str,
+    dateissued: str,
+    datecreated: str,
+    jpgs: List[Path],
+    thumbs: List[Path],
+    chapters: List[dict],
+    links: List[tuple],
+    fulltext: bool,
+) -> dict:
+    """METS/MODS eines Zeitschriftenjahrgangs, Argumente wie bei monographDocument"""
+    institution = metadata["institution"]
+    objects = metadata["objects"]
+    root = metsRoot({}, "mets", "xlink", "xsi")
+    metsHdr(root, metadata, datecreated, version)
+    streams = {}
+
+    mods = modsSec(root, "DMDLOG_1")
+    sub(
+        sub(mods, "mods:location"),
+        "mods:physicalLocation",
+        {
+            "valueURI": "http://ld.zdb-services.de/resource/organisations/"
+            + institution["isil"]
+        },
+        institution["name"],
+    )
+    origin = sub(mods, "mods:originInfo", {"eventType": "publication"})
+    if "auflage" in objects:
+        sub(origin, "mods:edition", text=objects["auflage"])
+        sub(origin, "mods:publisher", text=objects["verlag"])
+    sub(
+        sub(origin, "mods:place"),
+        "mods:placeTerm",
+        {"type": "text"},
+        objects["erscheinungsort"],
+    )
+    sub(
+        origin,
+        "mods:dateIssued",
+        {"encoding": "iso8601", "keyDate": "yes"},
+        dateissued,
+    )
+    mods.append(fragment(metadata, "digitization", digitizationOriginInfo))
+    record = sub(mods, "mods:recordInfo")
+    sub(
+        record,
+        "mods:recordIdentifier",
+        {"source": institution["isil"]},
+        institution["isil"] + "_" + title + "_" + dateissued,
+    )
+    sub(record, "mods:recordCreationDate", {"encoding": "iso8601"}, datecreated)
+    sub(record, "mods:recordInfoNote", {"type": "license"}, institution["license"])
+    sub(sub(mods, "mods:titleInfo"), "mods:title", text=title)
+    mods.append(fragment(metadata, "language", language, False))
+    sub(sub(mods, "mods:physicalDescription"), "mods:extent", text=len(jpgs))
+    sub(mods, "mods:typeOfResource", text="text")
+
+    for chapter in chapters:
+        chapterDmdSec(root, chapter["name"], chapter["idno"])
+    root.append(fragment(metadata, "rights", rightsAmdSec, "AMD", False))
+    stream(root, streams, "fileSec", partial(writeFileSec, jpgs, thumbs, fulltext))
+    structmap = sub(root, "mets:structMap", {"TYPE": "LOGICAL"})
+    volume = sub(
+        structmap,
+        "mets:div",
+        {
+            "ID": "LOG_1",
+            "DMDID": "DMDLOG_1",
+            "LABEL": title,
+            "ADMID": "AMD",
+            "TYPE": "monograph",
+        },
+    )
+    chapterDivs(volume, chapters)
+    stream(
+        root,
+        streams,
+        "physical",
+        partial(writePhysicalStructMap, len(jpgs), fulltext),
+    )
+    stream(root, streams, "structLink", partial(writeStructLink, links))
+    return {"root": root, "streams": streams}
+
+
+def chapterDivs(parent: etree._Element, chapters: List[dict]) -> None:
+    """Logische mets:div der Strukturelemente"""
+    orderid = 0
+    for chapter in chapters:
+        orderid += 1
+        sub(
+            parent,
+            "mets:div",
+            {
+                "ID": f"LOG_{chapter['idno']}",
+                "DMDID": f"DMDLOG_{chapter['idno']}",
+                "LABEL": chapter["name"],
+                "TYPE": "chapter",
+                "ORDER": orderid,
+            },
+        )
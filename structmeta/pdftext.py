@@ -0,0 +1,148 @@
+"""
+ALTO XML aus der Textebene eines PDFs.
+
+Viele PDFs haben schon eine Textebene (born digital oder bereits mit OCR). Statt die
+extrahierten Bilder noch einmal mit Tesseract zu erkennen, werden die Wörter der Seite
+mit ihren Koordinaten von PyMuPDF gelesen und als ALTO (wie von Tesseract, Version 3)
+geschrieben. Die Koordinaten werden dabei vom Platz des Bildes auf der PDF Seite auf
+die Pixel des extrahierten Bildes umgerechnet.
+
+Die ALTO Datei liegt neben dem JPG und hat denselben Namen mit .xml, mit
+[OCR] existing_alto = true wird sie dann von helpers.ocr statt Tesseract genommen.
+"""
+
+import fitz  # PyMuPDF
+from lxml import etree
+from typing import Union
+
+ALTO = "http://www.loc.gov/standards/alto/ns-v3#"
+XSI = "http://www.w3.org/2001/XMLSchema-instance"
+
+
+def pageAlto(
+    page, xref: int, width: int, height: int, filename: str
+) -> Union[bytes, None]:
+    """
+    Erstellt das ALTO für eine PDF Seite in den Koordinaten eines Bildes der Seite.
+    Ohne Wörter auf dem Bild wird None zurückgegeben, die Seite braucht dann OCR.
+
+    Arguments:
+        page -- PyMuPDF Seite
+
+        xref -- XREF des extrahierten Bildes
+
+        width, height -- Größe des extrahierten Bildes in Pixeln
+
+        filename -- Name des Bildes für sourceImageInformation
+    """
+    rects = page.get_image_rects(xref)
+    # ohne Platz auf der Seite (z.B. nur in einer Form verwendet): ganze Seite
+    rect = rects[0] if len(rects) != 0 else page.rect
+    sx = width / rect.width
+    sy = height / rect.height
+
+    def box(x0, y0, x1, y1) -> dict:
+        # in Pixel des Bildes umrechnen und auf das Bild beschränken
+        x0 = min(max(round((x0 - rect.x0) * sx), 0), width)
+        y0 = min(max(round((y0 - rect.y0) * sy), 0), height)
+        x1 = min(max(round((x1 - rect.x0) * sx), 0), width)
+        y1 = min(max(round((y1 - rect.y0) * sy), 0), height)
+        return {
+            "HPOS": str(x0),
+            "VPOS": str(y0),
+            "WIDTH": str(x1 - x0),
+            "HEIGHT": str(y1 - y0),
+        }
+
+    # Wörter nach Block und Zeile gruppieren, in der Reihenfolge von PyMuPDF
+    blocks = {}
+    for x0, y0, x1, y1, word, block_no, line_no, word_no in page.get_text("words"):
+        if (x1 <= rect.x0 or x0 >= rect.x1) or (y1 <= rect.y0 or y0 >= rect.y1):
+            # Wort liegt außerhalb des Bildes
+            continue
+        blocks.setdefault(block_no, {}).setdefault(line_no, []).append(
+            (x0, y0, x1, y1, word)
+        )
+
+    if len(blocks) == 0:
+        return None
+
+    root = etree.Element(f"{{{ALTO}}}alto", nsmap={None: ALTO, "xsi": XSI})
+    root.set(
+        f"{{{XSI}}}schemaLocation", f"{ALTO} http://www.loc.gov/alto/v3/alto-3-0.xsd"
+    )
+    description = etree.SubElement(root, f"{{{ALTO}}}Description")
+    etree.SubElement(description, f"{{{ALTO}}}MeasurementUnit").text = "pixel"
+    info = etree.SubElement(description, f"{{{ALTO}}}sourceImageInformation")
+    etree.SubElement(info, f"{{{ALTO}}}fileName").text = filename
+    processing = etree.SubElement(description, f"{{{ALTO}}}OCRProcessing", ID="OCR_0")
+    step = etree.SubElement(processing, f"{{{ALTO}}}ocrProcessingStep")
+    software = etree.SubElement(step, f"{{{ALTO}}}processingSoftware")
+    etree.SubElement(software, f"{{{ALTO}}}softwareName").text = (
+        f"PyMuPDF {fitz.VersionBind} (PDF Textebene)"
+    )
+    layout = etree.SubElement(root, f"{{{ALTO}}}Layout")
+    p = etree.SubElement(
+        layout,
+        f"{{{ALTO}}}Page",
+        WIDTH=str(width),
+        HEIGHT=str(height),
+        PHYSICAL_IMG_NR="0",
+        ID="page_0",
+    )
+    printspace = etree.SubElement(
+        p,
+        f"{{{ALTO}}}PrintSpace",
+        HPOS="0",
+        VPOS="0",
+        WIDTH=str(width),
+        HEIGHT=str(height),
+    )
+    s = 0
+    for b, (block_no, lines) in enumerate(blocks.items()):
+        words = [w for line in lines.values() for w in line]
+        textblock = etree.SubElement(
+            printspace,
+            f"{{{ALTO}}}TextBlock",
+            ID=f"block_{b}",
+            **box(
+                min(w[0] for w in words),
+                min(w[1] for w in words),
+                max(w[2] for w in words),
+                max(w[3] for w in words),
+            ),
+        )
+        for l, line in enumerate(lines.values()):
+            textline = etree.SubElement(
+                textblock,
+                f"{{{ALTO}}}TextLine",
+                ID=f"line_{b}_{l}",
+                **box(
+                    min(w[0] for w in line),
+                    min(w[1] for w in line),
+                    max(w[2] for w in line),
+                    max(w[3] for w in line),
+                ),
+            )
+            for i, (x0, y0, x1, y1, word) in enumerate(line):
+                if i != 0:
+                    # Abstand zum vorherigen Wort
+                    previous = box(*line[i - 1][:4])
+                    current = box(x0, y0, x1, y1)
+                    hpos = int(previous["HPOS"]) + int(previous["WIDTH"])
+                    etree.SubElement(
+                        textline,
+                        f"{{{ALTO}}}SP",
+                        WIDTH=str(max(int(current["HPOS"]) - hpos, 0)),
+                        VPOS=current["VPOS"],
+                        HPOS=str(hpos),
+                    )
+                etree.SubElement(
+                    textline,
+                    f"{{{ALTO}}}String",
+                    ID=f"string_{s}",
+                    **box(x0, y0, x1, y1),
+                    CONTENT=word,
+                )
+                s += 1
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8")
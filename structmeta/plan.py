@@ -0,0 +1,255 @@
+"""
+Trockenlauf mit --plan.
+
+Aus dem Index des Eingabe-Ordners (siehe scan.scanFolder), der TOML Datei und den
+Kopfdaten einiger Bilder wird ein Plan erstellt, ohne ein Bild zu dekodieren oder eine
+Datei zu erzeugen: welche Einheiten mit wie vielen Seiten bearbeitet werden, welche
+übersprungen würden oder den Lauf abbrechen würden, wie groß die Ausgabe ungefähr wird
+und wie lange Konvertierung und OCR ungefähr dauern. Der Plan wird als JSON in den
+Ausgabe-Ordner geschrieben.
+
+Die Größen der Bilder werden pro Ordner nur aus einigen Bildern gelesen (sample) und die
+Bilder im Index werden nicht sortiert, damit der Plan auch bei sehr großen Beständen
+schnell fertig ist. Die Annahmen für die Schätzung können in der TOML Datei angepasst
+werden:
+
+    [plan]
+    sample = 1
+    jpg_bytes_per_pixel = 0.4
+    convert_seconds_per_megapixel = 0.05
+    ocr_seconds_per_page = 8.0
+    alto_bytes_per_page = 150000
+    mets_bytes_per_page = 1000
+"""
+
+import json
+import re
+import time
+from pathlib import Path
+from typing import List
+from PIL import Image
+from . import manifest as manifests
+
+PLANNAME = "structmeta_plan.json"
+
+# Annahmen für die Schätzung, jpg_bytes_per_pixel gilt für jpg_quality = 90
+ESTIMATES = {
+    "sample": 1,
+    "jpg_bytes_per_pixel": 0.4,
+    "convert_seconds_per_megapixel": 0.05,
+    "ocr_seconds_per_page": 8.0,
+    "alto_bytes_per_page": 150000,
+    "mets_bytes_per_page": 1000,
+}
+
+# Größe der Thumbnails in Pixeln (siehe helpers.createDerivatives)
+THUMBSIZE = 250
+
+
+def planRun(index: dict, settings: dict, manifest: dict = None) -> dict:
+    """
+    Erstellt den Plan für einen Lauf.
+
+    Arguments:
+        index -- Index des Eingabe-Ordners (siehe scan.scanFolder)
+
+        settings -- dict mit type, do_thumbs, OCR, max_dimensions, jpg_quality,
+                    workers, ocr_workers und existing_alto
+
+        manifest -- bei --incremental das Manifest, unveränderte Einheiten werden dann
+                    als übersprungen geplant. Es werden nur Größe und Änderungsdatum
+                    verglichen, Einheiten mit neuem Änderungsdatum aber gleicher Größe
+                    werden als possibly_changed geplant (der Lauf prüft sie per Hash).
+    """
+    estimates = settings["estimates"]
+    units = []
+    dateless = False
+    for unit in index["folders"]:
+        u = {
+            "name": unit["name"],
+            "path": str(unit["path"]),
+            "pages": 0,
+            "skipped": None,
+            "possibly_changed": False,
+            "problems": [],
+            "folders": [],
+        }
+        units.append(u)
+        if settings["type"] == "newspaper":
+            # wie in newspaperMETS: nach der ersten Ausgabe ohne ISO Datum wird abgebrochen
+            if dateless:
+                u["skipped"] = "folgt auf eine Ausgabe ohne ISO Datum"
+                continue
+            if len(re.findall(r"(\d{4}-\d{2}-\d{2})", unit["name"])) == 0:
+                dateless = True
+                u["skipped"] = "kein ISO Tagesdatum im Ordnernamen"
+                continue
+        elif settings["type"] == "journal" and len(unit["name"].split("_")) < 2:
+            u["problems"].append("kein Jahr im Ordnernamen (Titel_Jahr)")
+        if manifest is not None:
+            status = manifests.compareUnit(manifest, unit, hashing=False)
+            if status == "unchanged":
+                u["skipped"] = "unverändert (--incremental)"
+                continue
+            u["possibly_changed"] = status == "possibly_changed"
+        if settings["type"] != "newspaper" and len(unit["folders"]) != 0:
+            # Strukturdaten: bearbeitet werden nur die Bilder in den Unterordnern
+            folders = unit["folders"]
+        else:
+            folders = [unit]
+        for folder in folders:
+            f = planFolder(folder, settings, estimates)
+            u["folders"].append(f)
+            u["problems"].extend(f.pop("problems"))
+        for key in [
+            "pages",
+            "input_bytes",
+            "output_bytes",
+            "convert_seconds",
+            "ocr_seconds",
+        ]:
+            u[key] = sum(f[key] for f in u["folders"])
+        u["output_bytes"] += estimates["mets_bytes_per_page"] * u["pages"]
+
+    planned = [u for u in units if u["skipped"] is None]
+    totals = {
+        "units": len(units),
+        "planned_units": len(planned),
+        "skipped_units": len(units) - len(planned),
+        "possibly_changed_units": sum(u["possibly_changed"] for u in planned),
+        "pages": sum(u["pages"] for u in planned),
+        "input_bytes": sum(u["input_bytes"] for u in planned),
+        "output_bytes": sum(u["output_bytes"] for u in planned),
+        "convert_seconds": sum(u["convert_seconds"] for u in planned),
+        "ocr_seconds": sum(u["ocr_seconds"] for u in planned),
+    }
+    # parallel bearbeitet werden nur Zeitungsausgaben, OCR zusätzlich mit [OCR] workers
+    workers = settings["workers"] if settings["type"] == "newspaper" else 1
+    totals["estimated_seconds"] = totals["convert_seconds"] / workers + totals[
+        "ocr_seconds"
+    ] / (workers * settings["ocr_workers"])
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "input": str(index["path"]),
+        "settings": {k: v for k, v in settings.items() if k != "estimates"},
+        "estimates": estimates,
+        "totals": totals,
+        "problems": [
+            {"unit": u["name"], "problem": p} for u in units for p in u["problems"]
+        ],
+        "units": units,
+    }
+
+
+def planFolder(folder: dict, settings: dict, estimates: dict) -> dict:
+    """Plan für einen Ordner mit Bildern (eine Ausgabe, ein Buch oder ein Strukturelement)"""
+    f = {
+        "name": folder["name"],
+        "pages": 0,
+        "format": None,
+        "input_bytes": 0,
+        "output_bytes": 0,
+        "convert_seconds": 0,
+        "ocr_seconds": 0,
+        "problems": [],
+    }
+    fromjpgs = len(folder["jpgs"]) != 0
+    sources = folder["jpgs"] if fromjpgs else folder["tiffs"]
+    if len(sources) == 0:
+        # processImages bricht hier den ganzen Lauf ab
+        f["problems"].append(f"Keine TIFs und keine JPGs gefunden in {folder['name']}")
+        return f
+    f["pages"] = len(sources)
+    f["format"] = sources[0].suffix.replace(".", "").lower()
+    f["input_bytes"] = sum(folder["files"][p][0] for p in sources)
+
+    width, height = sampleSize(sources[: max(int(estimates["sample"]), 1)], f)
+    if width == 0:
+        return f
+    bytesperpixel = estimates["jpg_bytes_per_pixel"] * settings["jpg_quality"] / 90
+    convert = not fromjpgs or bool(settings["max_dimensions"])
+    existingthumbs = len(folder["thumbs"]) != 0
+    makethumbs = settings["do_thumbs"] and not existingthumbs
+
+    if convert:
+        scale = 1.0
+        if settings["max_dimensions"]:
+            scale = min(1.0, settings["max_dimensions"] / max(width, height))
+        pixels = width * height * scale * scale
+        f["output_bytes"] += int(f["pages"] * pixels * bytesperpixel)
+    else:
+        # JPGs werden unverändert übernommen
+        f["output_bytes"] += f["input_bytes"]
+    if makethumbs:
+        scale = min(1.0, THUMBSIZE / max(width, height))
+        pixels = width * height * scale * scale
+        f["output_bytes"] += int(f["pages"] * pixels * bytesperpixel)
+    elif existingthumbs:
+        f["output_bytes"] += sum(folder["files"][p][0] for p in folder["thumbs"])
+    if convert or makethumbs:
+        # jede Seite wird einmal dekodiert
+        megapixels = width * height / 1000000
+        f["convert_seconds"] = (
+            f["pages"] * megapixels * estimates["convert_seconds_per_megapixel"]
+        )
+    if settings["OCR"]:
+        ocrpages = f["pages"]
+        if settings["existing_alto"]:
+            # Seiten mit ALTO neben dem Bild (z.B. aus PDF2JPG --alto) brauchen keine OCR
+            existing = [p for p in sources if p.with_suffix(".xml") in folder["files"]]
+            ocrpages -= len(existing)
+            f["output_bytes"] += sum(
+                folder["files"][p.with_suffix(".xml")][0] for p in existing
+            )
+        f["ocr_seconds"] = ocrpages * estimates["ocr_seconds_per_page"]
+        f["output_bytes"] += ocrpages * estimates["alto_bytes_per_page"]
+    return f
+
+
+def sampleSize(images: List[Path], f: dict) -> tuple:
+    """
+    Mittlere Breite und Höhe der Bilder. Pillow liest dafür nur die Kopfdaten,
+    die Bilder werden nicht dekodiert.
+    """
+    sizes = []
+    for image in images:
+        try:
+            with Image.open(image) as img:
+                sizes.append(img.size)
+        except Exception as e:
+            f["problems"].append(f"{image.name} kann nicht gelesen werden: {e}")
+    if len(sizes) == 0:
+        return 0, 0
+    return (
+        sum(s[0] for s in sizes) / len(sizes),
+        sum(s[1] for s in sizes) / len(sizes),
+    )
+
+
+def writePlan(plan: dict, outputfolder: Path) -> Path:
+    """Schreibt den Plan als JSON in den Ausgabe-Ordner"""
+    planfile = Path(outputfolder, PLANNAME)
+    with open(planfile, "w", encoding="utf-8") as f:
+        json.dump(plan, f, ensure_ascii=False, indent=2)
+    return planfile
+
+
+def summary(plan: dict) -> List[str]:
+    """Kurze Zusammenfassung des Plans für die Ausgabe"""
+    t = plan["totals"]
+    lines = [
+        f"{t['planned_units']} von {t['units']} Einheiten mit {t['pages']} Seiten werden bearbeitet",
+        f"Geschätzte Ausgabe: {t['output_bytes'] / 1024 / 1024:.0f} MB",
+        f"Geschätzte Dauer: {t['estimated_seconds'] / 3600:.1f} Stunden "
+        f"(Konvertierung {t['convert_seconds'] / 3600:.1f} h, OCR {t['ocr_seconds'] / 3600:.1f} h)",
+    ]
+    for p in plan["problems"]:
+        lines.append(f"Problem bei {p['unit']}: {p['problem']}")
+    for u in plan["units"]:
+        if u["skipped"] is not None:
+            lines.append(f"Übersprungen: {u['name']} ({u['skipped']})")
+        elif u["possibly_changed"]:
+            lines.append(
+                f"Möglicherweise geändert: {u['name']} (neues Änderungsdatum, wird im Lauf per Hash geprüft)"
+            )
+    return lines
@@ -0,0 +1,219 @@
+"""
+Profiling mit cProfile und tracemalloc (Option --profile).
+
+Für jeden Schritt (siehe metrics.stage) gibt es pro Prozess einen eigenen Profiler, der
+nur während des Schritts läuft. Im Hauptprozess sammelt der Profiler "run" alles
+außerhalb der Schritte, z.B. das Warten auf die Worker-Prozesse. Am Ende des Prozesses
+wird pro Schritt eine pstats Datei <Schritt>_<pid>.prof in den Ordner
+structmeta_profile im Ausgabe-Ordner geschrieben, bei --workers also auch von jedem
+Worker-Prozess.
+
+Mit [profile] memory = true in der TOML Datei wird zusätzlich tracemalloc gestartet und
+pro Einheit (Ausgabe, Jahrgang, Buch) der Spitzenwert des Speichers und die größten
+Allokationen am Ende der Einheit in memory_<pid>.jsonl geschrieben. Das verlangsamt
+den Lauf deutlich.
+
+Auswertung über alle Prozesse:
+    python -m structmeta.profiling structmeta_output/structmeta_profile --top 30
+"""
+
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+from multiprocessing import util
+from pathlib import Path
+from typing import Union
+
+PROFILEFOLDER = "structmeta_profile"
+
+# folder: Ordner für die Ergebnisse, None = kein Profiling
+# memory: tracemalloc pro Einheit
+PROFILE = {"folder": None, "memory": False}
+
+# Profiler pro Schritt, die gerade aktiven Schritte und die aktuelle Einheit
+_profiles = {}
+_active = []
+_unit = {"name": None}
+
+
+def setupProfile(folder: Union[Path, str, None], memory: bool, run: bool) -> None:
+    """
+    Aktiviert das Profiling für diesen Prozess.
+
+    Arguments:
+        folder -- Ordner für die pstats Dateien, None = kein Profiling
+
+        memory -- tracemalloc pro Einheit
+
+        run -- Hauptprozess: alte Ergebnisse löschen und alles außerhalb der Schritte
+               als "run" messen
+    """
+    # mit fork erbt ein Worker-Prozess die Profiler des Hauptprozesses
+    while len(_active) != 0:
+        _profiles[_active.pop()].disable()
+    _profiles.clear()
+    _unit["name"] = None
+    PROFILE["folder"] = folder
+    PROFILE["memory"] = memory
+    if folder is None:
+        return
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    if run:
+        # Ergebnisse früherer Läufe würden im Report mitgezählt
+        for f in list(folder.glob("*.prof")) + list(folder.glob("memory_*.jsonl")):
+            f.unlink()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    # wird beim Beenden des Prozesses ausgeführt, auch in den Worker-Prozessen
+    util.Finalize(None, finish, exitpriority=10)
+    if run:
+        _resume("run")
+
+
+def profileSettings() -> dict:
+    """Einstellungen zur Übergabe an Worker-Prozesse"""
+    return dict(PROFILE)
+
+
+@contextmanager
+def profiled(name: str):
+    """Misst den Block im Profiler des Schritts name, der äußere Profiler pausiert"""
+    if PROFILE["folder"] is None or (len(_active) != 0 and _active[-1] == name):
+        yield
+        return
+    if len(_active) != 0:
+        # cProfile erlaubt nur einen aktiven Profiler
+        _profiles[_active[-1]].disable()
+    _resume(name)
+    try:
+        yield
+    finally:
+        _profiles[_active.pop()].disable()
+        if len(_active) != 0:
+            _profiles[_active[-1]].enable()
+
+
+def _resume(name: str) -> None:
+    _active.append(name)
+    _profiles.setdefault(name, cProfile.Profile()).enable()
+
+
+def beginUnit(name: Union[str, None]) -> None:
+    """Neue Einheit: den Speicher der vorherigen festhalten und den Spitzenwert zurücksetzen"""
+    if PROFILE["folder"] is None or not PROFILE["memory"]:
+        return
+    # der Snapshot selbst soll nicht im Profil auftauchen
+    if len(_active) != 0:
+        _profiles[_active[-1]].disable()
+    _memoryRecord()
+    tracemalloc.reset_peak()
+    _unit["name"] = name
+    if len(_active) != 0:
+        _profiles[_active[-1]].enable()
+
+
+def _memoryRecord() -> None:
+    if _unit["name"] is None or not tracemalloc.is_tracing():
+        return
+    current, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, tracemalloc.__file__)]
+    )
+    top = [
+        {
+            "where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+            "bytes": s.size,
+            "count": s.count,
+        }
+        for s in snapshot.statistics("lineno")[:10]
+    ]
+    record = {
+        "unit": _unit["name"],
+        "pid": os.getpid(),
+        "peak_bytes": peak,
+        "current_bytes": current,
+        "top": top,
+    }
+    with open(
+        Path(PROFILE["folder"], f"memory_{os.getpid()}.jsonl"), "a", encoding="utf-8"
+    ) as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    _unit["name"] = None
+
+
+def finish() -> None:
+    """Schreibt die pstats Dateien und den Speicher der letzten Einheit"""
+    if PROFILE["folder"] is None:
+        return
+    while len(_active) != 0:
+        _profiles[_active.pop()].disable()
+    for name, profile in _profiles.items():
+        profile.dump_stats(Path(PROFILE["folder"], f"{name}_{os.getpid()}.prof"))
+    _profiles.clear()
+    if PROFILE["memory"]:
+        _memoryRecord()
+
+
+def report(folder: Path, top: int = 20, stage: str = None, sort: str = "tottime"):
+    """Gibt die Zeiten pro Schritt und die größten Hotspots über alle Prozesse aus"""
+    folder = Path(folder)
+    files = {}
+    for f in sorted(folder.glob("*.prof")):
+        files.setdefault(f.stem.rsplit("_", 1)[0], []).append(str(f))
+    if len(files) == 0:
+        print(f"Keine pstats Dateien in {folder}")
+        return
+    print(f"{'Schritt':<12} {'Prozesse':>8} {'Sekunden':>10}")
+    for name, paths in files.items():
+        stats = pstats.Stats(*paths)
+        print(f"{name:<12} {len(paths):>8} {stats.total_tt:>10.2f}")
+    if stage is not None:
+        if stage not in files:
+            print(f"Kein Schritt {stage}, vorhanden: {', '.join(files)}")
+            return
+        paths = files[stage]
+    else:
+        paths = [p for names in files.values() for p in names]
+    print()
+    print(f"Top {top} nach {sort}" + (f" im Schritt {stage}" if stage else ""))
+    stats = pstats.Stats(*paths)
+    stats.strip_dirs().sort_stats(sort).print_stats(top)
+
+    units = []
+    for f in folder.glob("memory_*.jsonl"):
+        with open(f, encoding="utf-8") as lines:
+            units.extend(json.loads(line) for line in lines)
+    if len(units) != 0:
+        units.sort(key=lambda u: u["peak_bytes"], reverse=True)
+        print("Speicher: Einheiten mit dem höchsten Spitzenwert")
+        for u in units[:top]:
+            print(f"{u['peak_bytes'] / 1024 / 1024:>10.1f} MB  {u['unit']}")
+        print(f"Größte Allokationen am Ende von {units[0]['unit']}")
+        for t in units[0]["top"]:
+            print(f"{t['bytes'] / 1024 / 1024:>10.1f} MB  {t['where']}")
+
+
+def cli():
+    parser = argparse.ArgumentParser(
+        description="Hotspots aus einem Lauf mit --profile über alle Prozesse"
+    )
+    parser.add_argument("folder", help=f"Ordner {PROFILEFOLDER} im Ausgabe-Ordner")
+    parser.add_argument("--top", type=int, default=20, help="Anzahl der Funktionen")
+    parser.add_argument("--stage", help="nur diesen Schritt auswerten, z.B. ocr")
+    parser.add_argument(
+        "--sort",
+        default="tottime",
+        choices=["tottime", "cumulative", "ncalls"],
+        help="Sortierung der Funktionen",
+    )
+    args = parser.parse_args()
+    report(Path(args.folder), args.top, args.stage, args.sort)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,88 @@
+"""
+Index des Eingabe-Ordners.
+
+Der Eingabe-Ordner wird vor der Bearbeitung einmal mit os.scandir durchlaufen. Alle
+weiteren Schritte (Einheiten, Strukturelemente, Bilder, vorhandene Thumbnails, Manifest)
+arbeiten dann mit diesem Index, statt die Ordner immer wieder mit glob zu lesen. Das
+spart vor allem bei Eingabe-Ordnern auf Netzlaufwerken viel Zeit.
+
+Ein Ordner im Index ist ein dict:
+
+    path    -- Pfad des Ordners
+    name    -- Name des Ordners
+    jpgs    -- JPGs ohne Thumbnails, natürlich sortiert
+    thumbs  -- vorhandene Thumbnails, natürlich sortiert
+    tiffs   -- TIFs, natürlich sortiert
+    files   -- alle Dateien des Ordners: Pfad -> (Größe, Änderungsdatum)
+    folders -- Unterordner, natürlich sortiert
+"""
+
+import os
+from pathlib import Path
+from typing import List, Union
+from natsort import natsort_keygen
+
+JPG = [".jpg", ".jpeg"]
+TIF = [".tif", ".tiff"]
+
+# Alle Einträge eines Ordners haben denselben Pfad davor, die natürliche Sortierung der
+# Namen ist dieselbe wie die der Pfade (natsorted), aber deutlich schneller.
+_natkey = natsort_keygen()
+
+
+def scanFolder(path: Union[Path, str], sortpages: bool = True) -> dict:
+    """
+    Liest einen Ordner mit allen Unterordnern in den Index ein.
+
+    Arguments:
+        sortpages -- False, wenn die Reihenfolge der Bilder keine Rolle spielt (--plan),
+                     die Sortierung ist bei vielen Seiten der größte Teil der Arbeit
+    """
+    path = Path(path)
+    node = {
+        "path": path,
+        "name": path.name,
+        "jpgs": [],
+        "thumbs": [],
+        "tiffs": [],
+        "files": {},
+        "folders": [],
+    }
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                node["folders"].append(scanFolder(entry.path, sortpages))
+                continue
+            if not entry.is_file():
+                continue
+            p = path / entry.name
+            stat = entry.stat()
+            node["files"][p] = (stat.st_size, stat.st_mtime)
+            # wie bisher mit glob("*.jpg"): unter Windows ohne, sonst mit Groß-/Kleinschreibung
+            suffix = os.path.splitext(os.path.normcase(entry.name))[1]
+            if suffix in JPG:
+                if "thumb" in entry.name:
+                    node["thumbs"].append(p)
+                else:
+                    node["jpgs"].append(p)
+            elif suffix in TIF:
+                node["tiffs"].append(p)
+    if sortpages:
+        for key in ["jpgs", "thumbs", "tiffs"]:
+            node[key].sort(key=lambda p: _natkey(p.name))
+    node["folders"].sort(key=lambda f: _natkey(f["name"]))
+    return node
+
+
+def allFiles(node: dict) -> dict:
+    """Alle Dateien eines Ordners inklusive aller Unterordner: Pfad -> (Größe, Änderungsdatum)"""
+    files = dict(node["files"])
+    for folder in node["folders"]:
+        files.update(allFiles(folder))
+    return files
+
+
+def countPages(node: dict) -> int:
+    """Anzahl der Bilder in einem Ordner und allen Unterordnern"""
+    n = len(node["jpgs"]) if len(node["jpgs"]) != 0 else len(node["tiffs"])
+    return n + sum(countPages(folder) for folder in node["folders"])
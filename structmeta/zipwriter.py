@@ -0,0 +1,209 @@
+"""
+Ein kleiner ZIP Writer für schon fertig komprimierte Einträge.
+
+zipfile komprimiert jeden Eintrag beim Schreiben, also unter dem Lock, der die ZIP Datei
+schützt. Damit ALTO und METS parallel in den OCR Threads und Worker-Prozessen komprimiert
+werden können, bereitet prepareEntry einen Eintrag (CRC, Größen, Deflate Daten) außerhalb
+vor, addEntry hängt ihn dann nur noch an. Geschrieben wird das Format aus der ZIP
+Spezifikation (APPNOTE.TXT) mit ZIP64, wenn Größen oder Offsets 4 GB überschreiten oder
+es mehr als 65535 Einträge gibt. Gelesen werden die Archive wie bisher mit zipfile.
+
+Ein Archiv ist ein dict:
+
+    path     -- Pfad der Datei
+    fp       -- die zum Schreiben geöffnete Datei
+    entries  -- die geschriebenen Einträge (dicts aus prepareEntry mit offset)
+    size     -- bisher geschriebene Bytes
+"""
+
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Union
+
+STORED = 0
+DEFLATED = 8
+
+# ab hier werden ZIP64 Felder geschrieben
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+
+# Unix, ZIP Version 2.0 bzw. 4.5 (ZIP64)
+VERSION = 20
+VERSION_ZIP64 = 45
+MADE_BY = (3 << 8) | VERSION_ZIP64
+
+
+def openZip(path: Union[Path, str]) -> dict:
+    """Legt ein neues, leeres Archiv an"""
+    return {"path": Path(path), "fp": open(path, "wb"), "entries": [], "size": 0}
+
+
+def prepareEntry(
+    name: str, data: bytes, compress: bool, date_time: tuple = None
+) -> dict:
+    """
+    Bereitet einen Eintrag vor: CRC, Größen und die (mit compress per Deflate
+    komprimierten) Daten. Kann in beliebigen Threads oder Prozessen laufen.
+    """
+    if date_time is None:
+        date_time = time.localtime(time.time())[:6]
+    entry = {
+        "name": name,
+        "date_time": tuple(date_time),
+        "crc": zlib.crc32(data),
+        "file_size": len(data),
+    }
+    if compress:
+        # raw Deflate Stream ohne zlib Header, wie ihn ZIP erwartet
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        entry["method"] = DEFLATED
+        entry["data"] = compressor.compress(data) + compressor.flush()
+    else:
+        entry["method"] = STORED
+        entry["data"] = data
+    entry["compress_size"] = len(entry["data"])
+    return entry
+
+
+def addEntry(zipObj: dict, entry: dict) -> None:
+    """
+    Hängt einen mit prepareEntry vorbereiteten Eintrag an. Nicht threadsicher, der
+    Aufrufer muss gleichzeitige Zugriffe auf dasselbe Archiv verhindern.
+    """
+    if zipObj["fp"] is None:
+        raise ValueError(f"{zipObj['path']} ist schon geschlossen")
+    name = entry["name"].encode("utf-8")
+    zip64 = entry["file_size"] >= ZIP64_LIMIT or entry["compress_size"] >= ZIP64_LIMIT
+    if zip64:
+        sizes = (0xFFFFFFFF, 0xFFFFFFFF)
+        extra = struct.pack(
+            "<HHQQ", 0x0001, 16, entry["file_size"], entry["compress_size"]
+        )
+    else:
+        sizes = (entry["compress_size"], entry["file_size"])
+        extra = b""
+    header = struct.pack(
+        "<IHHHHHIIIHH",
+        0x04034B50,
+        VERSION_ZIP64 if zip64 else VERSION,
+        _flags(entry["name"]),
+        entry["method"],
+        *_dosTime(entry["date_time"]),
+        entry["crc"],
+        *sizes,
+        len(name),
+        len(extra),
+    )
+    offset = zipObj["size"]
+    zipObj["fp"].write(header + name + extra)
+    zipObj["fp"].write(entry["data"])
+    zipObj["size"] += len(header) + len(name) + len(extra) + entry["compress_size"]
+    # die Daten werden nicht mehr gebraucht, nur noch die Angaben für das Verzeichnis
+    info = {k: v for k, v in entry.items() if k != "data"}
+    info["offset"] = offset
+    zipObj["entries"].append(info)
+
+
+def closeZip(zipObj: dict) -> None:
+    """Schreibt das zentrale Verzeichnis und schließt die Datei"""
+    if zipObj["fp"] is None:
+        return
+    fp = zipObj["fp"]
+    start = zipObj["size"]
+    directory = []
+    for entry in zipObj["entries"]:
+        name = entry["name"].encode("utf-8")
+        fields = []
+        file_size, compress_size, offset = (
+            entry["file_size"],
+            entry["compress_size"],
+            entry["offset"],
+        )
+        # im Verzeichnis stehen nur die Werte im ZIP64 Feld, die nicht passen
+        if file_size >= ZIP64_LIMIT:
+            fields.append(file_size)
+            file_size = 0xFFFFFFFF
+        if compress_size >= ZIP64_LIMIT:
+            fields.append(compress_size)
+            compress_size = 0xFFFFFFFF
+        if offset >= ZIP64_LIMIT:
+            fields.append(offset)
+            offset = 0xFFFFFFFF
+        extra = b""
+        if len(fields) != 0:
+            extra = struct.pack(f"<HH{len(fields)}Q", 0x0001, 8 * len(fields), *fields)
+        directory.append(
+            struct.pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50,
+                MADE_BY,
+                VERSION_ZIP64 if len(fields) != 0 else VERSION,
+                _flags(entry["name"]),
+                entry["method"],
+                *_dosTime(entry["date_time"]),
+                entry["crc"],
+                compress_size,
+                file_size,
+                len(name),
+                len(extra),
+                0,
+                0,
+                0,
+                # -rw-------
+                0o600 << 16,
+                offset,
+            )
+        )
+        directory.append(name + extra)
+    directory = b"".join(directory)
+    fp.write(directory)
+    count = len(zipObj["entries"])
+    end = start + len(directory)
+    if count >= ZIP64_COUNT_LIMIT or start >= ZIP64_LIMIT or end >= ZIP64_LIMIT:
+        # ZIP64 End of Central Directory Record und Locator
+        fp.write(
+            struct.pack(
+                "<IQHHIIQQQQ",
+                0x06064B50,
+                44,
+                MADE_BY,
+                VERSION_ZIP64,
+                0,
+                0,
+                count,
+                count,
+                len(directory),
+                start,
+            )
+        )
+        fp.write(struct.pack("<IIQI", 0x07064B50, 0, end, 1))
+    fp.write(
+        struct.pack(
+            "<IHHHHIIH",
+            0x06054B50,
+            0,
+            0,
+            min(count, 0xFFFF),
+            min(count, 0xFFFF),
+            min(len(directory), 0xFFFFFFFF),
+            min(start, 0xFFFFFFFF),
+            0,
+        )
+    )
+    fp.close()
+    zipObj["fp"] = None
+
+
+def _flags(name: str) -> int:
+    # Bit 11: Name in UTF-8
+    return 0x800 if not name.isascii() else 0
+
+
+def _dosTime(date_time: tuple) -> tuple:
+    year, month, day, hour, minute, second = date_time
+    return (
+        hour << 11 | minute << 5 | second // 2,
+        (year - 1980) << 9 | month << 5 | day,
+    )
@@ -0,0 +1,69 @@
+import threading
+import zipfile
+import zlib
+from pathlib import Path
+from structmeta import archive, zipwriter
+
+
+class Logger:
+    def info(self, message):
+        pass
+
+
+def test_concurrent_writers(tmp_path):
+    inputfolder = tmp_path / "Bestand"
+    inputfolder.mkdir()
+    out = tmp_path / "out"
+    out.mkdir()
+    archive.openArchives(inputfolder, out)
+    try:
+
+        def writer(n):
+            for i in range(20):
+                data = f"<alto>{n} {i} {'x' * (n * 100 + i)}</alto>".encode("utf-8")
+                archive.writeOutput(Path("alto", f"{n}_{i}.xml"), data)
+                archive.writeOutput(Path("binaries", f"{n}_{i}.jpg"), data)
+
+        threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        archive.closeArchives(Logger())
+        archive.ARCHIVE["mode"] = "files"
+    zips = sorted(out.glob("*.zip"))
+    assert [p.name.split("__")[1] for p in zips] == [
+        "Bestand_binaries.zip",
+        "Bestand_mets.zip",
+    ]
+    assert list(out.glob("*.part")) == []
+    for path in zips:
+        with zipfile.ZipFile(path) as z:
+            assert z.testzip() is None
+            assert len(z.infolist()) == 160
+            assert z.read("7_19.xml" if "mets" in path.name else "7_19.jpg") == (
+                f"<alto>7 19 {'x' * 719}</alto>".encode("utf-8")
+            )
+            types = {i.compress_type for i in z.infolist()}
+            if "binaries" in path.name:
+                assert types == {zipfile.ZIP_STORED}
+            else:
+                assert types == {zipfile.ZIP_DEFLATED}
+
+
+def test_zip64(tmp_path, monkeypatch):
+    # ZIP64 Felder ohne 4 GB Testdaten
+    monkeypatch.setattr(zipwriter, "ZIP64_LIMIT", 0)
+    monkeypatch.setattr(zipwriter, "ZIP64_COUNT_LIMIT", 0)
+    path = tmp_path / "test.zip"
+    zipObj = zipwriter.openZip(path)
+    data = {"a.xml": b"<a/>" * 1000, "ä.jpg": bytes(range(256))}
+    for name, content in data.items():
+        entry = zipwriter.prepareEntry(name, content, compress=name.endswith(".xml"))
+        assert entry["crc"] == zlib.crc32(content)
+        zipwriter.addEntry(zipObj, entry)
+    zipwriter.closeZip(zipObj)
+    with zipfile.ZipFile(path) as z:
+        assert z.testzip() is None
+        assert {name: z.read(name) for name in z.namelist()} == data
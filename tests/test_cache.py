@@ -0,0 +1,27 @@
+from structmeta import cache
+
+
+def test_replaced_entry_counted_once(tmp_path):
+    cache.setupCache(tmp_path / "cache", 1)
+    try:
+        cache.cacheWrite("ab" * 32, b"x" * 1000)
+        cache.cacheWrite("ab" * 32, b"x" * 400)
+        assert cache.CACHE["size"].value == 400
+    finally:
+        cache.setupCache(None, 0)
+
+
+def test_evict_recounts_from_disk(tmp_path):
+    cache.setupCache(tmp_path / "cache", 1)
+    try:
+        cache.cacheWrite("ab" * 32, b"x" * 300 * 1024)
+        # ein Eintrag, den ein anderer Lauf geschrieben hat
+        other = tmp_path / "cache" / "cd" / ("cd" * 32)
+        other.parent.mkdir()
+        other.write_bytes(b"x" * 900 * 1024)
+        cache.evict()
+        size = sum(f.stat().st_size for f in (tmp_path / "cache").glob("*/*"))
+        assert size <= 1024 * 1024 * 0.9
+        assert cache.CACHE["size"].value == size
+    finally:
+        cache.setupCache(None, 0)
@@ -0,0 +1,55 @@
+from benchmarks.corpus import makeCorpus
+from structmeta import argumentParser, hooks, run
+
+
+def test_registered_hook_survives_run(tmp_path):
+    corpus = makeCorpus(
+        tmp_path / "corpus", type="newspaper", units=2, pages=2, width=300, height=400
+    )
+    out = tmp_path / "out"
+    out.mkdir()
+    events = []
+
+    def callback(event, payload):
+        events.append(payload["path"])
+
+    hooks.register("mets_written", callback)
+    try:
+        args = argumentParser(gui=False).parse_args(
+            [
+                "--metadata",
+                str(corpus["toml"]),
+                "--folder",
+                str(corpus["input"]),
+                "--output",
+                str(out),
+            ]
+        )
+        run(args)
+    finally:
+        hooks.unregister("mets_written", callback)
+    assert len(events) == 2
+
+
+def test_setup_replaces_module_hooks(tmp_path):
+    module = tmp_path / "meinhook.py"
+    module.write_text(
+        "from structmeta import hooks\n\n"
+        "def callback(event, payload):\n"
+        "    pass\n\n"
+        "def register():\n"
+        "    hooks.register('ocr_done', callback)\n"
+    )
+
+    def own(event, payload):
+        pass
+
+    hooks.register("ocr_done", own)
+    try:
+        hooks.setupHooks([str(module)], None)
+        hooks.setupHooks([str(module)], None)
+        assert len(hooks.HOOKS["ocr_done"]) == 2
+        hooks.setupHooks([], None)
+        assert hooks.HOOKS["ocr_done"] == [own]
+    finally:
+        hooks.unregister("ocr_done", own)